@@ -1,10 +1,15 @@
+import random
 import tensorflow as tf
+import tools.input_cache as input_cache
 
 
 class FileInputReader:
 
-    # TODO: This only reads input in text CSV format: expand to images, text, ...
-    # TODO: Add shuffling
+    # This only reads input in text CSV format. Use ImageDatasetInputReader or
+    # TFRecordDatasetInputReader for images
+
+    # Records can be shuffled by passing a queue created with create_shuffle_sample_queue as the
+    # sample queue, and files by enqueuing them with enqueue_files
 
     # This class needs to be instantiated and used within a TF session
 
@@ -30,6 +35,40 @@ class FileInputReader:
         """
         self._sess.run(self._enqueue_file, feed_dict={self._filename: filename})
 
+    def enqueue_files(self, filenames, shuffle_files=False, seed=None):
+        """
+        This method enqueues several files that will be used as the source of samples
+        :param
+            filenames: List with the names of the files to enqueue
+            shuffle_files: True to enqueue the files in random order
+            seed: Seed for the file order, so the same seed always enqueues files in the same order
+        """
+        filenames = list(filenames)
+        if shuffle_files:
+            random.Random(seed).shuffle(filenames)
+        for filename in filenames:
+            self.enqueue_file(filename)
+
+    @staticmethod
+    def create_shuffle_sample_queue(capacity, min_after_dequeue, number_features, seed=None):
+        """
+        Creates a sample queue that returns records in random order. Only capacity records are kept
+        in memory at any time: finish_enqueuing_files fills the queue from a background thread, which
+        waits while the queue is full, so files don't need to be loaded completely to be shuffled
+        :param
+            capacity: Maximum number of records in the queue. This is the size of the shuffle buffer
+            min_after_dequeue: Minimum number of records left in the queue after a dequeue while it is
+            open, which guarantees a minimum level of mixing
+            number_features: Number of features that each record contains
+            seed: Seed used by the queue to shuffle records
+        :return:
+            RandomShuffleQueue that can be used as the sample queue of FileInputReader
+        """
+        return tf.RandomShuffleQueue(
+            capacity=capacity, min_after_dequeue=min_after_dequeue,
+            dtypes=[tf.int32, tf.int32], shapes=[[number_features], []], seed=seed,
+            name="shuffle_sample_queue")
+
     def get_sample_batch(self):
         """
         This method is used to dequeue a batch of samples from the input files
@@ -51,22 +90,19 @@ class FileInputReader:
     def finish_enqueuing_files(self):
         """
         Closes the file queue so records can be retrieved from it. Call this method only when you
-        are done queueing input files. The method reads all the lines in the files and enqueues
-        them in the sample queue. These records will be used to build batched later
+        are done queueing input files. A background thread reads the lines in the files and enqueues
+        them in the sample queue while batches are retrieved, waiting whenever the sample queue is
+        full. The sample queue is closed once all the lines have been enqueued
         """
         # Close the file queue so files can be dequeue from it and lines can be
         # sent to the sample queue
         self._sess.run(self._close_file_queue)
-        # Add all the lines in the file to the sample queue
-        try:
-            while True:
-                self._sess.run(self._read_file_line)
-        except tf.errors.OutOfRangeError:
-            print("All records have been enqueued")
-            pass  # no more records
-        # Close the sample queue since no more files are going to be queued and in preparation
-        # to retrieve batches
-        self._sess.run(self._close_sample_queue)
+        # A single thread keeps the order of the lines. The runner closes the sample queue when the
+        # reader runs out of files, so the last batches can be retrieved
+        queue_runner = tf.train.QueueRunner(
+            self._sample_queue, [self._read_file_line], close_op=self._close_sample_queue,
+            cancel_op=self._cancel_sample_queue)
+        self._threads.extend(queue_runner.create_threads(self._sess, coord=self._coordinator, start=True))
 
     def _define_reader_graph(self, file_queue, sample_queue):
         # Start populating the filename queue.
@@ -86,6 +122,7 @@ class FileInputReader:
         # Setting up the sample queue
         self._sample_queue = sample_queue
         self._close_sample_queue = self._sample_queue.close()
+        self._cancel_sample_queue = self._sample_queue.close(cancel_pending_enqueues=True)
 
         # Reading lines from files
         self._define_read_file_line_graph()
@@ -119,3 +156,269 @@ class FileInputReader:
         target = fields[0]
         # Append record to sample queue
         self._read_file_line = self._sample_queue.enqueue([pixels, target], name="enqueue-line")
+
+
+class DatasetInputReader:
+
+    # Streaming alternative to FileInputReader built on tf.data. Lines are read from several files in parallel,
+    # decoded in batches and prefetched, so the first batch is available as soon as its lines are read and reading
+    # overlaps with the computation that consumes the batches.
+
+    # This class needs to be instantiated and used within a TF session
+
+    def __init__(self, session, filenames, number_features, batch_size, number_parallel_reads=4,
+                 number_prefetch_batches=2, number_epochs=1, shuffle_files=False, shuffle_buffer_size=None,
+                 seed=None, use_cache=None, cache_dir=None):
+        """
+        :param
+            session: TF session to use when running the operation in this class
+            filenames: List of CSV files to use as the source of samples
+            number_features: Number of features that each record contains
+            batch_size: Size of the mini batches that it will retrieve. The last batch of the last epoch
+            can be smaller
+            number_parallel_reads: Number of files that are read and decoded at the same time
+            number_prefetch_batches: Number of batches prepared in the background ahead of time
+            number_epochs: Number of times the files are read. None repeats them indefinitely
+            shuffle_files: True to read the files in a different random order every epoch
+            shuffle_buffer_size: Number of records kept in the shuffle buffer. Records are returned in
+            random order within a window of this size. None disables record shuffling
+            seed: Seed used for file and record shuffling. When it is set the parallel reads keep a
+            deterministic order, so runs with the same seed return the same batches
+            use_cache: Whether to read the records from the binary cache of each file (see
+            tools.input_cache) instead of parsing the CSV. None uses the caches when all the files
+            have one, so a cache built by an earlier run is picked up automatically. True builds
+            missing caches too. Both rebuild outdated caches when the reader is created. False never
+            uses them
+            cache_dir: folder where the cache is stored. Defaults to the folder of each CSV file
+        """
+        self._sess = session
+        self._number_features = number_features
+        self._batch_size = batch_size
+        self._number_parallel_reads = number_parallel_reads
+        self._number_prefetch_batches = number_prefetch_batches
+        self._number_epochs = number_epochs
+        self._shuffle_files = shuffle_files
+        self._shuffle_buffer_size = shuffle_buffer_size
+        self._seed = seed
+
+        if use_cache is None:
+            use_cache = all(input_cache.has_cache(filename, cache_dir) for filename in filenames)
+
+        if use_cache:
+            self._define_cached_reader_graph(
+                [input_cache.get_or_create_cache(filename, number_features, cache_dir)[0]
+                 for filename in filenames])
+        else:
+            self._define_reader_graph(filenames)
+
+    def get_sample_batch(self):
+        """
+        This method is used to retrieve the next batch of samples from the input files
+        :return:
+            Tuple containing the next batch, the first element contains the batch of images
+            and the second their respective labels. Raises tf.errors.OutOfRangeError when all the
+            epochs have been read
+        """
+        return self._sess.run(self._get_batch)
+
+    def _define_reader_graph(self, filenames):
+        # Lines from number_parallel_reads files are read at the same time and interleaved
+        dataset = self._get_filenames_dataset(filenames).interleave(
+            tf.data.TextLineDataset, cycle_length=self._number_parallel_reads, block_length=1,
+            num_parallel_calls=self._number_parallel_reads)
+
+        dataset = self._shuffle_and_repeat(dataset)
+
+        # Lines are batched before decoding so decode_csv runs once per batch instead of once per line
+        dataset = dataset.batch(self._batch_size)
+        dataset = dataset.map(self._decode_lines, num_parallel_calls=self._number_parallel_reads)
+
+        self._define_get_batch_graph(dataset)
+
+    def _define_cached_reader_graph(self, features_paths):
+        # Records are already decoded, so they only need to be sliced from the memory mapped arrays
+        dataset = self._get_filenames_dataset(features_paths).interleave(
+            self._get_cached_records_dataset, cycle_length=self._number_parallel_reads, block_length=1,
+            num_parallel_calls=self._number_parallel_reads)
+
+        dataset = self._shuffle_and_repeat(dataset)
+        dataset = dataset.batch(self._batch_size)
+
+        self._define_get_batch_graph(dataset)
+
+    def _get_filenames_dataset(self, filenames):
+        dataset = tf.data.Dataset.from_tensor_slices(tf.constant(filenames, dtype=tf.string))
+
+        if self._shuffle_files:
+            # The file order is shuffled again every time the dataset is repeated
+            dataset = dataset.shuffle(len(filenames), seed=self._seed, reshuffle_each_iteration=True)
+
+        return dataset
+
+    def _shuffle_and_repeat(self, dataset):
+        if self._shuffle_buffer_size:
+            # Only shuffle_buffer_size records are held in memory to shuffle them
+            dataset = dataset.shuffle(
+                self._shuffle_buffer_size, seed=self._seed, reshuffle_each_iteration=True)
+
+        return dataset.repeat(self._number_epochs)
+
+    def _define_get_batch_graph(self, dataset):
+        if self._seed is not None:
+            # Parallel interleave and map return elements in the same order as their sequential
+            # versions, so with a seeded shuffle the whole pipeline is reproducible
+            options = tf.data.Options()
+            options.experimental_deterministic = True
+            dataset = dataset.with_options(options)
+
+        dataset = dataset.prefetch(self._number_prefetch_batches)
+        self._iterator = dataset.make_one_shot_iterator()
+        self._get_batch = self._iterator.get_next(name="get-batch")
+
+    def _get_cached_records_dataset(self, features_path):
+        blocks = tf.data.Dataset.from_generator(
+            self._read_cached_blocks, output_types=(tf.int32, tf.int32),
+            output_shapes=([None, self._number_features], [None]), args=(features_path,))
+        return blocks.flat_map(lambda features, target: tf.data.Dataset.from_tensor_slices((features, target)))
+
+    def _read_cached_blocks(self, features_path):
+        # Blocks of rows are copied out of the memory mapped arrays, so a file is never loaded at once
+        features_path = features_path.decode() if isinstance(features_path, bytes) else features_path
+        labels_path = features_path[:-len(".features.npy")] + ".labels.npy"
+        features, target = input_cache.load_cache(features_path, labels_path)
+        block_size = max(self._batch_size, 1024)
+
+        for start in range(0, features.shape[0], block_size):
+            yield features[start:start + block_size], target[start:start + block_size]
+
+    def _decode_lines(self, lines):
+        # Default values for columns. We specify one default value per column: label + features
+        record_default = [[0]] * (self._number_features + 1)
+        # From a batch of CSV strings to one tensor per column, each one with batch size elements
+        fields = tf.decode_csv(lines, record_defaults=record_default, name="decode-lines")
+        # Instead of having one tensor per feature, we want one tensor with shape (batch, features)
+        features = tf.stack(fields[1:], axis=1, name="stack-features")
+        target = fields[0]
+        return features, target
+
+
+class ImageDatasetInputReader(DatasetInputReader):
+
+    # Reads image files (JPEG, PNG, ...) and returns fixed shape batches (batch, height, width, 3)
+    # ready for ReducedResnetBuilder and CompleteResnetBuilder. Images are decoded and resized in
+    # parallel by number_parallel_calls threads inside the TF runtime.
+
+    def __init__(self, session, filenames, labels, height, width, batch_size, number_parallel_calls=8,
+                 bgr=True, **kwargs):
+        """
+        :param
+            session: TF session to use when running the operation in this class
+            filenames: List of paths to the images
+            labels: List with the label of each image
+            height: Height the images are resized to
+            width: Width the images are resized to
+            batch_size: Size of the mini batches that it will retrieve
+            number_parallel_calls: Number of images decoded and resized at the same time
+            bgr: True to return the channels in BGR order, like tools.image_tools.image_to_pixels
+            kwargs: number_prefetch_batches, number_epochs, shuffle_files, shuffle_buffer_size
+            and seed, as in DatasetInputReader
+        """
+        self._labels = labels
+        self._height = height
+        self._width = width
+        self._number_parallel_calls = number_parallel_calls
+        self._bgr = bgr
+        super().__init__(session, filenames, None, batch_size, use_cache=False, **kwargs)
+
+    def _define_reader_graph(self, filenames):
+        dataset = tf.data.Dataset.from_tensor_slices(
+            (tf.constant(filenames, dtype=tf.string), tf.constant(self._labels)))
+
+        if self._shuffle_files:
+            dataset = dataset.shuffle(len(filenames), seed=self._seed, reshuffle_each_iteration=True)
+
+        dataset = self._shuffle_and_repeat(dataset)
+
+        dataset = dataset.map(
+            lambda filename, target: (self._decode_image(tf.read_file(filename)), target),
+            num_parallel_calls=self._number_parallel_calls)
+        dataset = dataset.batch(self._batch_size)
+
+        self._define_get_batch_graph(dataset)
+
+    def _decode_image(self, encoded_image):
+        return decode_and_resize_image(encoded_image, self._height, self._width, self._bgr)
+
+
+class TFRecordDatasetInputReader(DatasetInputReader):
+
+    # Reads TFRecord files whose examples contain an encoded image and an integer label, and
+    # returns fixed shape batches (batch, height, width, 3). Files are read in parallel and images
+    # are decoded and resized by number_parallel_calls threads.
+
+    def __init__(self, session, filenames, height, width, batch_size, number_parallel_calls=8,
+                 image_feature="image", label_feature="label", bgr=True, **kwargs):
+        """
+        :param
+            session: TF session to use when running the operation in this class
+            filenames: List of TFRecord files
+            height: Height the images are resized to
+            width: Width the images are resized to
+            batch_size: Size of the mini batches that it will retrieve
+            number_parallel_calls: Number of images decoded and resized at the same time
+            image_feature: Name of the bytes feature that contains the encoded image
+            label_feature: Name of the int64 feature that contains the label
+            bgr: True to return the channels in BGR order, like tools.image_tools.image_to_pixels
+            kwargs: number_parallel_reads, number_prefetch_batches, number_epochs, shuffle_files,
+            shuffle_buffer_size and seed, as in DatasetInputReader
+        """
+        self._height = height
+        self._width = width
+        self._number_parallel_calls = number_parallel_calls
+        self._image_feature = image_feature
+        self._label_feature = label_feature
+        self._bgr = bgr
+        super().__init__(session, filenames, None, batch_size, use_cache=False, **kwargs)
+
+    def _define_reader_graph(self, filenames):
+        dataset = self._get_filenames_dataset(filenames).interleave(
+            tf.data.TFRecordDataset, cycle_length=self._number_parallel_reads, block_length=1,
+            num_parallel_calls=self._number_parallel_reads)
+
+        dataset = self._shuffle_and_repeat(dataset)
+        dataset = dataset.map(self._parse_example, num_parallel_calls=self._number_parallel_calls)
+        dataset = dataset.batch(self._batch_size)
+
+        self._define_get_batch_graph(dataset)
+
+    def _parse_example(self, serialized_example):
+        features = tf.parse_single_example(serialized_example, features={
+            self._image_feature: tf.FixedLenFeature([], tf.string),
+            self._label_feature: tf.FixedLenFeature([], tf.int64)})
+        image = decode_and_resize_image(features[self._image_feature], self._height, self._width, self._bgr)
+        return image, tf.cast(features[self._label_feature], tf.int32)
+
+
+def decode_and_resize_image(encoded_image, height, width, bgr=True):
+    """
+    Decodes an encoded image and resizes it with bicubic interpolation, like
+    tools.image_tools.resize_image
+
+    :param
+        encoded_image: String tensor with the encoded image (JPEG, PNG, BMP or GIF). Only the
+        first frame of animated GIFs is used
+        height: new height for the image
+        width: new width for the image
+        bgr: True to return the channels in BGR order
+    :return:
+        Float32 tensor with shape (height, width, 3)
+    """
+    image = tf.image.decode_image(encoded_image, channels=3)
+    # GIFs are decoded with shape (frames, height, width, 3), and only their first frame is used
+    image = tf.cond(tf.equal(tf.rank(image), 4), lambda: image[0], lambda: image)
+    # decode_image doesn't set the static shape, and resize needs to know the rank
+    image.set_shape([None, None, 3])
+    image = tf.image.resize_images(image, [height, width], method=tf.image.ResizeMethod.BICUBIC)
+    if bgr:
+        image = tf.reverse(image, axis=[-1])
+    return image
@@ -0,0 +1,41 @@
+from learning_rate.learning_rate_manager import LearningRateManager
+import math
+
+
+class CosineDecayLearningRateManager(LearningRateManager):
+
+    # Unit of the argument of update_learning_rate
+    update_unit = "step"
+
+    def __init__(self, initial_rate, decay_steps, alpha=0.0):
+        """
+        Learning rate that follows half a cosine from initial_rate to alpha * initial_rate
+
+        :param
+            initial_rate: initial learning rate to use at the beginning of training
+            decay_steps: number of steps until the learning rate reaches its minimum
+            alpha: minimum learning rate as a fraction of initial_rate
+        """
+        super().__init__()
+        self.initial_learning_rate = initial_rate
+        self.decay_steps = decay_steps
+        self.alpha = alpha
+        self.learning_rate = initial_rate
+
+    def get_learning_rate(self):
+        return self.learning_rate
+
+    def update_learning_rate(self, step):
+        progress = min(step, self.decay_steps) / float(self.decay_steps)
+        cosine = 0.5 * (1 + math.cos(math.pi * progress))
+        self.learning_rate = self.initial_learning_rate * ((1 - self.alpha) * cosine + self.alpha)
+        self._log_rate_limited("New learning rate is %s", self.learning_rate)
+
+    def get_learning_rate_tensor(self, global_step=None):
+        if global_step is None:
+            return super().get_learning_rate_tensor(global_step)
+
+        import tensorflow as tf
+        return tf.train.cosine_decay(
+            self.initial_learning_rate, global_step, self.decay_steps, alpha=self.alpha,
+            name="cosine_decay_learning_rate")
@@ -1,10 +1,11 @@
-from learning_rate.learning_rate_manager import LearningRateManager
+from learning_rate.learning_rate_manager import LearningRateManager, logger
 import numpy as np
 
 
 class ErrorPlateauLearningRateManager(LearningRateManager):
 
-    def __init__(self, initial_rate, threshold, number_steps):
+    def __init__(self, initial_rate, threshold, number_steps, factor=10, min_lr=0.00001,
+                 min_relative_improvement=None, patience=None, cooldown=0):
         """
         Initializes a LearningRate object
 
@@ -17,39 +18,157 @@ class ErrorPlateauLearningRateManager(LearningRateManager):
             number_steps: number of consecutive step errors to use in the calculation of the
             standard deviation to determine if the errors values are too close and there is a
             plateau
+
+            factor: the learning rate is divided by this value when there is a plateau
+
+            min_lr: the learning rate is never reduced below this value
+
+            min_relative_improvement: an error only counts as an improvement over the best error
+            seen so far if it is lower by at least this fraction of the best error
+
+            patience: if set, there is also a plateau when the error doesn't improve during this
+            number of consecutive steps
+
+            cooldown: number of steps after a reduction during which no plateau is detected and the
+            steps without improvement are not counted
         """
         super().__init__()
         self.learning_rate = initial_rate
         self.threshold = threshold
         self.number_steps = number_steps
-        self.previous_errors = []
+        self.factor = factor
+        self.min_lr = min_lr
+        self.min_relative_improvement = min_relative_improvement or 0.0
+        self.patience = patience
+        self.cooldown = cooldown
+
+        # Ring buffer with the last number_steps errors. The oldest error is at _next_index once
+        # the buffer is full
+        self._errors = np.zeros(number_steps)
+        self._next_index = 0
+        self._number_errors = 0
+        # Mean and sum of squared differences from the mean of the errors in the buffer, updated
+        # in O(1) per error (Welford's algorithm over a sliding window)
+        self._mean = 0.0
+        self._squared_differences = 0.0
+
+        self._best_error = None
+        self._steps_without_improvement = 0
+        self._cooldown_remaining = 0
+
+    @property
+    def previous_errors(self):
+        """
+        :return: List with the errors in the current window, from oldest to newest
+        """
+        if self._number_errors < self.number_steps:
+            return self._errors[:self._number_errors].tolist()
+        return np.roll(self._errors, -self._next_index).tolist()
 
     def get_learning_rate(self):
         return self.learning_rate
 
     def add_error(self, error):
-        # Concatenating new error to list of errors
-        self.previous_errors = self.previous_errors + [error]
-
-        # If there are more than N elements, clip the list to keep just the last N, where N is the
-        # number of errors to use for learning rate calculation
-        if len(self.previous_errors) > self.number_steps:
-            self.previous_errors = self.previous_errors[-self.number_steps:]
-            # Calculating standard deviation from last N errors added to the list
-            std = np.std(self.previous_errors)
-            # print(str(std))
-
-            # If standard deviation of errors is very little, error has plateau and we
-            # decrease learning rate
-            # Also we don't want to decrease the learning rate too much so it doesn't converge very
-            # slowly
-            if std <= self.threshold and self.learning_rate > 0.00001:
-                new_learning_rate = self.learning_rate / 10
-                print("Reducing learning rate from {} to {}".format(str(self.learning_rate),
-                                                                    str(new_learning_rate)))
-                self.learning_rate = new_learning_rate
-                # Once we reduce the learning rate we clean the previous errors, to start from
-                # scratch with the new rate
-                self.previous_errors = []
-
-        # print(str(self.previous_errors))
\ No newline at end of file
+        error = float(error)
+        window_was_full = self._number_errors == self.number_steps
+        self._add_to_window(error)
+        self._update_improvement(error)
+
+        if self._cooldown_remaining > 0:
+            self._cooldown_remaining -= 1
+            # Steps without improvement are only counted after the cooldown, so the new rate always
+            # gets patience steps to improve the error
+            self._steps_without_improvement = 0
+            return
+
+        # The standard deviation is checked once more than number_steps errors have been added
+        # since the last reduction, using the last number_steps of them
+        std_plateau = window_was_full and self._get_std() <= self.threshold
+        patience_plateau = self.patience is not None and self._steps_without_improvement >= self.patience
+
+        # If standard deviation of errors is very little, or the error hasn't improved for a while,
+        # error has plateau and we decrease learning rate
+        # Also we don't want to decrease the learning rate too much so it doesn't converge very
+        # slowly
+        if (std_plateau or patience_plateau) and self.learning_rate > self.min_lr:
+            new_learning_rate = max(self.learning_rate / self.factor, self.min_lr)
+            logger.info("Reducing learning rate from %s to %s", self.learning_rate, new_learning_rate)
+            self.learning_rate = new_learning_rate
+            # Once we reduce the learning rate we clean the previous errors, to start from
+            # scratch with the new rate
+            self._reset_window()
+            self._steps_without_improvement = 0
+            self._cooldown_remaining = self.cooldown
+
+    def state_dict(self):
+        """
+        :return: Dictionary with the configuration and state of the manager, which can be stored in
+        a checkpoint and restored with load_state_dict
+        """
+        return {"learning_rate": self.learning_rate,
+                "threshold": self.threshold,
+                "number_steps": self.number_steps,
+                "factor": self.factor,
+                "min_lr": self.min_lr,
+                "min_relative_improvement": self.min_relative_improvement,
+                "patience": self.patience,
+                "cooldown": self.cooldown,
+                "previous_errors": self.previous_errors,
+                "best_error": self._best_error,
+                "steps_without_improvement": self._steps_without_improvement,
+                "cooldown_remaining": self._cooldown_remaining}
+
+    def load_state_dict(self, state):
+        """
+        :param state: Dictionary returned by state_dict
+        """
+        self.learning_rate = state["learning_rate"]
+        self.threshold = state["threshold"]
+        self.number_steps = state["number_steps"]
+        self.factor = state["factor"]
+        self.min_lr = state["min_lr"]
+        self.min_relative_improvement = state["min_relative_improvement"]
+        self.patience = state["patience"]
+        self.cooldown = state["cooldown"]
+        self._best_error = state["best_error"]
+        self._steps_without_improvement = state["steps_without_improvement"]
+        self._cooldown_remaining = state["cooldown_remaining"]
+
+        self._errors = np.zeros(self.number_steps)
+        self._reset_window()
+        for error in state["previous_errors"]:
+            self._add_to_window(error)
+
+    def _add_to_window(self, error):
+        if self._number_errors < self.number_steps:
+            self._number_errors += 1
+            delta = error - self._mean
+            self._mean += delta / self._number_errors
+            self._squared_differences += delta * (error - self._mean)
+        else:
+            oldest_error = self._errors[self._next_index]
+            previous_mean = self._mean
+            self._mean += (error - oldest_error) / self.number_steps
+            self._squared_differences += \
+                (error - oldest_error) * (error - self._mean + oldest_error - previous_mean)
+
+        self._errors[self._next_index] = error
+        self._next_index = (self._next_index + 1) % self.number_steps
+
+    def _get_std(self):
+        # Rounding can make the sum slightly negative when all the errors are equal
+        return np.sqrt(max(self._squared_differences, 0.0) / self._number_errors)
+
+    def _reset_window(self):
+        self._next_index = 0
+        self._number_errors = 0
+        self._mean = 0.0
+        self._squared_differences = 0.0
+
+    def _update_improvement(self, error):
+        min_improvement = 0.0 if self._best_error is None else self.min_relative_improvement * abs(self._best_error)
+        if self._best_error is None or error < self._best_error - min_improvement:
+            self._best_error = error
+            self._steps_without_improvement = 0
+        else:
+            self._steps_without_improvement += 1
@@ -4,6 +4,9 @@ import math
 
 class ExponentialDecayLearningRateManager(LearningRateManager):
 
+    # Unit of the argument of update_learning_rate
+    update_unit = "epoch"
+
     def __init__(self, initial_rate, decay):
         super().__init__()
         self.initial_learning_rate = initial_rate
@@ -15,4 +18,19 @@ class ExponentialDecayLearningRateManager(LearningRateManager):
 
     def update_learning_rate(self, epoch):
         self.learning_rate = self.initial_learning_rate * math.exp(-self.decay * epoch)
-        print("New learning rate is {}".format(self.learning_rate))
+        self._log_rate_limited("New learning rate is %s", self.learning_rate)
+
+    def get_learning_rate_tensor(self, global_step=None, steps_per_epoch=None):
+        """
+        :param global_step: Global step tensor
+        :param steps_per_epoch: Number of steps in an epoch. The rate changes once per epoch, like
+        update_learning_rate
+        :return: Scalar tensor with initial_rate * exp(-decay * epoch), calculated in the graph
+        """
+        if global_step is None or steps_per_epoch is None:
+            return super().get_learning_rate_tensor(global_step)
+
+        import tensorflow as tf
+        return tf.train.exponential_decay(
+            self.initial_learning_rate, global_step, decay_steps=steps_per_epoch,
+            decay_rate=math.exp(-self.decay), staircase=True, name="exponential_decay_learning_rate")
@@ -1,8 +1,68 @@
 from abc import ABC, abstractmethod
+import logging
+import time
+
+
+logger = logging.getLogger(__name__)
 
 
 class LearningRateManager(ABC):
 
+    # Minimum number of seconds between two messages logged with _log_rate_limited
+    log_interval_seconds = 10.0
+
+    def __init__(self):
+        self._learning_rate_variable = None
+        self._new_learning_rate = None
+        self._assign_learning_rate = None
+        self._assigned_learning_rate = None
+        self._last_log_time = None
+
     @abstractmethod
     def get_learning_rate(self):
         pass
+
+    def get_learning_rate_tensor(self, global_step=None):
+        """
+        Returns a tensor with the learning rate that can be used when building the graph, so the
+        rate doesn't have to be fed on every session run.
+
+        By default it is a non trainable variable that holds the rate calculated in Python. Call
+        update_learning_rate_variable after the rate changes to assign the new value. Schedules that
+        only depend on the step override this method to calculate the rate in the graph from
+        global_step, and then no update is needed.
+
+        :param global_step: Global step tensor. Not used by the default implementation
+        :return: Scalar float32 tensor with the learning rate
+        """
+        import tensorflow as tf
+
+        if self._learning_rate_variable is None:
+            self._learning_rate_variable = tf.Variable(
+                self.get_learning_rate(), trainable=False, dtype=tf.float32, name="learning_rate")
+            self._new_learning_rate = tf.placeholder(tf.float32, shape=[], name="new_learning_rate")
+            self._assign_learning_rate = tf.assign(self._learning_rate_variable, self._new_learning_rate)
+            self._assigned_learning_rate = self.get_learning_rate()
+
+        return self._learning_rate_variable
+
+    def update_learning_rate_variable(self, session):
+        """
+        Assigns the current learning rate to the variable returned by get_learning_rate_tensor. It
+        only runs the assign operation when the rate changed since the last assign, so it is cheap
+        to call after every step.
+
+        :param session: TF session where the variable lives
+        """
+        if self._learning_rate_variable is None or self._assigned_learning_rate == self.get_learning_rate():
+            return
+
+        session.run(self._assign_learning_rate, feed_dict={self._new_learning_rate: self.get_learning_rate()})
+        self._assigned_learning_rate = self.get_learning_rate()
+
+    def _log_rate_limited(self, message, *args):
+        # Logs at most one message every log_interval_seconds, dropping the rest
+        now = time.monotonic()
+        if self._last_log_time is None or now - self._last_log_time >= self.log_interval_seconds:
+            self._last_log_time = now
+            logger.info(message, *args)
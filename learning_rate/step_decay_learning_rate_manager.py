@@ -0,0 +1,44 @@
+from learning_rate.learning_rate_manager import LearningRateManager
+import bisect
+
+
+class StepDecayLearningRateManager(LearningRateManager):
+
+    # Unit of the argument of update_learning_rate
+    update_unit = "step"
+
+    def __init__(self, boundaries, rates):
+        """
+        Piecewise constant learning rate
+
+        :param
+            boundaries: increasing list of steps where the learning rate changes
+            rates: list with one more element than boundaries. rates[i] is used for steps between
+            boundaries[i - 1] (included) and boundaries[i] (excluded)
+        """
+        super().__init__()
+        if len(rates) != len(boundaries) + 1:
+            raise Exception("Step decay needs one more rate than boundaries")
+        self.boundaries = list(boundaries)
+        self.rates = list(rates)
+        self.learning_rate = rates[0]
+
+    def get_learning_rate(self):
+        return self.learning_rate
+
+    def update_learning_rate(self, step):
+        new_learning_rate = self.rates[bisect.bisect_right(self.boundaries, step)]
+        if new_learning_rate != self.learning_rate:
+            self._log_rate_limited("New learning rate is %s", new_learning_rate)
+        self.learning_rate = new_learning_rate
+
+    def get_learning_rate_tensor(self, global_step=None):
+        if global_step is None:
+            return super().get_learning_rate_tensor(global_step)
+
+        import tensorflow as tf
+        # piecewise_constant uses boundaries[i - 1] < step <= boundaries[i], so the step is shifted
+        # to change the rate at the boundary step itself, like update_learning_rate
+        return tf.train.piecewise_constant(
+            tf.cast(global_step, tf.int64) + 1, [int(boundary) for boundary in self.boundaries],
+            [float(rate) for rate in self.rates], name="step_decay_learning_rate")
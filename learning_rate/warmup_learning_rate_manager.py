@@ -0,0 +1,66 @@
+from learning_rate.learning_rate_manager import LearningRateManager
+
+
+class WarmupLearningRateManager(LearningRateManager):
+
+    update_unit = "step"
+
+    def __init__(self, learning_rate_manager, warmup_steps, initial_fraction=0.0, steps_per_epoch=None):
+        """
+        Increases the learning rate linearly during the first warmup_steps steps, from
+        initial_fraction of the rate of learning_rate_manager up to that rate
+
+        :param
+            learning_rate_manager: manager that provides the learning rate after warmup
+            warmup_steps: number of warmup steps
+            initial_fraction: fraction of the learning rate used at step 0
+            steps_per_epoch: number of steps in an epoch. Needed when learning_rate_manager updates
+            its rate per epoch, like ExponentialDecayLearningRateManager
+        """
+        super().__init__()
+        if getattr(learning_rate_manager, "update_unit", "step") == "epoch" and steps_per_epoch is None:
+            raise Exception("steps_per_epoch is needed to warm up a learning rate updated per epoch")
+
+        self.learning_rate_manager = learning_rate_manager
+        self.warmup_steps = warmup_steps
+        self.initial_fraction = initial_fraction
+        self.steps_per_epoch = steps_per_epoch
+        self.step = 0
+
+    def get_learning_rate(self):
+        return self.learning_rate_manager.get_learning_rate() * self._get_warmup_factor(self.step)
+
+    def update_learning_rate(self, step):
+        """
+        :param step: current training step. It is also passed to the wrapped manager, converted to
+        epochs when the manager updates its rate per epoch
+        """
+        self.step = step
+        if hasattr(self.learning_rate_manager, "update_learning_rate"):
+            self.learning_rate_manager.update_learning_rate(
+                step // self.steps_per_epoch if self._wraps_epoch_manager() else step)
+
+    def get_learning_rate_tensor(self, global_step=None):
+        if global_step is None:
+            return super().get_learning_rate_tensor(global_step)
+
+        import tensorflow as tf
+        step = tf.cast(global_step, tf.float32)
+        warmup_factor = tf.minimum(
+            1.0, self.initial_fraction + (1 - self.initial_fraction) * step / float(self.warmup_steps))
+        if self._wraps_epoch_manager():
+            learning_rate = self.learning_rate_manager.get_learning_rate_tensor(
+                global_step, self.steps_per_epoch)
+        else:
+            learning_rate = self.learning_rate_manager.get_learning_rate_tensor(global_step)
+        return tf.multiply(learning_rate, warmup_factor, name="warmup_learning_rate")
+
+    def update_learning_rate_variable(self, session):
+        self.learning_rate_manager.update_learning_rate_variable(session)
+        super().update_learning_rate_variable(session)
+
+    def _wraps_epoch_manager(self):
+        return getattr(self.learning_rate_manager, "update_unit", "step") == "epoch"
+
+    def _get_warmup_factor(self, step):
+        return min(1.0, self.initial_fraction + (1 - self.initial_fraction) * step / float(self.warmup_steps))
@@ -0,0 +1,108 @@
+import numpy as np
+import tools.input_cache as input_cache
+
+
+class NumpyInputReader:
+
+    # Pure NumPy alternative to FileInputReader for inputs already converted to .npy files (see
+    # tools.input_cache). It doesn't need a TF session, queues or threads. The arrays are memory
+    # mapped, so processes reading the same files share the pages instead of holding copies.
+
+    def __init__(self, features, labels, batch_size, shuffle=False, seed=None, number_epochs=1,
+                 worker_rank=0, number_workers=1):
+        """
+        :param
+            features: Array with shape (records, features), or path to a .npy file with it
+            labels: Array with shape (records,), or path to a .npy file with it
+            batch_size: Size of the mini batches that it will retrieve. The last batch of each epoch
+            can be smaller
+            shuffle: True to return the records in a different random order every epoch
+            seed: Seed used for shuffling, so runs with the same seed are reproducible
+            number_epochs: Number of times the records are read. None repeats them indefinitely
+            worker_rank: Index of this worker, between 0 and number_workers - 1
+            number_workers: Number of workers reading the same arrays. Each one reads a disjoint
+            contiguous slice of the records
+        """
+        if not 0 <= worker_rank < number_workers:
+            raise Exception("Worker rank must be between 0 and the number of workers - 1")
+
+        features = np.load(features, mmap_mode='r') if isinstance(features, str) else features
+        labels = np.load(labels, mmap_mode='r') if isinstance(labels, str) else labels
+
+        if features.shape[0] != labels.shape[0]:
+            raise Exception("Number of records in features different from number of labels")
+
+        # Slices of memory mapped arrays are views, so sharding doesn't read or copy anything
+        shard_start = features.shape[0] * worker_rank // number_workers
+        shard_end = features.shape[0] * (worker_rank + 1) // number_workers
+        self._features = features[shard_start:shard_end]
+        self._labels = labels[shard_start:shard_end]
+
+        self._batch_size = batch_size
+        self._shuffle = shuffle
+        self._random_state = np.random.RandomState(seed)
+        self._number_epochs = number_epochs
+        self._epoch = 0
+        self._batches = self._iterate_epoch()
+
+    @classmethod
+    def from_csv_cache(cls, filename, number_features, batch_size, cache_dir=None, **kwargs):
+        """
+        Creates a reader for a CSV file, building its binary cache first if needed
+        :param
+            filename: path to the CSV file
+            number_features: Number of features that each record contains
+            batch_size: Size of the mini batches that it will retrieve
+            cache_dir: folder where the cache is stored. Defaults to the folder of the CSV file
+            kwargs: Rest of the arguments of NumpyInputReader
+        :return:
+            NumpyInputReader for the records in the file
+        """
+        features_path, labels_path = input_cache.get_or_create_cache(filename, number_features, cache_dir)
+        return cls(features_path, labels_path, batch_size, **kwargs)
+
+    @property
+    def number_records(self):
+        return self._features.shape[0]
+
+    def get_sample_batch(self):
+        """
+        This method is used to retrieve the next batch of samples
+        :return:
+            Tuple containing the next batch, the first element contains the batch of features
+            and the second their respective labels. Raises StopIteration when all the epochs have
+            been read
+        """
+        while True:
+            try:
+                return next(self._batches)
+            except StopIteration:
+                self._epoch += 1
+                if self._number_epochs is not None and self._epoch >= self._number_epochs:
+                    raise
+                if self.number_records == 0:
+                    raise
+                self._batches = self._iterate_epoch()
+
+    def iterate_epoch(self):
+        """
+        Generator over the batches of one full epoch, independent of get_sample_batch
+        :return:
+            Generator of (features, labels) tuples. The last one can be smaller than the batch size
+        """
+        return self._iterate_epoch()
+
+    def _iterate_epoch(self):
+        if not self._shuffle:
+            # Contiguous slices are views of the memory mapped arrays, so no data is copied
+            for start in range(0, self.number_records, self._batch_size):
+                yield self._features[start:start + self._batch_size], \
+                      self._labels[start:start + self._batch_size]
+            return
+
+        order = self._random_state.permutation(self.number_records)
+        for start in range(0, self.number_records, self._batch_size):
+            # Sorting the indices of a batch makes the gather read the file in order, and the
+            # order of the records within a batch doesn't matter
+            indices = np.sort(order[start:start + self._batch_size])
+            yield self._features[indices], self._labels[indices]
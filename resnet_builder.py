@@ -0,0 +1,268 @@
+import tensorflow as tf
+import resnet_spec
+
+
+class ResnetBuilder:
+
+    # Layers shared by ReducedResnetBuilder and CompleteResnetBuilder, which only differ in their
+    # initial layers and their table of stages
+
+    # Initial layers before the residual stages, in the format of resnet_spec.count_net_costs
+    STEM = None
+    # Dictionary from number of layers to list of resnet_spec.ResidualStage
+    STAGES = None
+
+    DATA_FORMATS = ("channels_last", "channels_first")
+
+    def __init__(self, kernel_initializer, width_multiplier=1.0, data_format="channels_last",
+                 fused_batch_norm=True, fold_batch_norm=False, mixed_precision=False):
+        """
+        :param kernel_initializer: Initializer for the kernels of all the convolutions
+        :param width_multiplier: Factor applied to the number of filters of every layer
+        :param data_format: Layout of the tensors inside the net, "channels_last" (NHWC) or
+        "channels_first" (NCHW). The input and the output of build_resnet are always NHWC; with
+        "channels_first" they are transposed once at the start and at the end. NCHW is usually
+        faster on GPU, while CPU kernels are optimized for NHWC
+        :param fused_batch_norm: True to use the fused kernel of batch normalization, which computes
+        it in a single operation
+        :param fold_batch_norm: True to build an inference only graph where every convolution has a
+        bias and there are no batch normalization layers. Its weights are loaded with
+        load_folded_weights from the weights of a graph built without folding
+        :param mixed_precision: True to compute the net in float16 while the variables are stored in
+        float32, so the updates of the optimizer don't lose precision. The input and the output of
+        build_resnet are float32. Training usually needs loss scaling so small gradients don't
+        underflow in float16
+        """
+        if data_format not in self.DATA_FORMATS:
+            raise Exception("Invalid data format: supported values are {}".format(self.DATA_FORMATS))
+        if fold_batch_norm and mixed_precision:
+            raise Exception("Folded nets can't use mixed precision")
+
+        self.kernel_initializer = kernel_initializer
+        self.width_multiplier = width_multiplier
+        self.data_format = data_format
+        self.fused_batch_norm = fused_batch_norm
+        self.fold_batch_norm = fold_batch_norm
+        self.mixed_precision = mixed_precision
+        # (convolution layer, batch normalization layer) of the last built net. The second one is
+        # None when batch normalization is folded
+        self.conv_batch_norm_layers = []
+        self._training = False
+        self._reuse = None
+
+    def build_resnet(self, input_batch, number_layers, training=False, scope=None, reuse=None):
+        """
+        :param input_batch: Tensor with the images, with shape (batch, height, width, channels)
+        :param number_layers: Number of layers of the net
+        :param training: Boolean or boolean tensor. In training mode batch normalization uses the
+        statistics of the batch and adds the updates of its moving averages to
+        tf.GraphKeys.UPDATE_OPS, which must be run with the training operation. Otherwise it uses
+        the moving averages. A tensor allows switching between both modes in the same graph
+        :param scope: Optional variable scope for all the variables of the net. Defaults to the
+        current variable scope
+        :param reuse: True (or tf.AUTO_REUSE) to use the variables of a net already built in the
+        same scope, for example an evaluation net that shares the weights of the training net
+        :return: Tensor with the output of the last residual unit, with shape
+        (batch, height, width, channels)
+        """
+        custom_getter = _get_float32_variable if self.mixed_precision else None
+
+        if scope is None and reuse is None and custom_getter is None:
+            return self._build_resnet(input_batch, number_layers, training, reuse)
+
+        scope = tf.get_variable_scope() if scope is None else scope
+        with tf.variable_scope(scope, reuse=reuse, custom_getter=custom_getter):
+            return self._build_resnet(input_batch, number_layers, training, reuse)
+
+    def _build_resnet(self, input_batch, number_layers, training, reuse):
+        net_info = self._get_net_info(number_layers)
+        stem = self._get_stem()
+        self.conv_batch_norm_layers = []
+        self._training = training
+        self._reuse = reuse
+
+        if self.mixed_precision:
+            input_batch = tf.cast(input_batch, tf.float16, name="InputToFloat16")
+
+        if self.data_format == "channels_first":
+            input_batch = tf.transpose(input_batch, [0, 3, 1, 2], name="InputToChannelsFirst")
+
+        init_batch_norm = self._add_conv_batch_norm(
+            input_batch, stem["filters"], stem["kernel_size"], stem["stride"], "InitialConvLayer",
+            "InitialConvBatch")
+        init_activation = tf.nn.leaky_relu(init_batch_norm, name="InitialConvRelu")
+
+        input_next_unit = init_activation
+
+        if stem["pool_stride"] > 1:
+            # TODO: Do we need batch normalization after max pool
+            input_next_unit = tf.layers.max_pooling2d(
+                init_activation, pool_size=3, strides=stem["pool_stride"], padding="SAME",
+                data_format=self.data_format, name="InitialMaxPool")
+
+        for stage_index, stage in enumerate(net_info):
+            for unit in range(1, stage.units + 1):
+                # The first unit of every stage but the first one halves height and width
+                strides = 2 if unit == 1 and stage_index > 0 else 1
+                input_next_unit = self._add_residual_unit_for_stage(input_next_unit, stage, unit, strides)
+
+        if self.data_format == "channels_first":
+            input_next_unit = tf.transpose(input_next_unit, [0, 2, 3, 1], name="OutputToChannelsLast")
+
+        if self.mixed_precision:
+            input_next_unit = tf.cast(input_next_unit, tf.float32, name="OutputToFloat32")
+
+        return input_next_unit
+
+    def get_stage_costs(self, number_layers, input_height, input_width, input_channels=3):
+        """
+        :param number_layers: Number of layers of the net
+        :param input_height: Height of the input images
+        :param input_width: Width of the input images
+        :param input_channels: Channels of the input images
+        :return: FLOPs and parameters of the initial layers and of each stage, for a single image.
+        See resnet_spec.count_net_costs
+        """
+        return resnet_spec.count_net_costs(
+            self._get_stem(), self._get_net_info(number_layers), input_height, input_width, input_channels)
+
+    def get_folded_weights(self, session):
+        """
+        Folds every batch normalization layer of the last built net into the convolution before it
+
+        :param session: Session with the trained variables of a net built without fold_batch_norm
+        :return: Dictionary from name of convolution layer to (kernel, bias) NumPy arrays
+        """
+        if self.fold_batch_norm:
+            raise Exception("The net is already folded")
+
+        variables = [(conv.kernel, conv.bias, batch_norm.gamma, batch_norm.beta, batch_norm.moving_mean,
+                      batch_norm.moving_variance) for conv, batch_norm in self.conv_batch_norm_layers]
+        values = session.run(variables)
+
+        return {conv.name: resnet_spec.fold_batch_norm(*layer_values, epsilon=batch_norm.epsilon)
+                for (conv, batch_norm), layer_values in zip(self.conv_batch_norm_layers, values)}
+
+    def load_folded_weights(self, session, folded_weights):
+        """
+        :param session: Session of the last built net, which must be built with fold_batch_norm
+        :param folded_weights: Dictionary returned by get_folded_weights
+        """
+        if not self.fold_batch_norm:
+            raise Exception("Folded weights can only be loaded in a net built with fold_batch_norm")
+
+        for conv, _ in self.conv_batch_norm_layers:
+            kernel, bias = folded_weights[conv.name]
+            conv.kernel.load(kernel, session)
+            conv.bias.load(bias, session)
+
+    def _add_conv_batch_norm(self, input_batch, filters, kernel_size, strides, conv_name, batch_norm_name):
+        # TODO: Understand why batch normalization before activation
+        # Without _reuse, a layer whose name is already used in the variable scope is renamed to
+        # name_1, so a reused net would look for variables that don't exist
+        conv_layer = tf.layers.Conv2D(
+            filters=filters, kernel_size=kernel_size, strides=[strides, strides], padding="SAME",
+            data_format=self.data_format, activation=None, use_bias=True,
+            kernel_initializer=self.kernel_initializer, name=conv_name, _reuse=self._reuse)
+        conv = conv_layer(input_batch)
+
+        if self.fold_batch_norm:
+            self.conv_batch_norm_layers.append((conv_layer, None))
+            return conv
+
+        batch_norm_layer = tf.layers.BatchNormalization(
+            axis=self._get_channels_axis(), fused=self.fused_batch_norm, name=batch_norm_name,
+            _reuse=self._reuse)
+        self.conv_batch_norm_layers.append((conv_layer, batch_norm_layer))
+        return batch_norm_layer(conv, training=self._training)
+
+    def _add_residual_unit_for_stage(self, input_batch, stage, unit_number, strides):
+        input_filters = self._get_channels(input_batch)
+
+        if stage.bottleneck:
+            return self._add_bottleneck_unit(input_batch, stage.filters, unit_number, strides)
+        elif strides != 1 or input_filters != stage.filters:
+            return self._add_residual_unit_with_changing_size(input_batch, stage.filters, unit_number, strides)
+        else:
+            return self._add_residual_unit(input_batch, stage.filters, unit_number)
+
+    def _add_residual_unit(self, input_batch, number_filters, unit_number):
+        identifier = "Filters" + str(number_filters) + "-Unit" + str(unit_number)
+
+        batch_norm_1 = self._add_conv_batch_norm(
+            input_batch, number_filters, 3, 1, identifier + "-Conv1", identifier + "-Batch1")
+        activation_1 = tf.nn.leaky_relu(batch_norm_1, name=identifier + "-Relu1")
+
+        batch_norm_2 = self._add_conv_batch_norm(
+            activation_1, number_filters, 3, 1, identifier + "-Conv2", identifier + "-Batch2")
+
+        addition = tf.add(input_batch, batch_norm_2, name=identifier + "-Add")
+
+        return tf.nn.leaky_relu(addition, name=identifier + "-Relu2")
+
+    def _add_bottleneck_unit(self, input_batch, number_filters, unit_number, strides):
+        identifier = "Filters" + str(number_filters) + "-Unit" + str(unit_number)
+        output_filters = number_filters * resnet_spec.BOTTLENECK_EXPANSION
+
+        batch_norm_1 = self._add_conv_batch_norm(
+            input_batch, number_filters, 1, 1, identifier + "-Conv1", identifier + "-Batch1")
+        activation_1 = tf.nn.leaky_relu(batch_norm_1, name=identifier + "-Relu1")
+
+        batch_norm_2 = self._add_conv_batch_norm(
+            activation_1, number_filters, 3, strides, identifier + "-Conv2", identifier + "-Batch2")
+        activation_2 = tf.nn.leaky_relu(batch_norm_2, name=identifier + "-Relu2")
+
+        batch_norm_3 = self._add_conv_batch_norm(
+            activation_2, output_filters, 1, 1, identifier + "-Conv3", identifier + "-Batch3")
+
+        shortcut = input_batch
+        if strides != 1 or self._get_channels(input_batch) != output_filters:
+            shortcut = self._add_conv_batch_norm(
+                input_batch, output_filters, 1, strides, identifier + "-ConvAdjustSize",
+                identifier + "-BatchAdjustSize")
+
+        addition = tf.add(shortcut, batch_norm_3, name=identifier + "-Add")
+
+        return tf.nn.leaky_relu(addition, name=identifier + "-Relu3")
+
+    def _add_residual_unit_with_changing_size(self, input_batch, number_filters, unit_number, strides=2):
+        identifier = "Filters" + str(number_filters) + "-Unit" + str(unit_number)
+
+        batch_norm_1 = self._add_conv_batch_norm(
+            input_batch, number_filters, 3, strides, identifier + "-Conv1", identifier + "-Batch1")
+        activation_1 = tf.nn.leaky_relu(batch_norm_1, name=identifier + "-Relu1")
+
+        batch_norm_size_change = self._add_conv_batch_norm(
+            input_batch, number_filters, 1, strides, identifier + "-ConvAdjustSize",
+            identifier + "-BatchAdjustSize")
+
+        batch_norm_2 = self._add_conv_batch_norm(
+            activation_1, number_filters, 3, 1, identifier + "-Conv2", identifier + "-Batch2")
+
+        addition = tf.add(batch_norm_size_change, batch_norm_2, name=identifier + "-Add")
+
+        return tf.nn.leaky_relu(addition, name=identifier + "-Relu2")
+
+    def _get_channels_axis(self):
+        return 1 if self.data_format == "channels_first" else -1
+
+    def _get_channels(self, tensor):
+        return int(tensor.get_shape()[self._get_channels_axis()])
+
+    def _get_net_info(self, number_layers):
+        return resnet_spec.get_net_info(self.STAGES, number_layers, self.width_multiplier)
+
+    def _get_stem(self):
+        stem = dict(self.STEM)
+        stem["filters"] = resnet_spec.scale_filters(stem["filters"], self.width_multiplier)
+        return stem
+
+
+def _get_float32_variable(getter, name, *args, **kwargs):
+    # Custom getter that stores the variables requested in float16 as float32 and casts them when
+    # they are read. Gradients flow through the cast, so the optimizer updates the float32 variables
+    if kwargs.get("dtype") != tf.float16:
+        return getter(name, *args, **kwargs)
+
+    kwargs["dtype"] = tf.float32
+    return tf.cast(getter(name, *args, **kwargs), tf.float16)
@@ -0,0 +1,170 @@
+import collections
+import math
+import numpy as np
+
+
+# Declarative description of the residual stages of the ResNet builders.
+#
+# Each stage is a set of residual units with the same number of filters. The first unit of every
+# stage except the first one halves the height and width. Basic units are two 3x3 convolutions.
+# Bottleneck units are a 1x1 convolution that reduces the channels to filters, a 3x3 convolution
+# and a 1x1 convolution that expands them to filters * BOTTLENECK_EXPANSION, which needs much less
+# computation than two 3x3 convolutions over the expanded channels.
+ResidualStage = collections.namedtuple("ResidualStage", ["filters", "units", "bottleneck"])
+
+BOTTLENECK_EXPANSION = 4
+
+
+def _basic_stages(filters_and_units):
+    return [ResidualStage(filters, units, False) for filters, units in filters_and_units]
+
+
+def _bottleneck_stages(filters_and_units):
+    return [ResidualStage(filters, units, True) for filters, units in filters_and_units]
+
+
+# Number of layers -> stages, for ReducedResnetBuilder (small inputs like CIFAR)
+REDUCED_RESNET_STAGES = {
+    15: _basic_stages([(16, 5), (32, 5), (64, 5)]),
+    20: _basic_stages([(16, 3), (32, 3), (64, 3)]),
+    44: _basic_stages([(16, 7), (32, 7), (64, 7)]),
+    56: _basic_stages([(16, 9), (32, 9), (64, 9)]),
+    110: _basic_stages([(16, 18), (32, 18), (64, 18)]),
+    164: _bottleneck_stages([(16, 18), (32, 18), (64, 18)])
+}
+
+# Number of layers -> stages, for CompleteResnetBuilder (ImageNet)
+COMPLETE_RESNET_STAGES = {
+    18: _basic_stages([(16, 2), (32, 2), (64, 2), (128, 2)]),
+    34: _basic_stages([(16, 3), (32, 4), (64, 6), (128, 3)]),
+    50: _bottleneck_stages([(16, 3), (32, 4), (64, 6), (128, 3)]),
+    101: _bottleneck_stages([(16, 3), (32, 4), (64, 23), (128, 3)]),
+    152: _bottleneck_stages([(16, 3), (32, 8), (64, 36), (128, 3)])
+}
+
+
+def get_net_info(stages_table, number_layers, width_multiplier=1.0):
+    """
+    :param stages_table: Dictionary from number of layers to list of ResidualStage
+    :param number_layers: Number of layers of the net
+    :param width_multiplier: Factor applied to the number of filters of every stage
+    :return: List of ResidualStage for the net
+    """
+    if number_layers not in stages_table:
+        raise Exception("Invalid number of layers for resnet: supported values are {}".format(
+            sorted(stages_table.keys())))
+
+    return [ResidualStage(scale_filters(stage.filters, width_multiplier), stage.units, stage.bottleneck)
+            for stage in stages_table[number_layers]]
+
+
+def scale_filters(filters, width_multiplier):
+    return max(1, int(round(filters * width_multiplier)))
+
+
+def get_stage_output_filters(stage):
+    return stage.filters * BOTTLENECK_EXPANSION if stage.bottleneck else stage.filters
+
+
+def count_net_costs(stem, stages, input_height, input_width, input_channels):
+    """
+    Counts the multiply-adds (FLOPs) and trainable parameters of each part of the net, for a single
+    image. Convolutions have a bias, and batch normalization layers have a scale and a shift per
+    channel. Convolutions use SAME padding.
+
+    :param stem: Dictionary with the initial layers: filters, kernel_size and stride of the initial
+    convolution, and pool_stride of the max pool after it (1 when there is no pool)
+    :param stages: List of ResidualStage
+    :param input_height: Height of the input images
+    :param input_width: Width of the input images
+    :param input_channels: Channels of the input images
+    :return: List of dictionaries, one for the initial layers and one per stage, with name, units,
+    output_shape (height, width, channels), flops and parameters
+    """
+    height, width = input_height, input_width
+    costs = []
+
+    height, width, flops, parameters = _count_conv_bn(
+        height, width, input_channels, stem["filters"], stem["kernel_size"], stem["stride"])
+    height, width = _get_output_size(height, stem["pool_stride"]), _get_output_size(width, stem["pool_stride"])
+    channels = stem["filters"]
+    costs.append({"name": "InitialConvLayer", "units": 0, "output_shape": (height, width, channels),
+                  "flops": flops, "parameters": parameters})
+
+    for stage_index, stage in enumerate(stages):
+        stage_flops = 0
+        stage_parameters = 0
+
+        for unit in range(1, stage.units + 1):
+            stride = 2 if unit == 1 and stage_index > 0 else 1
+            height, width, channels, unit_flops, unit_parameters = _count_unit(
+                height, width, channels, stage, stride)
+            stage_flops += unit_flops
+            stage_parameters += unit_parameters
+
+        costs.append({"name": "Filters" + str(stage.filters), "units": stage.units,
+                      "output_shape": (height, width, channels), "flops": stage_flops,
+                      "parameters": stage_parameters})
+
+    return costs
+
+
+def _count_unit(height, width, channels, stage, stride):
+    output_channels = get_stage_output_filters(stage)
+    flops = 0
+    parameters = 0
+
+    if stage.bottleneck:
+        layers = [(channels, stage.filters, 1, 1), (stage.filters, stage.filters, 3, stride),
+                  (stage.filters, output_channels, 1, 1)]
+    else:
+        layers = [(channels, stage.filters, 3, stride), (stage.filters, stage.filters, 3, 1)]
+
+    layer_height, layer_width = height, width
+    for layer_input_channels, layer_filters, kernel_size, layer_stride in layers:
+        layer_height, layer_width, layer_flops, layer_parameters = _count_conv_bn(
+            layer_height, layer_width, layer_input_channels, layer_filters, kernel_size, layer_stride)
+        flops += layer_flops
+        parameters += layer_parameters
+
+    # Projection of the input when the unit changes its size
+    if stride != 1 or channels != output_channels:
+        _, _, projection_flops, projection_parameters = _count_conv_bn(
+            height, width, channels, output_channels, 1, stride)
+        flops += projection_flops
+        parameters += projection_parameters
+
+    return layer_height, layer_width, output_channels, flops, parameters
+
+
+def _count_conv_bn(height, width, input_channels, filters, kernel_size, stride):
+    output_height = _get_output_size(height, stride)
+    output_width = _get_output_size(width, stride)
+    flops = kernel_size * kernel_size * input_channels * filters * output_height * output_width
+    # Kernel and bias of the convolution, and scale and shift of batch normalization
+    parameters = kernel_size * kernel_size * input_channels * filters + filters + 2 * filters
+    return output_height, output_width, flops, parameters
+
+
+def _get_output_size(size, stride):
+    return int(math.ceil(size / float(stride)))
+
+
+def fold_batch_norm(kernel, bias, gamma, beta, moving_mean, moving_variance, epsilon=0.001):
+    """
+    Folds an inference mode batch normalization layer into the convolution before it, so
+    conv(x, folded_kernel) + folded_bias == batch_norm(conv(x, kernel) + bias)
+
+    :param kernel: Kernel of the convolution, with the output channels in the last axis
+    :param bias: Bias of the convolution, with shape (output channels,)
+    :param gamma: Scale of batch normalization
+    :param beta: Shift of batch normalization
+    :param moving_mean: Mean used by batch normalization in inference mode
+    :param moving_variance: Variance used by batch normalization in inference mode
+    :param epsilon: Value added to the variance by batch normalization
+    :return: Tuple with the folded kernel and bias
+    """
+    scale = np.asarray(gamma) / np.sqrt(np.asarray(moving_variance) + epsilon)
+    folded_kernel = np.asarray(kernel) * scale
+    folded_bias = (np.asarray(bias) - moving_mean) * scale + beta
+    return folded_kernel.astype(np.asarray(kernel).dtype), folded_bias.astype(np.asarray(bias).dtype)
@@ -0,0 +1,281 @@
+import pandas as pd
+import numpy as np
+import matplotlib.pyplot as plt
+import tools.object_detection as od
+
+
+# IoU thresholds 0.5, 0.55, ..., 0.95 used to calculate mAP@[0.5:0.95]
+DEFAULT_IOU_THRESHOLDS = np.round(np.arange(0.5, 0.951, 0.05), 2)
+
+
+def match_scored_detections(gt_boxes, gt_classes, predicted_boxes, predicted_classes, predicted_scores,
+                            iou_thresholds):
+    """
+    Greedily matches the predicted objects of an image against its ground truth objects for several IoU thresholds at
+    once. Predicted objects are visited from highest to lowest score, and each one is matched to the unmatched ground
+    truth object of the same class with the highest IoU, if that IoU is greater or equal than the threshold.
+
+    This method assumes that the boxes have format [x1, y1, x2, y2].
+
+    :param gt_boxes: Array with shape (M, 4) containing the ground truth boxes
+    :param gt_classes: Array with shape (M,) containing the ground truth classes
+    :param predicted_boxes: Array with shape (N, 4) containing the predicted boxes
+    :param predicted_classes: Array with shape (N,) containing the predicted classes
+    :param predicted_scores: Array with shape (N,) containing the confidence of each prediction
+    :param iou_thresholds: Array with shape (T,) containing the IoU thresholds
+    :return: Boolean array with shape (N, T) that is true when the prediction is a true positive for the threshold
+    """
+    gt_classes = np.asarray(gt_classes).reshape(-1)
+    predicted_classes = np.asarray(predicted_classes).reshape(-1)
+    iou_thresholds = np.asarray(iou_thresholds, dtype=np.float64).reshape(-1)
+
+    true_positives = np.zeros((predicted_classes.shape[0], iou_thresholds.shape[0]), dtype=bool)
+
+    if predicted_classes.shape[0] == 0 or gt_classes.shape[0] == 0:
+        return true_positives
+
+    iou_matrix = od.calculate_iou_matrix(predicted_boxes, gt_boxes)
+    # IoU is only relevant between objects of the same class, the rest can never be matched
+    iou_matrix[predicted_classes[:, np.newaxis] != gt_classes[np.newaxis, :]] = -1
+
+    # Stable sort so predictions with the same score keep their original order
+    order = np.argsort(-np.asarray(predicted_scores, dtype=np.float64).reshape(-1), kind="stable")
+    # Predictions that don't overlap anything for the lowest threshold are false positives and don't need to be visited
+    order = order[np.max(iou_matrix[order], axis=1) >= iou_thresholds.min()]
+    sorted_ious = iou_matrix[order]
+
+    # (T, P, M) array that is true when the prediction overlaps the ground truth object enough for the threshold
+    candidates = sorted_ious[np.newaxis] >= iou_thresholds[:, np.newaxis, np.newaxis]
+    unresolved = np.ones((iou_thresholds.shape[0], order.shape[0]), dtype=bool)
+    gt_matched = np.zeros((iou_thresholds.shape[0], gt_classes.shape[0]), dtype=bool)
+    threshold_indices = np.arange(iou_thresholds.shape[0])[:, np.newaxis]
+    prediction_indices = np.arange(order.shape[0])[np.newaxis, :]
+
+    # Greedy matching resolved in rounds instead of one prediction at a time. In every round each unresolved
+    # prediction picks its best available ground truth object. The pick is final when the prediction is the first
+    # unresolved one that can take that object: no earlier prediction can take it, and earlier predictions can only
+    # remove objects, so the greedy order would give it the same object. The first unresolved prediction is always
+    # final, and images usually need a few rounds since only predictions that compete for an object wait
+    while True:
+        available = candidates & unresolved[:, :, np.newaxis] & ~gt_matched[:, np.newaxis, :]
+        # Predictions without available objects are false positives
+        unresolved &= np.any(available, axis=2)
+        if not np.any(unresolved):
+            break
+
+        best_gt = np.argmax(np.where(available, sorted_ious[np.newaxis], -1), axis=2)
+        first_candidate = np.argmax(available, axis=1)
+        final = unresolved & (first_candidate[threshold_indices, best_gt] == prediction_indices)
+
+        thresholds, predictions = np.nonzero(final)
+        true_positives[order[predictions], thresholds] = True
+        gt_matched[thresholds, best_gt[thresholds, predictions]] = True
+        unresolved[thresholds, predictions] = False
+
+    return true_positives
+
+
+def calculate_average_precision(precision, recall):
+    """
+    Calculates the area under precision-recall curves, after making precision monotonically decreasing (all-point
+    interpolation).
+
+    :param precision: Array with shape (K, T) containing T precision curves with K points sorted by increasing recall
+    :param recall: Array with shape (K, T) containing the recall of each point
+    :return: Array with shape (T,) containing the AP of each curve
+    """
+    if precision.shape[0] == 0:
+        return np.zeros(precision.shape[1:])
+
+    # Precision envelope: maximum precision at any recall greater or equal than the current one
+    envelope = np.maximum.accumulate(precision[::-1], axis=0)[::-1]
+    recall_steps = np.diff(recall, axis=0, prepend=0)
+    return np.sum(recall_steps * envelope, axis=0)
+
+
+class AveragePrecisionAnalysis:
+
+    # Whether add_record_arrays needs the scores of the predictions
+    uses_scores = True
+
+    def __init__(self, class_labels, iou_thresholds=DEFAULT_IOU_THRESHOLDS):
+        """
+        Gathers scored detections for a whole dataset and calculates average precision (AP), mean average precision
+        (mAP) and precision-recall curves from them.
+
+        For every image only the class, score and true positive flags of each prediction are kept, together with the
+        number of ground truth objects of each class. Sorting and cumulative sums are done once for the whole dataset
+        when the metrics are requested.
+
+        :param class_labels: List containing the names of the different classes
+        :param iou_thresholds: IoU thresholds at which predictions are matched. Defaults to 0.5:0.05:0.95
+        """
+        self.class_labels = list(class_labels)
+        self.class_indices = {class_label: index for index, class_label in enumerate(self.class_labels)}
+        self.iou_thresholds = np.asarray(iou_thresholds, dtype=np.float64).reshape(-1)
+        self.gt_counts = np.zeros(len(self.class_labels), dtype=np.int64)
+        self._classes = []
+        self._scores = []
+        self._true_positives = []
+        self._curves = None
+
+    def add_record(self, gt_objects, predicted_objects):
+        """
+        Adds the predictions of one image. We should call this method once per image that we predict.
+
+        This method assumes that the box has format [x1, y1, x2, y2] where (x1, y1) represents the top left corner and
+        (x2, y2) represents the bottom right corner.
+
+        :param gt_objects: Ground truth objects containing boxes and classes
+        :param predicted_objects: Predicted objects containing boxes, classes and scores
+        """
+        self.add_record_arrays(
+            [gt_object["bbox"] for gt_object in gt_objects],
+            [gt_object["class"] for gt_object in gt_objects],
+            [predicted_object["bbox"] for predicted_object in predicted_objects],
+            [predicted_object["class"] for predicted_object in predicted_objects],
+            [predicted_object["score"] for predicted_object in predicted_objects])
+
+    def add_record_arrays(self, gt_boxes, gt_classes, predicted_boxes, predicted_classes, predicted_scores):
+        """
+        Same as add_record, but takes the boxes, classes and scores of the image as arrays.
+
+        :param gt_boxes: Array with shape (M, 4) containing the ground truth boxes
+        :param gt_classes: Array with shape (M,) containing the ground truth class names
+        :param predicted_boxes: Array with shape (N, 4) containing the predicted boxes
+        :param predicted_classes: Array with shape (N,) containing the predicted class names
+        :param predicted_scores: Array with shape (N,) containing the confidence of each prediction
+        """
+        gt_class_indices = self._get_class_indices(gt_classes)
+        predicted_class_indices = self._get_class_indices(predicted_classes)
+        predicted_scores = np.asarray(predicted_scores, dtype=np.float64).reshape(-1)
+
+        true_positives = match_scored_detections(
+            gt_boxes, gt_class_indices, predicted_boxes, predicted_class_indices, predicted_scores,
+            self.iou_thresholds)
+
+        self.gt_counts += np.bincount(gt_class_indices, minlength=len(self.class_labels))
+        self._classes.append(predicted_class_indices)
+        self._scores.append(predicted_scores)
+        self._true_positives.append(true_positives)
+        self._curves = None
+
+    def get_average_precisions(self):
+        """
+        AP is the area under the precision-recall curve, after making precision monotonically decreasing (all-point
+        interpolation). Classes without ground truth objects have AP NaN.
+
+        :return: Pandas Dataframe with the AP of each class (rows) for each IoU threshold (columns)
+        """
+        average_precisions = np.full((len(self.class_labels), self.iou_thresholds.shape[0]), np.nan)
+
+        for class_index, (precision, recall) in enumerate(self._get_curves()):
+            if self.gt_counts[class_index] == 0:
+                continue
+            average_precisions[class_index] = calculate_average_precision(precision, recall)
+
+        return pd.DataFrame(average_precisions, columns=self.iou_thresholds, index=self.class_labels)
+
+    def get_mean_average_precision(self, iou_threshold=None):
+        """
+        mAP is the mean of the AP of all classes with ground truth objects
+
+        :param iou_threshold: IoU threshold to calculate mAP for. If None, mAP is averaged over all the IoU thresholds
+        (mAP@[0.5:0.95] with the default thresholds)
+        :return: mAP
+        """
+        average_precisions = self.get_average_precisions().values
+        valid_classes = self.gt_counts > 0
+
+        if not np.any(valid_classes):
+            return 0.0
+
+        if iou_threshold is None:
+            return round(float(np.mean(average_precisions[valid_classes])), 3)
+
+        return round(float(np.mean(average_precisions[valid_classes, self._get_threshold_index(iou_threshold)])), 3)
+
+    def get_mean_average_precisions(self):
+        """
+        :return: Dictionary from each IoU threshold to the mAP at that threshold
+        """
+        return {float(iou_threshold): self.get_mean_average_precision(iou_threshold)
+                for iou_threshold in self.iou_thresholds}
+
+    def get_precision_recall_curve(self, class_name, iou_threshold=0.5):
+        """
+        :param class_name: Class name to get the curve for
+        :param iou_threshold: IoU threshold used to match the predictions
+        :return: Tuple with the precision and recall arrays, one element per prediction of the class sorted by score
+        """
+        precision, recall = self._get_curves()[self.class_indices[class_name]]
+        threshold_index = self._get_threshold_index(iou_threshold)
+        return precision[:, threshold_index], recall[:, threshold_index]
+
+    def generate_precision_recall_graph(self, output_path, iou_threshold=0.5):
+        """
+        :param output_path: Path to folder where image containing the graph will be saved
+        :param iou_threshold: IoU threshold used to match the predictions
+        :return: Saves a graph with the precision-recall curve of each class into a file
+        """
+        fig, ax = plt.subplots()
+
+        for class_name in self.class_labels:
+            precision, recall = self.get_precision_recall_curve(class_name, iou_threshold)
+            ax.plot(recall, precision, label=str(class_name))
+
+        ax.set_xlabel("Recall")
+        ax.set_ylabel("Precision")
+        ax.set_xlim(0, 1)
+        ax.set_ylim(0, 1.05)
+        ax.set_title("Precision-recall at IoU {}".format(iou_threshold))
+        ax.legend()
+
+        fig.savefig(output_path + "/precision-recall.png")
+
+    def _get_curves(self):
+        """
+        Calculates the precision and recall curves of every class for every threshold with one sort and one cumulative
+        sum over all the detections of the dataset.
+
+        :return: List with one (precision, recall) tuple per class. Each element has shape (detections of class, T)
+        """
+        if self._curves is not None:
+            return self._curves
+
+        number_thresholds = self.iou_thresholds.shape[0]
+        classes = np.concatenate(self._classes) if self._classes else np.zeros(0, dtype=np.int64)
+        scores = np.concatenate(self._scores) if self._scores else np.zeros(0)
+        true_positives = np.concatenate(self._true_positives) if self._true_positives \
+            else np.zeros((0, number_thresholds), dtype=bool)
+
+        # Group detections by class and sort each group by decreasing score
+        order = np.lexsort((-scores, classes))
+        classes = classes[order]
+        cumulative_true_positives = np.cumsum(true_positives[order], axis=0)
+
+        class_starts = np.searchsorted(classes, np.arange(len(self.class_labels)), side="left")
+        class_ends = np.searchsorted(classes, np.arange(len(self.class_labels)), side="right")
+
+        curves = []
+        for class_index, (start, end) in enumerate(zip(class_starts, class_ends)):
+            # Cumulative sum restarted at the first detection of the class
+            offset = cumulative_true_positives[start - 1] if start > 0 else np.zeros(number_thresholds)
+            class_true_positives = cumulative_true_positives[start:end] - offset
+            number_detections = np.arange(1, end - start + 1)[:, np.newaxis]
+
+            precision = class_true_positives / number_detections
+            recall = class_true_positives / max(self.gt_counts[class_index], 1)
+            curves.append((precision, recall))
+
+        self._curves = curves
+        return curves
+
+    def _get_threshold_index(self, iou_threshold):
+        matches = np.flatnonzero(np.isclose(self.iou_thresholds, iou_threshold))
+        if matches.shape[0] == 0:
+            raise Exception("IoU threshold {} was not used to match the predictions".format(iou_threshold))
+        return matches[0]
+
+    def _get_class_indices(self, classes):
+        return np.array([self.class_indices[class_name] for class_name in classes], dtype=np.int64)
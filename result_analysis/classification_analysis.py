@@ -7,12 +7,24 @@ class ClassificationAnalysis:
 
     def __init__(self, class_labels):
         """
-        Confusion matrix represented as a Pandas Dataframe with labels
+        Confusion matrix kept as an integer array with one row per ground truth class and one column per predicted
+        class. The labelled Pandas Dataframe is only built when confusion_matrix is accessed.
 
         :param class_labels: List containing the names of the different classes that we will use to index the
         confusion matrix
         """
-        self.confusion_matrix = pd.DataFrame(0, columns=class_labels, index=class_labels)
+        self.class_labels = list(class_labels)
+        self.class_indices = {class_label: index for index, class_label in enumerate(self.class_labels)}
+        self.confusion_counts = np.zeros((len(self.class_labels), len(self.class_labels)), dtype=np.int64)
+        # When the labels are integers themselves, integer inputs are labels and not positions in class_labels
+        self._integer_labels = all(isinstance(class_label, (int, np.integer)) for class_label in self.class_labels)
+
+    @property
+    def confusion_matrix(self):
+        """
+        :return: Pandas Dataframe with the confusion matrix, ground truth classes as rows and predicted as columns
+        """
+        return pd.DataFrame(self.confusion_counts, columns=self.class_labels, index=self.class_labels)
 
     def add_record(self, gt_class, predicted_class):
         """
@@ -22,7 +34,7 @@ class ClassificationAnalysis:
         :param gt_class: Name of the ground truth class
         :param predicted_class: Name of the predicted class
         """
-        self.confusion_matrix.loc[gt_class, predicted_class] += 1
+        self.confusion_counts[self.class_indices[gt_class], self.class_indices[predicted_class]] += 1
 
     def add_records(self, gt_classes, predicted_classes):
         """
@@ -30,11 +42,43 @@ class ClassificationAnalysis:
         in gt_classes and predicted_classes matters. Element in index i if gt_classes must be the ground truth class
         for the predicted class in index i of predicted_classes.
 
-        :param gt_classes: List of ground truth classes
-        :param predicted_classes: List of predicted classes
+        Both arguments can contain class names or integer class ids (positions in class_labels). All the pairs are
+        added in one vectorized step, with np.add.at for batches much smaller than the confusion matrix and by counting
+        the encoded (gt, predicted) pairs with bincount otherwise.
+
+        :param gt_classes: List or array of ground truth classes
+        :param predicted_classes: List or array of predicted classes
+        """
+        self._add_class_indices(self._get_class_indices(gt_classes), self._get_class_indices(predicted_classes))
+
+    def _add_class_indices(self, gt_indices, predicted_indices):
+        if gt_indices.shape[0] != predicted_indices.shape[0]:
+            raise Exception("Number of ground truth classes different from number of predicted classes")
+
+        number_classes = len(self.class_labels)
+
+        # bincount allocates and adds the whole C x C matrix on every call, which for small batches with many classes
+        # costs more than adding the samples one by one
+        if gt_indices.shape[0] * 32 < number_classes ** 2:
+            np.add.at(self.confusion_counts, (gt_indices, predicted_indices), 1)
+            return
+
+        pair_counts = np.bincount(gt_indices * number_classes + predicted_indices, minlength=number_classes ** 2)
+        self.confusion_counts += pair_counts.reshape(number_classes, number_classes)
+
+    def merge(self, other):
+        """
+        Adds the confusion matrix of another analyzer to this one. Use it to combine the results of analyzers that
+        processed disjoint sets of samples, for example in different processes.
+
+        :param other: ClassificationAnalysis with the same class labels
+        :return: This analyzer, after adding the counts of other
         """
-        for gt_class, predicted_class in zip(gt_classes, predicted_classes):
-            self.confusion_matrix.loc[gt_class, predicted_class] += 1
+        if other.class_labels != self.class_labels:
+            raise Exception("Can't merge classification analyzers with different class labels")
+
+        self.confusion_counts += other.confusion_counts
+        return self
 
     def get_class_precision(self, class_name):
         """
@@ -47,8 +91,9 @@ class ClassificationAnalysis:
         :param class_name: Class name to calculate the precision for
         :return: precision of class class_name
         """
-        true_positive = self.confusion_matrix.loc[class_name, class_name]
-        total_positive = self.confusion_matrix.loc[:, class_name].sum(axis=0)
+        class_index = self.class_indices[class_name]
+        true_positive = self.confusion_counts[class_index, class_index]
+        total_positive = self.confusion_counts[:, class_index].sum(axis=0)
         return round(true_positive / total_positive, 3)
 
     def get_class_recall(self, class_name):
@@ -62,8 +107,9 @@ class ClassificationAnalysis:
         :param class_name: Class name to calculate the recall for
         :return: recall of class class_name
         """
-        true_positive = self.confusion_matrix.loc[class_name, class_name]
-        total = self.confusion_matrix.loc[class_name, :].sum(axis=0)
+        class_index = self.class_indices[class_name]
+        true_positive = self.confusion_counts[class_index, class_index]
+        total = self.confusion_counts[class_index, :].sum(axis=0)
         return round(true_positive / total, 3)
 
     def get_class_f1(self, class_name):
@@ -78,13 +124,63 @@ class ClassificationAnalysis:
         recall = self.get_class_recall(class_name)
         return round((2 * precision * recall) / (precision + recall), 3)
 
+    def get_metrics_report(self, zero_division=0.0):
+        """
+        Calculates precision, recall, F1 and support (number of ground truth samples) for all classes at once from the
+        confusion matrix, plus their macro (mean over classes), micro (from the total counts) and weighted (mean
+        weighted by support) averages.
+
+        :param zero_division: Value returned for a metric whose denominator is 0, for example the precision of a class
+        that was never predicted
+        :return: Pandas Dataframe with one row per class and one per average, and columns precision, recall, f1 and
+        support
+        """
+        true_positives = np.diag(self.confusion_counts).astype(np.float64)
+        predicted = self.confusion_counts.sum(axis=0).astype(np.float64)
+        support = self.confusion_counts.sum(axis=1)
+
+        precision = _divide(true_positives, predicted, zero_division)
+        recall = _divide(true_positives, support, zero_division)
+        f1 = _divide(2 * precision * recall, precision + recall, zero_division)
+
+        # In single label classification micro precision, recall and F1 are all the accuracy
+        micro = _divide(true_positives.sum(), support.sum(), zero_division)
+        total_support = support.sum()
+        weights = support / total_support if total_support > 0 else np.zeros(support.shape[0])
+
+        class_rows = np.column_stack([precision, recall, f1, support])
+        average_rows = np.array([
+            [precision.mean(), recall.mean(), f1.mean(), total_support],
+            [micro, micro, micro, total_support],
+            [np.dot(weights, precision), np.dot(weights, recall), np.dot(weights, f1), total_support]])
+
+        report = pd.DataFrame(np.vstack([class_rows, average_rows]).round(3),
+                              columns=["precision", "recall", "f1", "support"],
+                              index=self.class_labels + ["macro avg", "micro avg", "weighted avg"])
+        report["support"] = report["support"].astype(np.int64)
+        return report
+
+    def _get_class_indices(self, classes):
+        classes = np.asarray(classes).reshape(-1)
+
+        if np.issubdtype(classes.dtype, np.integer) and not self._integer_labels:
+            if classes.shape[0] > 0 and (classes.min() < 0 or classes.max() >= len(self.class_labels)):
+                raise Exception("Class ids must be between 0 and {}".format(len(self.class_labels) - 1))
+            return classes.astype(np.int64)
+
+        # Every distinct label is looked up once and mapped back to all its occurrences
+        unique_classes, inverse = np.unique(classes, return_inverse=True)
+        unique_indices = np.array([self.class_indices[class_name] for class_name in unique_classes.tolist()],
+                                  dtype=np.int64)
+        return unique_indices[inverse.reshape(-1)]
+
     def generate_confusion_matrix_heat_map(self, output_path):
         """
         :param output_path: Path to folder where image containing heat map will be saved
         :return: Saves confusion matrix heat map into a file
         """
-        labels = list(self.confusion_matrix.columns.values)
-        numpy_matrix = self.confusion_matrix.values
+        labels = self.class_labels
+        numpy_matrix = self.confusion_counts
 
         fig, ax = plt.subplots()
 
@@ -103,3 +199,10 @@ class ClassificationAnalysis:
         # plt.show()
         fig.savefig(output_path + "/confusion-matrix.png")
 
+
+def _divide(numerator, denominator, zero_division):
+    numerator = np.asarray(numerator, dtype=np.float64)
+    denominator = np.asarray(denominator, dtype=np.float64)
+    result = np.full(np.broadcast(numerator, denominator).shape, float(zero_division))
+    np.divide(numerator, denominator, out=result, where=denominator != 0)
+    return result
@@ -0,0 +1,173 @@
+import ast
+import json
+import re
+import numpy as np
+from result_analysis.image_detection_analysis import ImageDetectionAnalysis
+
+
+# NumPy values written with str() by older versions of write_image_detection_predictions_to_file
+_NUMPY_ARRAY_PATTERN = re.compile(r"array\((\[[^\[\]]*\])(?:,\s*dtype=[\w.]+)?\)")
+_NUMPY_SCALAR_PATTERN = re.compile(r"np\.\w+\(([^()]*)\)")
+
+
+def parse_detection_record(line):
+    """
+    Parses one line of a detection results file. Lines can be JSON objects written by ResultsSink or
+    Python dictionaries written with str() by write_image_detection_predictions_to_file. The second
+    ones are parsed with ast.literal_eval, so nothing in the file is executed.
+
+    :param line: Line of the results file
+    :return: Dictionary with image_name, gt_boxes (M, 4), gt_classes (M,), predicted_boxes (N, 4),
+    predicted_classes (N,) and predicted_scores (N,), which is None when the file has no scores
+    """
+    line = line.strip()
+
+    if line.startswith("{\""):
+        record = json.loads(line)
+    else:
+        record = _parse_legacy_record(line)
+
+    predicted_scores = record.get("predicted_scores")
+    return {"image_name": record["image_name"],
+            "gt_boxes": np.asarray(record["gt_boxes"], dtype=np.float64).reshape(-1, 4),
+            "gt_classes": np.asarray(record["gt_classes"]).reshape(-1),
+            "predicted_boxes": np.asarray(record["predicted_boxes"], dtype=np.float64).reshape(-1, 4),
+            "predicted_classes": np.asarray(record["predicted_classes"]).reshape(-1),
+            "predicted_scores": None if predicted_scores is None
+            else np.asarray(predicted_scores, dtype=np.float64).reshape(-1)}
+
+
+def _parse_legacy_record(line):
+    line = _NUMPY_SCALAR_PATTERN.sub(r"\1", _NUMPY_ARRAY_PATTERN.sub(r"\1", line))
+    record = ast.literal_eval(line)
+    predicted_objects = record.get("predicted_objects", record.get("predicted_object", []))
+
+    return {"image_name": record["image_name"],
+            "gt_boxes": [gt_object["bbox"] for gt_object in record["gt_objects"]],
+            "gt_classes": [gt_object["class"] for gt_object in record["gt_objects"]],
+            "predicted_boxes": [predicted_object["bbox"] for predicted_object in predicted_objects],
+            "predicted_classes": [predicted_object["class"] for predicted_object in predicted_objects]}
+
+
+class DetectionResultsReader:
+
+    def __init__(self, results_file):
+        """
+        Reads a detection results file incrementally. The reader remembers the byte offset up to
+        which the file has been processed, so after new results are appended only the new tail is
+        read.
+
+        :param results_file: File written by write_image_detection_predictions_to_file
+        """
+        self.results_file = results_file
+        self.offset = 0
+        self.number_records = 0
+
+    def read_new_batches(self, batch_size=1000):
+        """
+        Reads the records appended since the last call. A line that is still being written (without
+        end of line) is left for the next call. The position of the reader only moves past a batch
+        when the next one is requested, so a batch whose processing raises is read again by the next
+        call.
+
+        :param batch_size: Maximum number of records per batch
+        :return: Generator of batches. Each batch is a dictionary with the fields of
+        parse_detection_record as lists with one element per image
+        """
+        for batch, _, end_offset in self._read_batches(self.offset, batch_size):
+            yield batch
+            self.offset = end_offset
+            self.number_records += len(batch["image_name"])
+
+    def update_analysis(self, analyzer, batch_size=1000):
+        """
+        Adds the records appended since the last call to an analyzer. The position of the reader
+        moves past every record as soon as it is added, so if the analyzer raises (for example with an
+        unknown class), the position stays before the failing record and the same analyzer can be
+        updated again without counting any record twice
+
+        :param analyzer: ImageDetectionAnalysis or AveragePrecisionAnalysis. The second one needs
+        files with scores
+        :param batch_size: Number of records parsed before they are added to the analyzer
+        :return: The analyzer
+        """
+        for batch, record_end_offsets, end_offset in self._read_batches(self.offset, batch_size):
+            for index, record_end_offset in enumerate(record_end_offsets):
+                _add_record(analyzer, batch, index)
+                self.offset = record_end_offset
+                self.number_records += 1
+            # Skips the empty lines after the last record
+            self.offset = end_offset
+        return analyzer
+
+    def rescore(self, class_labels, iou_threshold, batch_size=1000):
+        """
+        Scores all the records in the file again at a different IoU threshold, without running the
+        network again. Only the records read so far are used, and the file position of the reader
+        doesn't change.
+
+        :param class_labels: List containing the names of the different classes
+        :param iou_threshold: Minimum IoU for a predicted object to overlap a ground truth object
+        :param batch_size: Number of records parsed before they are added to the analyzer
+        :return: ImageDetectionAnalysis with the new threshold
+        """
+        analyzer = ImageDetectionAnalysis(class_labels, iou_threshold)
+
+        for batch, _, _ in self._read_batches(0, batch_size, self.offset):
+            for index in range(len(batch["image_name"])):
+                _add_record(analyzer, batch, index)
+
+        return analyzer
+
+    def _read_batches(self, start, batch_size, end=None):
+        # Yields (batch, byte offset after each record, byte offset after the last line) for the
+        # complete lines between start and end
+        batch = []
+        record_end_offsets = []
+        end_offset = start
+
+        for position, line in self._iterate_lines(start, end):
+            end_offset = position + len(line)
+
+            if line.strip():
+                batch.append(parse_detection_record(line.decode("utf-8")))
+                record_end_offsets.append(end_offset)
+
+            if len(batch) == batch_size:
+                yield _to_columns(batch), record_end_offsets, end_offset
+                batch = []
+                record_end_offsets = []
+
+        if batch:
+            yield _to_columns(batch), record_end_offsets, end_offset
+
+    def _iterate_lines(self, start, end=None):
+        # Yields (byte offset, line) for the complete lines between start and end
+        with open(self.results_file, 'rb') as results:
+            results.seek(start)
+            position = start
+
+            for line in results:
+                if (end is not None and position >= end) or not line.endswith(b"\n"):
+                    return
+                yield position, line
+                position += len(line)
+
+
+def _to_columns(records):
+    return {field: [record[field] for record in records] for field in records[0]}
+
+
+def _add_record(analyzer, batch, index):
+    # add_record_arrays of both analyzers validates the classes before changing any count, so a record
+    # that raises isn't partially added
+    if analyzer.uses_scores:
+        if batch["predicted_scores"][index] is None:
+            raise Exception("Results file doesn't contain scores for image {}".format(batch["image_name"][index]))
+        analyzer.add_record_arrays(
+            batch["gt_boxes"][index], batch["gt_classes"][index], batch["predicted_boxes"][index],
+            batch["predicted_classes"][index], batch["predicted_scores"][index])
+    else:
+        analyzer.add_record_arrays(
+            batch["gt_boxes"][index], batch["gt_classes"][index], batch["predicted_boxes"][index],
+            batch["predicted_classes"][index])
@@ -1,18 +1,116 @@
+import multiprocessing
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 import tools.object_detection as od
 
 
+# Metrics that each predicted or ground truth object can be assigned to. The position of each metric in METRIC_NAMES
+# is the column it occupies in the metric table
+IOU_OVER_5_AND_SAME_CLASS = 0
+IOU_OVER_5_AND_DIFF_CLASS = 1
+GT_NOT_FOUND = 2
+IOU_BELOW_5 = 3
+DUPLICATE = 4
+
+METRIC_NAMES = ["iou_over_5_and_same_class", "iou_over_5_and_diff_class", "gt_not_found", "iou_below_5", "duplicate"]
+
+
+def match_detections(gt_boxes, gt_classes, predicted_boxes, predicted_classes, iou_threshold=0.5):
+    """
+    Assigns a metric to every predicted object in an image by matching it against the ground truth objects. None of
+    the inputs are modified.
+
+    Predicted objects are processed in order. Each one is assigned, by priority:
+        - IOU_OVER_5_AND_SAME_CLASS if it overlaps an unmatched ground truth object of the same class. The ground truth
+          object with the highest IoU is marked as matched
+        - DUPLICATE if it only overlaps ground truth objects of the same class that were already matched
+        - IOU_OVER_5_AND_DIFF_CLASS if it overlaps ground truth objects of a different class
+        - IOU_BELOW_5 otherwise
+
+    Two objects overlap when their IoU is greater or equal than iou_threshold.
+
+    This method assumes that the boxes have format [x1, y1, x2, y2].
+
+    :param gt_boxes: Array with shape (M, 4) containing the ground truth boxes
+    :param gt_classes: Array with shape (M,) containing the ground truth classes
+    :param predicted_boxes: Array with shape (N, 4) containing the predicted boxes
+    :param predicted_classes: Array with shape (N,) containing the predicted classes
+    :param iou_threshold: Minimum IoU for a predicted object to overlap a ground truth object
+    :return: Tuple with an integer array with shape (N,) containing the metric for each predicted object and a boolean
+    array with shape (M,) that is true for the ground truth objects that were matched
+    """
+    gt_classes = np.asarray(gt_classes).reshape(-1)
+    predicted_classes = np.asarray(predicted_classes).reshape(-1)
+
+    iou_matrix = od.calculate_iou_matrix(predicted_boxes, gt_boxes)
+    overlapping = iou_matrix >= iou_threshold
+    same_class = predicted_classes[:, np.newaxis] == gt_classes[np.newaxis, :]
+    candidates = overlapping & same_class
+
+    # Metrics that don't depend on which ground truth objects are already matched can be assigned in one pass
+    metrics = np.where(np.any(overlapping & ~same_class, axis=1), IOU_OVER_5_AND_DIFF_CLASS, IOU_BELOW_5)
+    gt_matched = np.zeros(gt_classes.shape[0], dtype=bool)
+
+    # Matching is greedy, so only predictions that overlap an object of the same class need to be visited in order
+    for prediction in np.flatnonzero(np.any(candidates, axis=1)):
+        available = candidates[prediction] & ~gt_matched
+
+        if np.any(available):
+            # argmax returns the first ground truth object in case of ties, like the sequential scan used to
+            best_gt = np.argmax(np.where(available, iou_matrix[prediction], -1))
+            gt_matched[best_gt] = True
+            metrics[prediction] = IOU_OVER_5_AND_SAME_CLASS
+        else:
+            metrics[prediction] = DUPLICATE
+
+    return metrics, gt_matched
+
+
+def analyze_records_in_parallel(class_labels, records, number_processes=None, iou_threshold=0.5):
+    """
+    Scores a list of images across a pool of processes. Records are split in one contiguous shard per process, each
+    process accumulates its shard in its own ImageDetectionAnalysis and the counts of all shards are merged at the end.
+
+    :param class_labels: List containing the names of the different classes
+    :param records: List of (gt_objects, predicted_objects) tuples, one per image, in the format used by add_record
+    :param number_processes: Number of processes in the pool. Defaults to the number of CPUs
+    :param iou_threshold: Minimum IoU for a predicted object to overlap a ground truth object
+    :return: ImageDetectionAnalysis containing the counts of all the records
+    """
+    number_processes = number_processes or multiprocessing.cpu_count()
+    analyzer = ImageDetectionAnalysis(class_labels, iou_threshold)
+
+    shard_size = max(1, -(-len(records) // number_processes))
+    shards = [(class_labels, records[start:start + shard_size], iou_threshold)
+              for start in range(0, len(records), shard_size)]
+
+    with multiprocessing.Pool(processes=min(number_processes, max(1, len(shards)))) as pool:
+        for shard_analyzer in pool.imap_unordered(_analyze_shard, shards):
+            analyzer.merge(shard_analyzer)
+
+    return analyzer
+
+
+def _analyze_shard(shard):
+    class_labels, records, iou_threshold = shard
+    analyzer = ImageDetectionAnalysis(class_labels, iou_threshold)
+
+    for gt_objects, predicted_objects in records:
+        analyzer.add_record(gt_objects, predicted_objects)
+
+    return analyzer
+
+
 class ImageDetectionAnalysis:
 
-    # TODO: Create function that generates recall over precision graph
-    # TODO: Create constants for metrics
-    # TODO: Add unit test
+    # Whether add_record_arrays needs the scores of the predictions
+    uses_scores = False
 
-    def __init__(self, class_labels):
+    def __init__(self, class_labels, iou_threshold=0.5):
         """
-        Metric table represented as a Pandas Dataframe with labels
+        Metric counts kept in an integer array with one row per class and one column per metric. The labelled Pandas
+        Dataframe is only built when metric_table is accessed.
 
         TP = iou_over_5_and_same_class
         FP = duplicate + iou_below_5
@@ -20,10 +118,19 @@ class ImageDetectionAnalysis:
 
         :param class_labels: List containing the names of the different classes that we will use to index the rows in
         the metric table
+        :param iou_threshold: Minimum IoU for a predicted object to overlap a ground truth object
+        """
+        self.class_labels = list(class_labels)
+        self.iou_threshold = iou_threshold
+        self.class_indices = {class_label: index for index, class_label in enumerate(self.class_labels)}
+        self.metric_counts = np.zeros((len(self.class_labels), len(METRIC_NAMES)), dtype=np.int64)
+
+    @property
+    def metric_table(self):
+        """
+        :return: Pandas Dataframe with the metric counts, indexed by class and with one column per metric
         """
-        column_names = \
-            ["iou_over_5_and_same_class", "iou_over_5_and_diff_class", "gt_not_found", "iou_below_5", "duplicate"]
-        self.metric_table = pd.DataFrame(0, columns=column_names, index=class_labels)
+        return pd.DataFrame(self.metric_counts, columns=METRIC_NAMES, index=self.class_labels)
 
     def add_record(self, gt_objects, predicted_objects):
         """
@@ -36,39 +143,48 @@ class ImageDetectionAnalysis:
         :param gt_objects: Ground truth objects containing boxes and classes
         :param predicted_objects: Predicted objects containing boxes and classes
         """
-        for predicted_object in predicted_objects:
-            max_iou = 0
-            max_iou_gt_object = None
-            metric = None
-
-            for gt_object in gt_objects:
-                iou = od.calculate_iou_two_points(predicted_object["bbox"], gt_object["bbox"])
-
-                if predicted_object["class"] == gt_object["class"] and iou >= 0.5 and "matched" not in gt_object:
-                    if metric == "iou_over_5_and_same_class" and iou > max_iou:
-                        max_iou = iou
-                        max_iou_gt_object = gt_object
-                    elif metric != "iou_over_5_and_same_class":
-                        max_iou_gt_object = gt_object
-                        max_iou = iou
-                        metric = "iou_over_5_and_same_class"
-                elif predicted_object["class"] == gt_object["class"] and iou >= 0.5 \
-                        and "matched" in gt_object and metric != "iou_over_5_and_same_class":
-                    metric = "duplicate"
-                elif predicted_object["class"] != gt_object["class"] and iou >= 0.5 \
-                        and metric != "iou_over_5_and_same_class" and metric != "duplicate":
-                    metric = "iou_over_5_and_diff_class"
-
-            if metric == "iou_over_5_and_same_class":
-                max_iou_gt_object["matched"] = True
-            elif not metric:
-                metric = "iou_below_5"
-
-            self.metric_table.loc[predicted_object["class"], metric] += 1
-
-        for gt_object in gt_objects:
-            if "matched" not in gt_object:
-                self.metric_table.loc[gt_object["class"], "gt_not_found"] += 1
+        self.add_record_arrays(
+            [gt_object["bbox"] for gt_object in gt_objects],
+            [gt_object["class"] for gt_object in gt_objects],
+            [predicted_object["bbox"] for predicted_object in predicted_objects],
+            [predicted_object["class"] for predicted_object in predicted_objects])
+
+    def add_record_arrays(self, gt_boxes, gt_classes, predicted_boxes, predicted_classes):
+        """
+        Same as add_record, but takes the boxes and classes of the image as arrays instead of lists of dictionaries.
+
+        :param gt_boxes: Array with shape (M, 4) containing the ground truth boxes
+        :param gt_classes: Array with shape (M,) containing the ground truth class names
+        :param predicted_boxes: Array with shape (N, 4) containing the predicted boxes
+        :param predicted_classes: Array with shape (N,) containing the predicted class names
+        """
+        gt_class_indices = self._get_class_indices(gt_classes)
+        predicted_class_indices = self._get_class_indices(predicted_classes)
+
+        metrics, gt_matched = match_detections(
+            gt_boxes, gt_class_indices, predicted_boxes, predicted_class_indices, self.iou_threshold)
+
+        np.add.at(self.metric_counts, (predicted_class_indices, metrics), 1)
+        np.add.at(self.metric_counts, (gt_class_indices[~gt_matched], GT_NOT_FOUND), 1)
+
+    def merge(self, other):
+        """
+        Adds the counts of another analyzer to this one. Use it to combine the results of analyzers that processed
+        disjoint sets of images, for example in different processes.
+
+        :param other: ImageDetectionAnalysis with the same class labels and IoU threshold
+        :return: This analyzer, after adding the counts of other
+        """
+        if other.class_labels != self.class_labels:
+            raise Exception("Can't merge image detection analyzers with different class labels")
+        if other.iou_threshold != self.iou_threshold:
+            raise Exception("Can't merge image detection analyzers with different IoU thresholds")
+
+        self.metric_counts += other.metric_counts
+        return self
+
+    def _get_class_indices(self, classes):
+        return np.array([self.class_indices[class_name] for class_name in classes], dtype=np.int64)
 
     def get_class_precision(self, class_name):
         """
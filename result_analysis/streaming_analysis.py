@@ -0,0 +1,194 @@
+import numpy as np
+from result_analysis.classification_analysis import ClassificationAnalysis
+from result_analysis.average_precision_analysis import AveragePrecisionAnalysis, DEFAULT_IOU_THRESHOLDS, \
+    calculate_average_precision, match_scored_detections
+
+
+# Analyzers in this module keep only sufficient statistics (counts and score histograms), so their memory doesn't grow
+# with the number of samples. Scores are expected to be in [0, 1] and are clipped to that range before binning.
+
+
+def _get_score_bins(scores, number_bins):
+    scores = np.clip(np.asarray(scores, dtype=np.float64), 0, 1)
+    return np.minimum((scores * number_bins).astype(np.int64), number_bins - 1)
+
+
+def _get_histogram_curve(true_positive_histogram, detection_histogram, number_positives):
+    """
+    Builds a precision-recall curve from score histograms, using every bin edge from the highest to the lowest score
+    as a decision threshold.
+
+    :param true_positive_histogram: Array with shape (B, ...) with the number of true positives in each score bin
+    :param detection_histogram: Array with shape (B,) with the number of predictions in each score bin
+    :param number_positives: Number of ground truth positives
+    :return: Tuple with the precision and recall arrays, with the shape of true_positive_histogram
+    """
+    cumulative_true_positives = np.cumsum(true_positive_histogram[::-1], axis=0).astype(np.float64)
+    cumulative_detections = np.cumsum(detection_histogram[::-1], axis=0).astype(np.float64)
+    cumulative_detections = cumulative_detections.reshape((-1,) + (1,) * (true_positive_histogram.ndim - 1))
+
+    precision = np.zeros(cumulative_true_positives.shape)
+    np.divide(cumulative_true_positives, cumulative_detections, out=precision, where=cumulative_detections > 0)
+    recall = cumulative_true_positives / max(number_positives, 1)
+    return precision, recall
+
+
+class StreamingClassificationAnalysis(ClassificationAnalysis):
+
+    def __init__(self, class_labels, number_bins=100):
+        """
+        ClassificationAnalysis that ingests mini-batches of scores as they come out of the net. Besides the confusion
+        matrix it keeps, for every class, a histogram of the scores given to that class by all samples and another one
+        with only the samples of that class. One-vs-rest precision-recall curves are built from them.
+
+        :param class_labels: List containing the names of the different classes
+        :param number_bins: Number of bins used for the score histograms
+        """
+        super().__init__(class_labels)
+        self.number_bins = number_bins
+        self.samples_seen = 0
+        self.score_histogram = np.zeros((len(self.class_labels), number_bins), dtype=np.int64)
+        self.positive_score_histogram = np.zeros((len(self.class_labels), number_bins), dtype=np.int64)
+
+    def add_batch(self, gt_classes, predicted_scores):
+        """
+        Updates the confusion matrix and score histograms with a mini-batch. The predicted class of each sample is the
+        one with the highest score.
+
+        :param gt_classes: List or array with shape (N,) of ground truth class names or class ids
+        :param predicted_scores: Array with shape (N, number of classes) with the score of each class for each sample
+        """
+        predicted_scores = np.asarray(predicted_scores, dtype=np.float64)
+        number_classes = len(self.class_labels)
+        gt_indices = self._get_class_indices(gt_classes)
+
+        self._add_class_indices(gt_indices, np.argmax(predicted_scores, axis=1))
+
+        bins = _get_score_bins(predicted_scores, self.number_bins)
+        class_offsets = np.arange(number_classes) * self.number_bins
+        self.score_histogram += np.bincount(
+            (bins + class_offsets).reshape(-1),
+            minlength=number_classes * self.number_bins).reshape(number_classes, self.number_bins)
+
+        positive_bins = bins[np.arange(bins.shape[0]), gt_indices]
+        self.positive_score_histogram += np.bincount(
+            gt_indices * self.number_bins + positive_bins,
+            minlength=number_classes * self.number_bins).reshape(number_classes, self.number_bins)
+
+        self.samples_seen += gt_indices.shape[0]
+
+    def merge(self, other):
+        """
+        Adds the confusion matrix and score histograms of another analyzer to this one.
+
+        :param other: StreamingClassificationAnalysis with the same class labels and number of bins
+        :return: This analyzer, after adding the counts of other
+        """
+        # Checked before adding anything, so a failed merge doesn't leave this analyzer half updated
+        if other.class_labels != self.class_labels or other.number_bins != self.number_bins:
+            raise Exception("Can't merge streaming analyzers with different configurations")
+
+        super().merge(other)
+        self.score_histogram += other.score_histogram
+        self.positive_score_histogram += other.positive_score_histogram
+        self.samples_seen += other.samples_seen
+        return self
+
+    def get_precision_recall_curve(self, class_name):
+        """
+        :param class_name: Class name to get the one-vs-rest curve for
+        :return: Tuple with the precision and recall arrays, one element per score bin from highest to lowest score
+        """
+        class_index = self.class_indices[class_name]
+        return _get_histogram_curve(self.positive_score_histogram[class_index], self.score_histogram[class_index],
+                                    self.confusion_counts[class_index].sum())
+
+    def get_running_metrics(self):
+        """
+        Metrics for all the samples seen so far. It can be called at any point while batches are being added.
+
+        :return: Dictionary with the number of samples seen, the metrics report of ClassificationAnalysis and the
+        one-vs-rest AP of each class
+        """
+        average_precisions = {}
+        for class_name in self.class_labels:
+            precision, recall = self.get_precision_recall_curve(class_name)
+            average_precisions[class_name] = round(float(calculate_average_precision(precision, recall)), 3)
+
+        return {"samples_seen": self.samples_seen,
+                "report": self.get_metrics_report(),
+                "average_precisions": average_precisions}
+
+
+class StreamingAveragePrecisionAnalysis(AveragePrecisionAnalysis):
+
+    def __init__(self, class_labels, iou_thresholds=DEFAULT_IOU_THRESHOLDS, number_bins=1000):
+        """
+        AveragePrecisionAnalysis that doesn't keep the individual detections. Each detection is matched when its image
+        is added and only counted in a histogram of scores per class, together with the true positives per class and
+        IoU threshold. Precision-recall curves have one point per score bin.
+
+        :param class_labels: List containing the names of the different classes
+        :param iou_thresholds: IoU thresholds at which predictions are matched. Defaults to 0.5:0.05:0.95
+        :param number_bins: Number of bins used for the score histograms
+        """
+        super().__init__(class_labels, iou_thresholds)
+        self.number_bins = number_bins
+        self.images_seen = 0
+        self.detection_histogram = np.zeros((len(self.class_labels), number_bins), dtype=np.int64)
+        self.true_positive_histogram = \
+            np.zeros((len(self.class_labels), number_bins, self.iou_thresholds.shape[0]), dtype=np.int64)
+
+    def add_record_arrays(self, gt_boxes, gt_classes, predicted_boxes, predicted_classes, predicted_scores):
+        gt_class_indices = self._get_class_indices(gt_classes)
+        predicted_class_indices = self._get_class_indices(predicted_classes)
+        predicted_scores = np.asarray(predicted_scores, dtype=np.float64).reshape(-1)
+
+        true_positives = match_scored_detections(
+            gt_boxes, gt_class_indices, predicted_boxes, predicted_class_indices, predicted_scores,
+            self.iou_thresholds)
+
+        bins = _get_score_bins(predicted_scores, self.number_bins)
+        self.gt_counts += np.bincount(gt_class_indices, minlength=len(self.class_labels))
+        np.add.at(self.detection_histogram, (predicted_class_indices, bins), 1)
+        np.add.at(self.true_positive_histogram, (predicted_class_indices, bins), true_positives)
+        self.images_seen += 1
+
+    def add_batch(self, records):
+        """
+        :param records: List of (gt_objects, predicted_objects) tuples, one per image, in the format used by add_record
+        """
+        for gt_objects, predicted_objects in records:
+            self.add_record(gt_objects, predicted_objects)
+
+    def merge(self, other):
+        """
+        Adds the histograms of another analyzer to this one.
+
+        :param other: StreamingAveragePrecisionAnalysis with the same class labels, thresholds and number of bins
+        :return: This analyzer, after adding the counts of other
+        """
+        if other.class_labels != self.class_labels or other.number_bins != self.number_bins \
+                or not np.array_equal(other.iou_thresholds, self.iou_thresholds):
+            raise Exception("Can't merge streaming analyzers with different configurations")
+
+        self.gt_counts += other.gt_counts
+        self.detection_histogram += other.detection_histogram
+        self.true_positive_histogram += other.true_positive_histogram
+        self.images_seen += other.images_seen
+        return self
+
+    def get_running_metrics(self):
+        """
+        Metrics for all the images seen so far. It can be called at any point while images are being added.
+
+        :return: Dictionary with the number of images seen, mAP averaged over all thresholds and mAP per threshold
+        """
+        return {"images_seen": self.images_seen,
+                "mean_average_precision": self.get_mean_average_precision(),
+                "mean_average_precisions": self.get_mean_average_precisions()}
+
+    def _get_curves(self):
+        return [_get_histogram_curve(self.true_positive_histogram[class_index], self.detection_histogram[class_index],
+                                     self.gt_counts[class_index])
+                for class_index in range(len(self.class_labels))]
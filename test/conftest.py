@@ -0,0 +1,20 @@
+import cv2
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def write_images(tmpdir):
+    """
+    Function that writes number_images PNG images to tmpdir, named 0.png, 1.png, ..., and returns their paths.
+    get_pixels(index) returns the BGR pixels of each image. By default image i is 10x10 with every pixel equal to i
+    """
+    def write(number_images, get_pixels=lambda index: np.full((10, 10, 3), index, dtype=np.uint8)):
+        filenames = []
+        for index in range(number_images):
+            filename = str(tmpdir.join("{}.png".format(index)))
+            cv2.imwrite(filename, get_pixels(index))
+            filenames.append(filename)
+        return filenames
+
+    return write
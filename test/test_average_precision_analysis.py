@@ -0,0 +1,64 @@
+import numpy as np
+import average_precision_analysis as apa
+
+
+class TestAveragePrecisionAnalysis(object):
+
+    def test_average_precision(self):
+        analyzer = apa.AveragePrecisionAnalysis(['Person', 'Cat'], iou_thresholds=[0.5, 0.9])
+
+        gt_objects = [{"bbox": [0, 0, 9, 9], "class": 'Person'},
+                      {"bbox": [50, 50, 59, 59], "class": 'Person'}]
+        predicted_objects = [{"bbox": [0, 0, 9, 9], "class": 'Person', "score": 0.9},
+                             {"bbox": [100, 100, 109, 109], "class": 'Person', "score": 0.8},
+                             {"bbox": [52, 50, 59, 59], "class": 'Person', "score": 0.7}]
+
+        analyzer.add_record(gt_objects, predicted_objects)
+
+        precision, recall = analyzer.get_precision_recall_curve('Person', 0.5)
+        assert np.allclose(precision, [1, 0.5, 2 / 3.0])
+        assert np.allclose(recall, [0.5, 0.5, 1])
+
+        average_precisions = analyzer.get_average_precisions()
+        # Envelope: recall 0 -> 0.5 at precision 1, 0.5 -> 1 at precision 2/3
+        assert np.isclose(average_precisions.loc['Person', 0.5], 0.5 + 0.5 * 2 / 3.0)
+        # Only the exact box is a match at IoU 0.9
+        assert np.isclose(average_precisions.loc['Person', 0.9], 0.5)
+        # No ground truth for cats
+        assert np.isnan(average_precisions.loc['Cat', 0.5])
+
+        assert analyzer.get_mean_average_precision(0.5) == 0.833
+        assert analyzer.get_mean_average_precision() == round((0.5 + 0.5 * 2 / 3.0 + 0.5) / 2, 3)
+
+    def test_higher_score_matches_first(self):
+        true_positives = apa.match_scored_detections(
+            np.array([[0, 0, 9, 9]]), [0], np.array([[0, 0, 9, 9], [0, 0, 9, 9]]), [0, 0], [0.1, 0.9], [0.5])
+
+        assert list(true_positives[:, 0]) == [False, True]
+
+    def test_matching_equals_sequential_greedy(self):
+        random_state = np.random.RandomState(0)
+        iou_thresholds = apa.DEFAULT_IOU_THRESHOLDS
+
+        for _ in range(200):
+            corners = random_state.randint(0, 30, (6, 2))
+            gt_boxes = np.hstack([corners, corners + random_state.randint(3, 15, (6, 2))]).astype(np.float64)
+            gt_classes = random_state.randint(0, 2, 6)
+            # Many noisy copies of the same objects, so predictions compete for them
+            predicted_boxes = gt_boxes[random_state.randint(0, 6, 15)] + random_state.randint(-3, 4, (15, 4))
+            predicted_classes = random_state.randint(0, 2, 15)
+            predicted_scores = random_state.randint(0, 5, 15) / 5.0
+
+            true_positives = apa.match_scored_detections(
+                gt_boxes, gt_classes, predicted_boxes, predicted_classes, predicted_scores, iou_thresholds)
+
+            iou_matrix = apa.od.calculate_iou_matrix(predicted_boxes, gt_boxes)
+            iou_matrix[predicted_classes[:, np.newaxis] != gt_classes[np.newaxis, :]] = -1
+            for threshold_index, iou_threshold in enumerate(iou_thresholds):
+                gt_matched = np.zeros(6, dtype=bool)
+                for prediction in np.argsort(-predicted_scores, kind="stable"):
+                    ious = np.where(gt_matched, -1, iou_matrix[prediction])
+                    matched = ious.max() >= iou_threshold
+                    if matched:
+                        gt_matched[np.argmax(ious)] = True
+                    assert true_positives[prediction, threshold_index] == matched
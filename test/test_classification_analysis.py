@@ -1,3 +1,4 @@
+import numpy as np
 import classification_analysis as ca
 
 
@@ -33,3 +34,65 @@ class TestClassificationAnalysis(object):
         assert analyzer.get_class_f1('Person') == 1
         assert analyzer.get_class_f1('Cat') == 0.4
         assert analyzer.get_class_f1('Dog') == 0.5
+
+    def test_add_records_labels_and_ids(self):
+        valid_classes = ['Person', 'Cat', 'Dog']
+        labels_analyzer = ca.ClassificationAnalysis(valid_classes)
+        ids_analyzer = ca.ClassificationAnalysis(valid_classes)
+
+        labels_analyzer.add_records(['Person', 'Cat', 'Cat', 'Dog'], ['Person', 'Dog', 'Cat', 'Dog'])
+        ids_analyzer.add_records(np.array([0, 1, 1, 2]), np.array([0, 2, 1, 2]))
+
+        assert (labels_analyzer.confusion_counts == ids_analyzer.confusion_counts).all()
+        assert labels_analyzer.confusion_matrix.loc['Cat', 'Dog'] == 1
+        assert labels_analyzer.confusion_matrix.values.sum() == 4
+
+    def test_small_and_large_batches_with_many_classes(self):
+        random_state = np.random.RandomState(0)
+        analyzer = ca.ClassificationAnalysis(["class{}".format(index) for index in range(50)])
+        expected = np.zeros((50, 50), dtype=np.int64)
+
+        # Batches below and above the size where bincount is used instead of np.add.at
+        for batch_size in [1, 5, 77, 2500]:
+            gt_ids = random_state.randint(0, 50, size=batch_size)
+            predicted_ids = random_state.randint(0, 50, size=batch_size)
+            # Repeated pairs in the same batch must all be counted
+            gt_ids[:2] = predicted_ids[:2] = 3
+            analyzer.add_records(gt_ids, predicted_ids)
+
+            for gt_id, predicted_id in zip(gt_ids, predicted_ids):
+                expected[gt_id, predicted_id] += 1
+
+        assert (analyzer.confusion_counts == expected).all()
+
+    def test_merge(self):
+        valid_classes = ['Person', 'Cat', 'Dog']
+        analyzer = ca.ClassificationAnalysis(valid_classes)
+        shard_1 = ca.ClassificationAnalysis(valid_classes)
+        shard_2 = ca.ClassificationAnalysis(valid_classes)
+
+        analyzer.add_records(['Person', 'Cat', 'Dog', 'Dog'], ['Person', 'Dog', 'Dog', 'Cat'])
+        shard_1.add_records(['Person', 'Cat'], ['Person', 'Dog'])
+        shard_2.add_records(['Dog', 'Dog'], ['Dog', 'Cat'])
+
+        assert (shard_1.merge(shard_2).confusion_counts == analyzer.confusion_counts).all()
+
+    def test_metrics_report(self):
+        valid_classes = ['Person', 'Cat', 'Dog', 'Bird']
+        analyzer = ca.ClassificationAnalysis(valid_classes)
+
+        analyzer.add_records(['Person'] * 2 + ['Cat'] * 5 + ['Dog'] * 6,
+                             ['Person'] * 2 + ['Cat'] * 2 + ['Dog'] * 3 + ['Dog'] * 3 + ['Cat'] * 3)
+
+        report = analyzer.get_metrics_report()
+
+        for class_name in ['Person', 'Cat', 'Dog']:
+            assert report.loc[class_name, 'precision'] == analyzer.get_class_precision(class_name)
+            assert report.loc[class_name, 'recall'] == analyzer.get_class_recall(class_name)
+        assert report.loc['Dog', 'support'] == 6
+
+        # Bird is never seen or predicted
+        assert report.loc['Bird', 'precision'] == 0
+        assert report.loc['Bird', 'f1'] == 0
+        assert report.loc['micro avg', 'precision'] == round(7 / 13.0, 3)
+        assert report.loc['weighted avg', 'recall'] == report.loc['micro avg', 'recall']
@@ -0,0 +1,72 @@
+import numpy as np
+import pytest
+import average_precision_analysis as apa
+import detection_results_reader as drr
+import image_detection_analysis as ida
+from tools import output_analyzer
+
+
+class TestDetectionResultsReader(object):
+
+    def test_incremental_update_and_rescore(self, tmpdir):
+        results_file = str(tmpdir.join("results.txt"))
+        class_labels = ['Person', 'Cat']
+
+        # Legacy format written with str()
+        with open(results_file, 'w') as results:
+            results.write(str({"image_name": "1.jpg",
+                               "gt_objects": [{"bbox": np.array([0, 0, 9, 9]), "class": 'Person'}],
+                               "predicted_object": [{"bbox": [0, 0, 9, 7], "class": 'Person'}]}) + "\n")
+
+        reader = drr.DetectionResultsReader(results_file)
+        analyzer = reader.update_analysis(ida.ImageDetectionAnalysis(class_labels))
+        assert analyzer.metric_table.loc['Person', 'iou_over_5_and_same_class'] == 1
+
+        with output_analyzer.ResultsSink(results_file) as sink:
+            sink.write_image_detection("2.jpg", [[0, 0, 9, 9]], ['Cat'], [[20, 20, 29, 29]], ['Cat'], [0.5])
+
+        reader.update_analysis(analyzer)
+        assert reader.number_records == 2
+        assert analyzer.metric_table.loc['Cat', 'iou_below_5'] == 1
+        assert analyzer.metric_table.values.sum() == 3
+
+        # Nothing new to read
+        reader.update_analysis(analyzer)
+        assert analyzer.metric_table.values.sum() == 3
+
+        # IoU of the first prediction is 0.8
+        strict_analyzer = reader.rescore(class_labels, 0.9)
+        assert strict_analyzer.metric_table.loc['Person', 'iou_below_5'] == 1
+        assert strict_analyzer.metric_table.loc['Person', 'gt_not_found'] == 1
+
+    def test_failed_update_can_be_retried(self, tmpdir):
+        results_file = str(tmpdir.join("results.txt"))
+
+        with output_analyzer.ResultsSink(results_file) as sink:
+            sink.write_image_detection("1.jpg", [[0, 0, 9, 9]], ['Cat'], [[0, 0, 9, 9]], ['Cat'], [0.9])
+            sink.write_image_detection("2.jpg", [[0, 0, 9, 9]], ['Cat'], [[0, 0, 9, 9]], ['Cat'], [0.7])
+            sink.write_image_detection("3.jpg", [[0, 0, 9, 9]], ['Dog'], [[0, 0, 9, 9]], ['Dog'], [0.8])
+
+        reader = drr.DetectionResultsReader(results_file)
+        analyzer = ida.ImageDetectionAnalysis(['Cat'])
+
+        # The unknown class of the third record fails after the first two are added
+        for _ in range(2):
+            with pytest.raises(KeyError):
+                reader.update_analysis(analyzer)
+            assert reader.number_records == 2
+            assert analyzer.metric_table.loc['Cat', 'iou_over_5_and_same_class'] == 2
+            assert analyzer.metric_table.values.sum() == 2
+
+        with open(results_file, 'rb') as results:
+            assert reader.offset == len(results.readline()) * 2
+
+        reader = drr.DetectionResultsReader(results_file)
+        analyzer = reader.update_analysis(ida.ImageDetectionAnalysis(['Cat', 'Dog']))
+        assert analyzer.metric_table['iou_over_5_and_same_class'].sum() == 3
+        assert reader.number_records == 3
+
+        # Analyzers that need scores are detected however their module is imported
+        reader = drr.DetectionResultsReader(results_file)
+        ap_analyzer = reader.update_analysis(apa.AveragePrecisionAnalysis(['Cat', 'Dog'], [0.5]))
+        assert ap_analyzer.get_mean_average_precision() == 1.0
@@ -0,0 +1,61 @@
+import numpy as np
+from learning_rate.error_plateau_learning_rate_manager import ErrorPlateauLearningRateManager
+
+
+class TestErrorPlateauLearningRateManager(object):
+
+    def test_reduces_rate_on_std_plateau(self):
+        manager = ErrorPlateauLearningRateManager(initial_rate=0.1, threshold=0.01, number_steps=3)
+
+        for error in [5, 4, 3, 2]:
+            manager.add_error(error)
+        assert manager.get_learning_rate() == 0.1
+
+        for error in [2, 2]:
+            manager.add_error(error)
+        # Window [2, 2, 2] has std 0
+        assert np.isclose(manager.get_learning_rate(), 0.01)
+        assert manager.previous_errors == []
+
+    def test_patience_cooldown_and_min_lr(self):
+        manager = ErrorPlateauLearningRateManager(
+            initial_rate=0.1, threshold=0, number_steps=100, min_lr=0.005, patience=2, cooldown=2)
+
+        for error in [1.0, 1.0, 1.0]:
+            manager.add_error(error)
+        assert np.isclose(manager.get_learning_rate(), 0.01)
+
+        # Cooldown ignores the next two steps, and then the new rate gets patience steps
+        for error in [1.0, 1.0, 1.0]:
+            manager.add_error(error)
+            assert np.isclose(manager.get_learning_rate(), 0.01)
+
+        manager.add_error(1.0)
+        assert np.isclose(manager.get_learning_rate(), 0.005)
+
+    def test_reductions_are_patience_steps_after_cooldown(self):
+        manager = ErrorPlateauLearningRateManager(
+            initial_rate=1.0, threshold=0, number_steps=1000, min_lr=1e-9, patience=5, cooldown=10)
+
+        reduction_steps = []
+        for step in range(40):
+            learning_rate = manager.get_learning_rate()
+            manager.add_error(1.0)
+            if manager.get_learning_rate() != learning_rate:
+                reduction_steps.append(step)
+
+        assert reduction_steps == [5, 20, 35]
+
+    def test_state_dict_round_trip(self):
+        manager = ErrorPlateauLearningRateManager(initial_rate=0.1, threshold=0.01, number_steps=3, patience=5)
+        for error in [5, 4, 3, 2.5]:
+            manager.add_error(error)
+
+        restored = ErrorPlateauLearningRateManager(initial_rate=1, threshold=1, number_steps=1)
+        restored.load_state_dict(manager.state_dict())
+
+        assert restored.previous_errors == manager.previous_errors
+        for error in [2.5, 2.5, 2.5]:
+            manager.add_error(error)
+            restored.add_error(error)
+        assert restored.get_learning_rate() == manager.get_learning_rate()
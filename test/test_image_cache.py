@@ -0,0 +1,84 @@
+import os
+import cv2
+import numpy as np
+import tools.image_cache as image_cache
+
+
+def _get_pixels(index):
+    # Image i is 20x30 with every pixel equal to 50 * i
+    return np.full((20, 30, 3), index * 50, dtype=np.uint8)
+
+
+class TestResizedImageCache(object):
+
+    def test_lru_eviction_and_spill(self, tmpdir, write_images):
+        images = write_images(3, _get_pixels)
+
+        # Room for two 10x10x3 images
+        cache = image_cache.ResizedImageCache(max_bytes=600, spill_dir=str(tmpdir.join("spill")))
+
+        cache.get(images[0], 10, 10)
+        cache.get(images[1], 10, 10)
+        cache.get(images[0], 10, 10)
+        # images[1] is the least recently used one
+        cache.get(images[2], 10, 10)
+        pixels = cache.get(images[1], 10, 10)
+
+        assert pixels.shape == (10, 10, 3)
+        assert pixels[0, 0, 0] == 50
+        assert cache.get_stats() == {"hits": 1, "disk_hits": 1, "misses": 3, "evictions": 1, "entries": 2,
+                                     "bytes": 600, "spill_bytes": 300}
+
+    def test_spill_limit(self, tmpdir, write_images):
+        images = write_images(4, _get_pixels)
+        spill_dir = str(tmpdir.join("spill"))
+        # Room for one 10x10x3 image in memory and two on disk
+        cache = image_cache.ResizedImageCache(max_bytes=300, spill_dir=spill_dir, max_spill_bytes=600)
+
+        for image in images:
+            cache.get(image, 10, 10)
+
+        assert len(os.listdir(spill_dir)) == 2
+        assert cache.get_stats()["spill_bytes"] == 600
+        # images[0] was the oldest spilled image, so it was removed from disk and is read again
+        cache.get(images[0], 10, 10)
+        assert cache.get_stats()["misses"] == 5
+        assert len(os.listdir(spill_dir)) == 2
+
+    def test_modified_image_removes_stale_copies(self, tmpdir, write_images):
+        images = write_images(2, _get_pixels)
+        spill_dir = str(tmpdir.join("spill"))
+        cache = image_cache.ResizedImageCache(max_bytes=300, spill_dir=spill_dir)
+
+        cache.get(images[0], 10, 10)
+        cache.get(images[1], 10, 10)
+        stale_files = os.listdir(spill_dir)
+        assert len(stale_files) == 1
+
+        cv2.imwrite(images[0], np.full((20, 30, 3), 200, dtype=np.uint8))
+        modification_time = os.path.getmtime(images[0]) + 10
+        os.utime(images[0], (modification_time, modification_time))
+        pixels = cache.get(images[0], 10, 10)
+
+        assert pixels[0, 0, 0] == 200
+        # Only the spilled copy of images[1] remains, which was evicted by the new images[0]
+        assert len(os.listdir(spill_dir)) == 1
+        assert set(os.listdir(spill_dir)).isdisjoint(stale_files)
+        assert cache.get_stats()["spill_bytes"] == 300
+        assert cache.get_stats()["misses"] == 3
+
+    def test_spill_without_lock(self, tmpdir, write_images, monkeypatch):
+        images = write_images(2, _get_pixels)
+        cache = image_cache.ResizedImageCache(max_bytes=300, spill_dir=str(tmpdir.join("spill")))
+        save = np.save
+
+        def save_without_lock(*args, **kwargs):
+            assert not cache._lock.locked()
+            save(*args, **kwargs)
+
+        monkeypatch.setattr(image_cache.np, "save", save_without_lock)
+
+        cache.get(images[0], 10, 10)
+        cache.get(images[1], 10, 10)
+
+        assert cache.get_stats()["spill_bytes"] == 300
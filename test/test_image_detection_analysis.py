@@ -0,0 +1,67 @@
+import numpy as np
+import pytest
+import image_detection_analysis as ida
+
+
+class TestImageDetectionAnalysis(object):
+
+    def test_add_record(self):
+        analyzer = ida.ImageDetectionAnalysis(['Person', 'Cat', 'Dog'])
+
+        gt_objects = [{"bbox": [0, 0, 9, 9], "class": 'Person'},
+                      {"bbox": [50, 50, 59, 59], "class": 'Cat'},
+                      {"bbox": [100, 100, 109, 109], "class": 'Dog'}]
+        predicted_objects = [{"bbox": [0, 0, 9, 9], "class": 'Person'},
+                             {"bbox": [1, 1, 9, 9], "class": 'Person'},
+                             {"bbox": [50, 50, 59, 59], "class": 'Dog'},
+                             {"bbox": [200, 200, 209, 209], "class": 'Cat'}]
+
+        analyzer.add_record(gt_objects, predicted_objects)
+
+        table = analyzer.metric_table
+        assert table.loc['Person', 'iou_over_5_and_same_class'] == 1
+        assert table.loc['Person', 'duplicate'] == 1
+        assert table.loc['Dog', 'iou_over_5_and_diff_class'] == 1
+        assert table.loc['Cat', 'iou_below_5'] == 1
+        assert table.loc['Cat', 'gt_not_found'] == 1
+        assert table.loc['Dog', 'gt_not_found'] == 1
+        assert table.values.sum() == 6
+
+        # Input objects are not modified
+        assert all("matched" not in gt_object for gt_object in gt_objects)
+
+    def test_match_detections_picks_highest_iou(self):
+        gt_boxes = np.array([[0, 0, 9, 9], [2, 2, 11, 11]])
+        predicted_boxes = np.array([[2, 2, 11, 11], [0, 0, 9, 9]])
+
+        metrics, gt_matched = ida.match_detections(gt_boxes, [0, 0], predicted_boxes, [0, 0])
+
+        assert list(metrics) == [ida.IOU_OVER_5_AND_SAME_CLASS, ida.IOU_OVER_5_AND_SAME_CLASS]
+        assert gt_matched.all()
+
+    def test_analyze_records_in_parallel(self):
+        random_state = np.random.RandomState(0)
+        class_labels = ['Person', 'Cat', 'Dog']
+
+        def random_objects(number_objects):
+            top_left = random_state.randint(0, 40, size=(number_objects, 2))
+            bottom_right = top_left + random_state.randint(5, 20, size=(number_objects, 2))
+            return [{"bbox": list(np.hstack([top_left[i], bottom_right[i]])),
+                     "class": class_labels[random_state.randint(3)]} for i in range(number_objects)]
+
+        records = [(random_objects(4), random_objects(6)) for _ in range(20)]
+
+        serial_analyzer = ida.ImageDetectionAnalysis(class_labels)
+        for gt_objects, predicted_objects in records:
+            serial_analyzer.add_record(gt_objects, predicted_objects)
+
+        parallel_analyzer = ida.analyze_records_in_parallel(class_labels, records, number_processes=3)
+
+        assert (parallel_analyzer.metric_table.values == serial_analyzer.metric_table.values).all()
+
+    def test_merge_rejects_different_iou_thresholds(self):
+        analyzer = ida.ImageDetectionAnalysis(['Person', 'Cat'], iou_threshold=0.5)
+
+        with pytest.raises(Exception):
+            analyzer.merge(ida.ImageDetectionAnalysis(['Person', 'Cat'], iou_threshold=0.75))
+        analyzer.merge(ida.ImageDetectionAnalysis(['Person', 'Cat'], iou_threshold=0.5))
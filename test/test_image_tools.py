@@ -0,0 +1,34 @@
+import numpy as np
+import pytest
+import tools.image_tools as image_tools
+
+
+def _get_pixels(index):
+    # Image i has every pixel equal to i, so its position in the output is easy to check
+    return np.full((10 + index, 7, 3), index, dtype=np.uint8)
+
+
+class TestImageTools(object):
+
+    @pytest.mark.parametrize("use_processes", [False, True])
+    def test_load_resized_images_keeps_order(self, write_images, use_processes):
+        filenames = write_images(12, _get_pixels)
+
+        images, errors = image_tools.load_resized_images(
+            filenames, 5, 4, number_workers=3, use_processes=use_processes, max_in_flight=2)
+
+        assert images.shape == (12, 5, 4, 3) and images.dtype == np.uint8
+        assert errors == []
+        for index in range(12):
+            assert np.all(images[index] == index)
+
+    def test_load_resized_images_reports_missing_files(self, tmpdir, write_images):
+        filenames = write_images(3, _get_pixels)
+        missing = str(tmpdir.join("missing.png"))
+        filenames.insert(1, missing)
+
+        images, errors = image_tools.load_resized_images(filenames, 5, 4, number_workers=2)
+
+        assert [(index, path) for index, path, _ in errors] == [(1, missing)]
+        assert np.all(images[1] == 0)
+        assert np.all(images[3] == 2)
@@ -0,0 +1,54 @@
+import os
+import pandas as pd
+import tools.input_cache as input_cache
+
+
+class TestInputCache(object):
+
+    def test_cache_round_trip_and_invalidation(self, tmpdir):
+        csv_path = str(tmpdir.join("input.csv"))
+        with open(csv_path, 'w') as csv_file:
+            csv_file.write("1,10,11,12\n0,20,21,22\n2,30,31,32\n")
+
+        cache_dir = str(tmpdir.join("cache"))
+        assert not input_cache.is_cache_valid(csv_path, 3, cache_dir)
+
+        features_path, labels_path = input_cache.get_or_create_cache(csv_path, 3, cache_dir)
+        features, labels = input_cache.load_cache(features_path, labels_path)
+
+        assert input_cache.is_cache_valid(csv_path, 3, cache_dir)
+        assert features.shape == (3, 3)
+        assert (features[1] == [20, 21, 22]).all()
+        assert list(labels) == [1, 0, 2]
+
+        with open(csv_path, 'a') as csv_file:
+            csv_file.write("1,40,41,42\n")
+        assert not input_cache.is_cache_valid(csv_path, 3, cache_dir)
+
+        features_path, labels_path = input_cache.get_or_create_cache(csv_path, 3, cache_dir)
+        assert input_cache.load_cache(features_path, labels_path)[0].shape == (4, 3)
+        assert os.path.dirname(features_path) == cache_dir
+
+    def test_source_changed_during_conversion(self, tmpdir, monkeypatch):
+        csv_path = str(tmpdir.join("input.csv"))
+        with open(csv_path, 'w') as csv_file:
+            csv_file.write("1,10,11,12\n0,20,21,22\n")
+
+        read_csv = pd.read_csv
+
+        def append_and_read_csv(*args, **kwargs):
+            with open(csv_path, 'a') as csv_file:
+                csv_file.write("2,30,31,32\n")
+            return read_csv(*args, **kwargs)
+
+        monkeypatch.setattr(input_cache.pd, "read_csv", append_and_read_csv)
+        features_path, labels_path = input_cache.convert_csv_to_cache(csv_path, 3)
+        monkeypatch.undo()
+
+        # The cache has the records of the old version, so it must not match the new one
+        assert list(input_cache.load_cache(features_path, labels_path)[1]) == [1, 0]
+        assert input_cache.has_cache(csv_path)
+        assert not input_cache.is_cache_valid(csv_path, 3)
+
+        features_path, labels_path = input_cache.get_or_create_cache(csv_path, 3)
+        assert list(input_cache.load_cache(features_path, labels_path)[1]) == [1, 0, 2]
@@ -0,0 +1,172 @@
+import numpy as np
+import pytest
+
+tf = pytest.importorskip("tensorflow")
+
+import InputFileReader
+import tools.input_cache as input_cache
+
+
+def _write_csv(path, number_records, number_features):
+    # The label of every record is its index and the features are index * 10 + feature
+    with open(path, 'w') as csv_file:
+        for index in range(number_records):
+            values = [index] + [index * 10 + feature for feature in range(number_features)]
+            csv_file.write(",".join(str(value) for value in values) + "\n")
+    return path
+
+
+def _get_pixels(index):
+    # Image i has every pixel equal to (i, 2 * i, 3 * i) in BGR order
+    return np.tile(np.array([index, 2 * index, 3 * index], dtype=np.uint8), (12, 8, 1))
+
+
+def _read_all_batches(reader):
+    batches = []
+    try:
+        while True:
+            batches.append(reader.get_sample_batch())
+    except tf.errors.OutOfRangeError:
+        return batches
+
+
+class TestFileInputReader(object):
+
+    def test_shuffle_queue_smaller_than_file(self, tmpdir):
+        filename = _write_csv(str(tmpdir.join("records.csv")), 50, 3)
+
+        with tf.Graph().as_default(), tf.Session() as session:
+            file_queue = tf.FIFOQueue(capacity=5, dtypes=[tf.string])
+            sample_queue = InputFileReader.FileInputReader.create_shuffle_sample_queue(
+                capacity=10, min_after_dequeue=2, number_features=3, seed=1)
+            reader = InputFileReader.FileInputReader(session, file_queue, sample_queue, 3, 5)
+
+            reader.enqueue_files([filename])
+            reader.finish_enqueuing_files()
+            batches = _read_all_batches(reader)
+            reader.terminate_queue()
+
+        labels = np.concatenate([target for _, target in batches])
+        assert sorted(labels.tolist()) == list(range(50))
+        assert labels.tolist() != list(range(50))
+        for features, target in batches:
+            np.testing.assert_array_equal(features[:, 0], target * 10)
+
+
+class TestDatasetInputReader(object):
+
+    def test_existing_cache_is_used_by_default(self, tmpdir, monkeypatch):
+        filename = _write_csv(str(tmpdir.join("records.csv")), 10, 3)
+        cached_readers = []
+        define_cached_reader_graph = InputFileReader.DatasetInputReader._define_cached_reader_graph
+
+        def record_cached_reader(reader, features_paths):
+            cached_readers.append(reader)
+            define_cached_reader_graph(reader, features_paths)
+
+        monkeypatch.setattr(InputFileReader.DatasetInputReader, "_define_cached_reader_graph",
+                            record_cached_reader)
+
+        def read_labels():
+            with tf.Graph().as_default(), tf.Session() as session:
+                reader = InputFileReader.DatasetInputReader(session, [filename], 3, 4)
+                labels = np.concatenate([target for _, target in _read_all_batches(reader)]).tolist()
+            return labels, bool(cached_readers) and cached_readers[-1] is reader
+
+        # Without a cache the CSV is parsed, and no cache is built
+        assert read_labels() == (list(range(10)), False)
+        assert not input_cache.has_cache(filename)
+
+        input_cache.get_or_create_cache(filename, 3)
+        assert read_labels() == (list(range(10)), True)
+
+        # An outdated cache is built again instead of parsing the CSV
+        _write_csv(filename, 12, 3)
+        assert not input_cache.is_cache_valid(filename, 3)
+        assert read_labels() == (list(range(12)), True)
+        assert input_cache.is_cache_valid(filename, 3)
+
+    def test_batch_shapes_and_final_partial_batch(self, tmpdir):
+        filenames = [_write_csv(str(tmpdir.join("records_{}.csv".format(index))), 7, 3) for index in range(2)]
+
+        with tf.Graph().as_default(), tf.Session() as session:
+            reader = InputFileReader.DatasetInputReader(
+                session, filenames, 3, 4, number_parallel_reads=2, number_epochs=2, use_cache=False)
+            batches = _read_all_batches(reader)
+
+        # 2 epochs of 2 files with 7 records, in batches of 4
+        assert [features.shape for features, _ in batches] == [(4, 3)] * 7
+        assert [target.shape for _, target in batches] == [(4,)] * 7
+        labels = np.concatenate([target for _, target in batches])
+        assert sorted(labels.tolist()) == sorted(list(range(7)) * 4)
+        for features, target in batches:
+            np.testing.assert_array_equal(features, target[:, np.newaxis] * 10 + np.arange(3))
+
+        with tf.Graph().as_default(), tf.Session() as session:
+            reader = InputFileReader.DatasetInputReader(session, filenames[:1], 3, 4, use_cache=False)
+            batches = _read_all_batches(reader)
+
+        assert [features.shape for features, _ in batches] == [(4, 3), (3, 3)]
+
+    def test_seeded_shuffle_is_reproducible(self, tmpdir):
+        filenames = [_write_csv(str(tmpdir.join("records_{}.csv".format(index))), 20, 2) for index in range(3)]
+
+        orders = []
+        for _ in range(2):
+            with tf.Graph().as_default(), tf.Session() as session:
+                reader = InputFileReader.DatasetInputReader(
+                    session, filenames, 2, 5, number_parallel_reads=3, shuffle_files=True,
+                    shuffle_buffer_size=10, seed=3, use_cache=False)
+                orders.append(np.concatenate([target for _, target in _read_all_batches(reader)]).tolist())
+
+        assert orders[0] == orders[1]
+        assert sorted(orders[0]) == sorted(list(range(20)) * 3)
+
+
+class TestImageInputReaders(object):
+
+    def test_image_reader_decodes_and_resizes(self, write_images):
+        filenames = write_images(5, _get_pixels)
+
+        with tf.Graph().as_default(), tf.Session() as session:
+            reader = InputFileReader.ImageDatasetInputReader(session, filenames, list(range(5)), 6, 4, 2)
+            batches = _read_all_batches(reader)
+
+        assert [images.shape for images, _ in batches] == [(2, 6, 4, 3), (2, 6, 4, 3), (1, 6, 4, 3)]
+        for images, target in batches:
+            expected = target[:, np.newaxis, np.newaxis, np.newaxis] * np.array([1, 2, 3])
+            np.testing.assert_allclose(images, np.broadcast_to(expected, images.shape), atol=1e-3)
+
+    def test_tfrecord_reader(self, tmpdir, write_images):
+        tfrecord_path = str(tmpdir.join("images.tfrecord"))
+        with tf.python_io.TFRecordWriter(tfrecord_path) as writer:
+            for index, filename in enumerate(write_images(3, _get_pixels)):
+                with open(filename, 'rb') as image_file:
+                    example = tf.train.Example(features=tf.train.Features(feature={
+                        "image": tf.train.Feature(bytes_list=tf.train.BytesList(value=[image_file.read()])),
+                        "label": tf.train.Feature(int64_list=tf.train.Int64List(value=[index]))}))
+                writer.write(example.SerializeToString())
+
+        with tf.Graph().as_default(), tf.Session() as session:
+            reader = InputFileReader.TFRecordDatasetInputReader(session, [tfrecord_path], 6, 4, 3, bgr=False)
+            images, target = reader.get_sample_batch()
+
+        assert images.shape == (3, 6, 4, 3)
+        assert target.tolist() == [0, 1, 2]
+        # RGB order
+        np.testing.assert_allclose(images[2, 0, 0], [6, 4, 2], atol=1e-3)
+
+    def test_decode_animated_gif(self, tmpdir):
+        image_module = pytest.importorskip("PIL.Image")
+        gif_path = str(tmpdir.join("animated.gif"))
+        frames = [image_module.new("RGB", (8, 12), color) for color in [(255, 0, 0), (0, 0, 255)]]
+        frames[0].save(gif_path, save_all=True, append_images=frames[1:])
+
+        with tf.Graph().as_default(), tf.Session() as session:
+            with open(gif_path, 'rb') as gif_file:
+                image = session.run(InputFileReader.decode_and_resize_image(
+                    tf.constant(gif_file.read()), 6, 4, bgr=False))
+
+        assert image.shape == (6, 4, 3)
+        # First frame, which is red
+        assert image[0, 0, 0] > 200 and image[0, 0, 2] < 50
@@ -0,0 +1,142 @@
+import math
+import pytest
+from learning_rate.error_plateau_learning_rate_manager import ErrorPlateauLearningRateManager
+from learning_rate.cosine_decay_learning_rate_manager import CosineDecayLearningRateManager
+from learning_rate.exponential_decay_learning_rate_manager import ExponentialDecayLearningRateManager
+from learning_rate.step_decay_learning_rate_manager import StepDecayLearningRateManager
+from learning_rate.warmup_learning_rate_manager import WarmupLearningRateManager
+
+
+def _compare_tensor_with_python(manager, steps, **tensor_kwargs):
+    # Evaluates the learning rate tensor of manager at every step and checks it is the rate that
+    # update_learning_rate calculates in Python for the same step
+    tf = pytest.importorskip("tensorflow")
+
+    with tf.Graph().as_default():
+        global_step = tf.placeholder(tf.int64, shape=[])
+        learning_rate = manager.get_learning_rate_tensor(global_step, **tensor_kwargs)
+
+        with tf.Session() as session:
+            tensor_rates = [session.run(learning_rate, {global_step: step}) for step in steps]
+
+    python_rates = []
+    for step in steps:
+        manager.update_learning_rate(step)
+        python_rates.append(manager.get_learning_rate())
+
+    assert tensor_rates == pytest.approx(python_rates, rel=1e-6)
+    return python_rates
+
+
+class TestLearningRateManagers(object):
+
+    def test_step_decay(self):
+        manager = StepDecayLearningRateManager([10, 20], [0.1, 0.01, 0.001])
+
+        rates = []
+        for step in [0, 9, 10, 19, 20, 100]:
+            manager.update_learning_rate(step)
+            rates.append(manager.get_learning_rate())
+
+        assert rates == [0.1, 0.1, 0.01, 0.01, 0.001, 0.001]
+        with pytest.raises(Exception):
+            StepDecayLearningRateManager([10], [0.1])
+
+    def test_cosine_decay(self):
+        manager = CosineDecayLearningRateManager(1.0, decay_steps=100, alpha=0.1)
+
+        manager.update_learning_rate(0)
+        assert manager.get_learning_rate() == pytest.approx(1.0)
+        manager.update_learning_rate(50)
+        assert manager.get_learning_rate() == pytest.approx(0.55)
+        manager.update_learning_rate(200)
+        assert manager.get_learning_rate() == pytest.approx(0.1)
+
+    def test_warmup_of_step_manager(self):
+        manager = WarmupLearningRateManager(
+            StepDecayLearningRateManager([20], [1.0, 0.5]), warmup_steps=10, initial_fraction=0.2)
+
+        manager.update_learning_rate(0)
+        assert manager.get_learning_rate() == pytest.approx(0.2)
+        manager.update_learning_rate(5)
+        assert manager.get_learning_rate() == pytest.approx(0.6)
+        manager.update_learning_rate(15)
+        assert manager.get_learning_rate() == pytest.approx(1.0)
+        manager.update_learning_rate(25)
+        assert manager.get_learning_rate() == pytest.approx(0.5)
+
+    def test_warmup_of_epoch_manager_converts_steps(self):
+        with pytest.raises(Exception):
+            WarmupLearningRateManager(ExponentialDecayLearningRateManager(1.0, 0.5), warmup_steps=10)
+
+        manager = WarmupLearningRateManager(
+            ExponentialDecayLearningRateManager(1.0, 0.5), warmup_steps=10, steps_per_epoch=100)
+
+        manager.update_learning_rate(99)
+        assert manager.get_learning_rate() == pytest.approx(1.0)
+        manager.update_learning_rate(250)
+        assert manager.get_learning_rate() == pytest.approx(math.exp(-1.0))
+
+    def test_step_decay_tensor(self):
+        manager = StepDecayLearningRateManager([10, 20], [0.1, 0.01, 0.001])
+
+        rates = _compare_tensor_with_python(manager, [0, 1, 9, 10, 11, 19, 20, 21, 100])
+
+        assert rates == [0.1, 0.1, 0.1, 0.01, 0.01, 0.01, 0.001, 0.001, 0.001]
+
+    def test_cosine_decay_tensor(self):
+        manager = CosineDecayLearningRateManager(1.0, decay_steps=100, alpha=0.1)
+
+        _compare_tensor_with_python(manager, [0, 1, 25, 50, 99, 100, 101, 200])
+
+    def test_exponential_decay_tensor(self):
+        manager = ExponentialDecayLearningRateManager(1.0, 0.5)
+        steps = [0, 99, 100, 101, 250]
+
+        tf = pytest.importorskip("tensorflow")
+        with tf.Graph().as_default():
+            global_step = tf.placeholder(tf.int64, shape=[])
+            learning_rate = manager.get_learning_rate_tensor(global_step, steps_per_epoch=100)
+
+            with tf.Session() as session:
+                tensor_rates = [session.run(learning_rate, {global_step: step}) for step in steps]
+
+        python_rates = []
+        for step in steps:
+            manager.update_learning_rate(step // 100)
+            python_rates.append(manager.get_learning_rate())
+
+        assert tensor_rates == pytest.approx(python_rates, rel=1e-6)
+
+    def test_warmup_of_epoch_manager_tensor(self):
+        manager = WarmupLearningRateManager(
+            ExponentialDecayLearningRateManager(1.0, 0.5), warmup_steps=150, initial_fraction=0.2,
+            steps_per_epoch=100)
+
+        rates = _compare_tensor_with_python(manager, [0, 50, 99, 100, 149, 150, 199, 200, 350])
+
+        assert rates[0] == pytest.approx(0.2)
+        assert rates[5] == pytest.approx(math.exp(-0.5))
+
+    def test_plateau_variable_follows_python_rate(self):
+        tf = pytest.importorskip("tensorflow")
+        manager = ErrorPlateauLearningRateManager(initial_rate=0.1, threshold=0.01, number_steps=3)
+
+        with tf.Graph().as_default():
+            learning_rate = manager.get_learning_rate_tensor()
+            # Later calls return the same variable
+            assert manager.get_learning_rate_tensor() is learning_rate
+
+            with tf.Session() as session:
+                session.run(tf.global_variables_initializer())
+                variable_rates = []
+
+                for error in [5, 4, 3, 2, 2, 2, 2, 2, 2, 2]:
+                    manager.add_error(error)
+                    manager.update_learning_rate_variable(session)
+                    variable_rates.append(session.run(learning_rate))
+                    assert variable_rates[-1] == pytest.approx(manager.get_learning_rate(), rel=1e-6)
+
+        # Reduced when the last three errors are [2, 2, 2], and again four errors later, since the
+        # window is cleared by the first reduction
+        assert variable_rates == pytest.approx([0.1] * 5 + [0.01] * 4 + [0.001], rel=1e-6)
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+import numpy_input_reader as nir
+
+
+class TestNumpyInputReader(object):
+
+    def test_sequential_batches_are_views(self):
+        features = np.arange(20).reshape(10, 2)
+        labels = np.arange(10)
+        reader = nir.NumpyInputReader(features, labels, batch_size=4)
+
+        batches = [reader.get_sample_batch() for _ in range(3)]
+
+        assert [batch[0].shape[0] for batch in batches] == [4, 4, 2]
+        assert np.shares_memory(batches[0][0], features)
+        with pytest.raises(StopIteration):
+            reader.get_sample_batch()
+
+    def test_shuffled_epochs(self):
+        features = np.arange(20).reshape(10, 2)
+        labels = np.arange(10)
+        reader = nir.NumpyInputReader(features, labels, batch_size=3, shuffle=True, seed=1, number_epochs=2)
+
+        seen_labels = np.concatenate([reader.get_sample_batch()[1] for _ in range(8)])
+
+        assert sorted(seen_labels) == sorted(list(range(10)) * 2)
+
+    def test_sharding(self, tmpdir):
+        features_path = str(tmpdir.join("features.npy"))
+        labels_path = str(tmpdir.join("labels.npy"))
+        np.save(features_path, np.arange(14).reshape(7, 2))
+        np.save(labels_path, np.arange(7))
+
+        shards = [nir.NumpyInputReader(features_path, labels_path, batch_size=10, worker_rank=rank, number_workers=3)
+                  for rank in range(3)]
+
+        assert sorted(np.concatenate([shard.get_sample_batch()[1] for shard in shards])) == list(range(7))
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+import tools.object_detection as od
+
+
+class TestObjectDetection(object):
+
+    def test_iou_matrix_matches_pairwise_iou(self):
+        bboxes1 = np.array([[0, 0, 9, 9], [5, 5, 14, 14], [20, 20, 29, 29]])
+        bboxes2 = np.array([[0, 0, 9, 9], [9, 9, 18, 18]])
+
+        iou_matrix = od.calculate_iou_matrix(bboxes1, bboxes2)
+
+        assert iou_matrix.shape == (3, 2)
+        for i in range(3):
+            for j in range(2):
+                assert np.isclose(iou_matrix[i, j], od.calculate_iou_two_points(bboxes1[i], bboxes2[j]))
+
+    def test_iou_matrix_one_point_format(self):
+        bboxes1 = np.array([[0, 0, 10, 10], [5, 5, 10, 10]])
+        bboxes2 = np.array([[2, 3, 7, 4]])
+
+        iou_matrix = od.calculate_iou_matrix(bboxes1, bboxes2, one_point=True)
+
+        for i in range(2):
+            assert np.isclose(iou_matrix[i, 0], od.calculate_iou_one_point(bboxes1[i], bboxes2[0]))
+
+    def test_iou_matrix_chunked(self):
+        random_state = np.random.RandomState(0)
+        top_left = random_state.randint(0, 100, size=(50, 2))
+        bboxes1 = np.hstack([top_left, top_left + random_state.randint(1, 50, size=(50, 2))])
+        top_left = random_state.randint(0, 100, size=(30, 2))
+        bboxes2 = np.hstack([top_left, top_left + random_state.randint(1, 50, size=(30, 2))])
+
+        assert np.allclose(od.calculate_iou_matrix(bboxes1, bboxes2),
+                           od.calculate_iou_matrix(bboxes1, bboxes2, chunk_size=7))
+
+    def test_iou_matrix_chunks_and_out(self):
+        random_state = np.random.RandomState(1)
+        top_left = random_state.randint(0, 100, size=(23, 2))
+        bboxes1 = np.hstack([top_left, top_left + random_state.randint(1, 50, size=(23, 2))])
+        top_left = random_state.randint(0, 100, size=(11, 2))
+        bboxes2 = np.hstack([top_left, top_left + random_state.randint(1, 50, size=(11, 2))])
+        expected = od.calculate_iou_matrix(bboxes1, bboxes2)
+
+        chunks = list(od.iterate_iou_matrix_chunks(bboxes1, bboxes2, chunk_size=5))
+        assert [start for start, _ in chunks] == [0, 5, 10, 15, 20]
+        assert max(block.shape[0] for _, block in chunks) == 5
+        assert np.allclose(np.vstack([block for _, block in chunks]), expected)
+
+        out = np.full((23, 11), -1.0, dtype=np.float32)
+        result = od.calculate_iou_matrix(bboxes1, bboxes2, chunk_size=5, out=out)
+        assert result is out
+        assert np.allclose(out, expected)
+
+        with pytest.raises(Exception):
+            od.calculate_iou_matrix(bboxes1, bboxes2, out=np.zeros((11, 23)))
+
+    def test_iou_matrix_empty(self):
+        assert od.calculate_iou_matrix(np.zeros((0, 4)), np.array([[0, 0, 1, 1]])).shape == (0, 1)
@@ -0,0 +1,158 @@
+import json
+import threading
+import numpy as np
+import tools.output_analyzer as output_analyzer
+
+
+class _BlockingImageWriter(object):
+    # Replaces image_tools.generate_image_with_bboxes with a function that records the written
+    # images and waits until release is set
+
+    def __init__(self):
+        self.written = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+
+    def __call__(self, image, image_name, predicted_objects, gt_objects, output_folder, roi_format=True):
+        self.started.set()
+        self.release.wait()
+        self.written.append((image_name, output_folder))
+
+
+class TestOutputAnalyzer(object):
+
+    def test_error_file_reader_tails_file(self, tmpdir):
+        error_file = str(tmpdir.join("error.txt"))
+        for iteration in range(5):
+            output_analyzer.write_error_to_file(error_file, iteration, iteration / 10.0)
+
+        reader = output_analyzer.ErrorFileReader(error_file, chunk_bytes=8)
+        iterations, errors = reader.read_new()
+        assert list(iterations) == [0, 1, 2, 3, 4]
+
+        with open(error_file, 'a') as errors_file:
+            errors_file.write("5,0.5\n6,0.")
+
+        iterations, errors = reader.read_new()
+        assert list(iterations) == [5]
+        assert list(reader.get_errors()[1]) == [0, 0.1, 0.2, 0.3, 0.4, 0.5]
+
+    def test_error_file_reader_lines_longer_than_chunk(self, tmpdir):
+        error_file = str(tmpdir.join("error.txt"))
+        with open(error_file, 'w') as errors_file:
+            errors_file.write("123456,0.123456789\n123457,0.5")
+
+        reader = output_analyzer.ErrorFileReader(error_file, chunk_bytes=8)
+        iterations, errors = reader.read_new()
+        assert list(iterations) == [123456]
+        assert list(errors) == [0.123456789]
+
+        with open(error_file, 'a') as errors_file:
+            errors_file.write("\n")
+        assert list(reader.read_new()[0]) == [123457]
+
+    def test_error_file_reader_final_line_without_end_of_line(self, tmpdir):
+        error_file = str(tmpdir.join("error.txt"))
+        with open(error_file, 'w') as errors_file:
+            errors_file.write("1,0.5\n2,0.25\n3,0.125")
+
+        reader = output_analyzer.ErrorFileReader(error_file, chunk_bytes=4)
+        assert list(reader.read_new()[0]) == [1, 2]
+        assert list(reader.read_new(final=True)[0]) == [3]
+        assert list(reader.read_new(final=True)[0]) == []
+        assert list(reader.get_errors()[1]) == [0.5, 0.25, 0.125]
+
+        summary = output_analyzer.summarize_error_file(error_file)
+        assert summary["number_errors"] == 3
+        assert summary["last_iteration"] == 3 and summary["min_error"] == 0.125
+        assert output_analyzer.summarize_error_file(error_file, final=False)["number_errors"] == 2
+
+        plot_reader = output_analyzer.ErrorFileReader(error_file)
+        output_analyzer.plot_error_from_file(error_file, output_path=str(tmpdir.join("error.png")),
+                                             error_reader=plot_reader)
+        assert list(plot_reader.get_errors()[0]) == [1, 2, 3]
+
+    def test_exponential_moving_average(self):
+        errors = np.array([1.0, 0.0, 2.0, 4.0])
+
+        expected = []
+        average = errors[0]
+        for error in errors:
+            average = 0.6 * average + 0.4 * error
+            expected.append(average)
+
+        assert np.allclose(output_analyzer.exponential_moving_average(errors, 0.6), expected)
+        assert np.allclose(output_analyzer.exponential_moving_average(errors, 0.0), errors)
+        assert output_analyzer.exponential_moving_average(np.zeros(0), 0.6).shape == (0,)
+
+    def test_downsample_error_curve(self):
+        iterations = np.arange(10.0)
+        errors = np.array([5, 1, 3, 2, 8, 4, 6, 0, 7, 9], dtype=np.float64)
+
+        bucket_x, bucket_min, bucket_max, bucket_mean = output_analyzer.downsample_error_curve(iterations, errors, 3)
+
+        assert list(bucket_x) == [0, 3, 6]
+        assert list(bucket_min) == [1, 2, 0]
+        assert list(bucket_max) == [5, 8, 9]
+        assert np.allclose(bucket_mean, [3, 14 / 3.0, 5.5])
+
+    def test_async_image_writer_drops_when_full(self, monkeypatch):
+        blocking_writer = _BlockingImageWriter()
+        monkeypatch.setattr(output_analyzer.image_tools, "generate_image_with_bboxes", blocking_writer)
+        image = np.zeros((4, 4, 3), dtype=np.uint8)
+
+        writer = output_analyzer.AsyncImageWriter(
+            "out", number_threads=1, max_queue_size=1, drop_when_full=True)
+        assert writer.submit(image, "1.jpg", [], [])
+        # The first image is being written, the second one waits in the queue and the third is dropped
+        blocking_writer.started.wait()
+        assert writer.submit(image, "2.jpg", [], [])
+        assert not writer.submit(image, "3.jpg", [], [])
+
+        blocking_writer.release.set()
+        writer.flush()
+        assert [name for name, _ in blocking_writer.written] == ["1.jpg", "2.jpg"]
+        assert writer.dropped == 1
+        writer.close()
+
+    def test_async_image_writer_sampling_and_errors(self, monkeypatch, tmpdir):
+        blocking_writer = _BlockingImageWriter()
+        blocking_writer.release.set()
+        monkeypatch.setattr(output_analyzer.image_tools, "generate_image_with_bboxes", blocking_writer)
+        image = np.zeros((4, 4, 3), dtype=np.uint8)
+
+        with output_analyzer.AsyncImageWriter("out", every_nth=2, only_errors=True) as writer:
+            for index in range(6):
+                writer.submit(image, "{}.jpg".format(index), [], [], has_errors=index != 4)
+            writer.flush()
+            assert sorted(blocking_writer.written) == [("0.jpg", "out"), ("2.jpg", "out")]
+            assert writer.skipped == 4
+
+        # has_errors is calculated from the boxes when it isn't given
+        del blocking_writer.written[:]
+        data_file = str(tmpdir.join("detections.txt"))
+        with output_analyzer.AsyncImageWriter("out", only_errors=True) as writer:
+            for name, predicted_class in [("correct.jpg", 'Cat'), ("wrong.jpg", 'Dog')]:
+                output_analyzer.write_image_detection_predictions_to_file(
+                    data_file, "other", image, name, [[0, 0, 9, 9]], ['Cat'], [[0, 0, 9, 9]],
+                    [predicted_class], image_writer=writer)
+
+        assert blocking_writer.written == [("wrong.jpg", "other")]
+
+    def test_results_sink_write_predictions(self, tmpdir):
+        output_file = str(tmpdir.join("predictions.jsonl"))
+
+        with output_analyzer.ResultsSink(output_file) as sink:
+            # Plain numbers use the fast path, the rest go through the JSON encoder
+            output_analyzer.write_predictions_to_file(sink, np.array([1, 2]), np.array([0.5, 0.25]))
+            output_analyzer.write_predictions_to_file(sink, [], [])
+            sink.write_predictions(np.array([3]), np.array([[0.1, float("nan")]]))
+
+        with open(output_file) as results:
+            lines = results.read().splitlines()
+
+        assert len(lines) == 3
+        assert [json.loads(line) for line in lines[:2]] == [{"label": 1, "prediction": 0.5},
+                                                            {"label": 2, "prediction": 0.25}]
+        assert json.loads(lines[2])["label"] == 3
+        assert np.isnan(json.loads(lines[2])["prediction"][1])
@@ -0,0 +1,59 @@
+import numpy as np
+import pytest
+import tools.quantization as quantization
+from numpy_input_reader import NumpyInputReader
+
+
+class TestQuantization(object):
+
+    def test_get_calibration_images_stops_at_end_of_input(self):
+        images = np.random.RandomState(0).rand(10, 8, 8, 3)
+        reader = NumpyInputReader(images, np.zeros(10), batch_size=4)
+
+        assert quantization.get_calibration_images(reader, 6).shape == (6, 8, 8, 3)
+        reader = NumpyInputReader(images, np.zeros(10), batch_size=4)
+        np.testing.assert_allclose(quantization.get_calibration_images(reader, 100), images)
+
+    def test_get_comparison_report(self):
+        float_outputs = np.array([[0.9, 0.1], [0.2, 0.8], [0.6, 0.4]])
+        int8_outputs = np.array([[0.8, 0.2], [0.3, 0.7], [0.4, 0.6]])
+
+        report = quantization.get_comparison_report(float_outputs, int8_outputs, 0.3, 0.1, labels=[0, 1, 1])
+
+        assert report["float32_ms_per_image"] == pytest.approx(100.0)
+        assert report["speedup"] == pytest.approx(3.0)
+        assert report["max_abs_difference"] == pytest.approx(0.2)
+        assert report["top1_agreement"] == pytest.approx(2 / 3.0)
+        assert report["float32_accuracy"] == pytest.approx(2 / 3.0)
+        assert report["int8_accuracy"] == pytest.approx(1.0)
+
+    def test_export_and_compare_int8_resnet(self, tmpdir):
+        tf = pytest.importorskip("tensorflow")
+        from reduced_resnet_builder import ReducedResnetBuilder
+
+        random_state = np.random.RandomState(0)
+        images = random_state.rand(20, 16, 16, 3).astype(np.float32)
+        reader = NumpyInputReader(images, random_state.randint(0, 4, 20), batch_size=8)
+
+        with tf.Graph().as_default():
+            builder = ReducedResnetBuilder(tf.glorot_uniform_initializer(), width_multiplier=0.5)
+            input_batch = tf.placeholder(tf.float32, shape=[None, 16, 16, 3])
+            features = builder.build_resnet(input_batch, 20)
+            scores = tf.layers.dense(tf.reduce_mean(features, axis=[1, 2]), 4)
+
+            with tf.Session() as session:
+                session.run(tf.global_variables_initializer())
+                calibration_images = quantization.get_calibration_images(reader, 16)
+                model_path = str(tmpdir.join("model.tflite"))
+                quantization.export_int8_model(
+                    session, input_batch, scores, calibration_images, model_path)
+
+                report = quantization.compare_float_and_int8(
+                    session, input_batch, scores, model_path, images[:4], labels=[0, 1, 2, 3],
+                    number_runs=1)
+
+        assert report["number_images"] == 4
+        assert report["int8_model_bytes"] > 0
+        assert report["int8_ms_per_image"] > 0
+        assert "int8_accuracy" in report
+        assert report["mean_abs_difference"] < 0.5
@@ -0,0 +1,176 @@
+import numpy as np
+import pytest
+import resnet_spec
+
+tf = pytest.importorskip("tensorflow")
+
+from complete_resnet_builder import CompleteResnetBuilder
+from reduced_resnet_builder import ReducedResnetBuilder
+
+# (builder class, stages table, input height and width)
+BUILDERS = [(ReducedResnetBuilder, resnet_spec.REDUCED_RESNET_STAGES, 32),
+            (CompleteResnetBuilder, resnet_spec.COMPLETE_RESNET_STAGES, 64)]
+
+CONFIGS = [(builder_class, number_layers, input_size)
+           for builder_class, stages_table, input_size in BUILDERS
+           for number_layers in sorted(stages_table.keys())]
+
+
+# Depth of the smallest net of each builder
+SMALLEST_DEPTHS = {ReducedResnetBuilder: 20, CompleteResnetBuilder: 18}
+
+
+def _run_reference_net(builder_class, images):
+    # Builds an NHWC net with random batch normalization statistics and returns its output for
+    # images, the values of its variables and its folded weights
+    random_state = np.random.RandomState(1)
+
+    with tf.Graph().as_default():
+        tf.set_random_seed(1)
+        builder = builder_class(tf.glorot_uniform_initializer())
+        input_batch = tf.placeholder(tf.float32, shape=[None, 32, 32, 3])
+        output = builder.build_resnet(input_batch, SMALLEST_DEPTHS[builder_class])
+
+        with tf.Session() as session:
+            session.run(tf.global_variables_initializer())
+            # Moves the statistics of batch normalization away from their initial values
+            for variable in tf.global_variables():
+                if "moving" in variable.name or "gamma" in variable.name or "beta" in variable.name:
+                    variable.load(random_state.rand(*variable.get_shape().as_list()) + 0.5, session)
+
+            return (session.run(output, {input_batch: images}), session.run(tf.global_variables()),
+                    builder.get_folded_weights(session))
+
+
+class TestResnetBuilders(object):
+
+    @pytest.mark.parametrize("builder_class,number_layers,input_size", CONFIGS)
+    def test_graph_matches_spec(self, builder_class, number_layers, input_size):
+        builder = builder_class(tf.glorot_uniform_initializer())
+        net_info = builder._get_net_info(number_layers)
+        costs = builder.get_stage_costs(number_layers, input_size, input_size)
+
+        with tf.Graph().as_default() as graph:
+            input_batch = tf.placeholder(tf.float32, shape=[None, input_size, input_size, 3])
+            output = builder.build_resnet(input_batch, number_layers)
+
+            residual_units = [operation for operation in graph.get_operations()
+                              if operation.name.endswith("-Add")]
+            number_parameters = sum(int(np.prod(variable.get_shape().as_list()))
+                                    for variable in tf.trainable_variables())
+
+        assert len(residual_units) == sum(stage.units for stage in net_info)
+        assert tuple(output.get_shape().as_list()[1:]) == costs[-1]["output_shape"]
+        assert number_parameters == sum(stage["parameters"] for stage in costs)
+
+    @pytest.mark.parametrize("builder_class", [ReducedResnetBuilder, CompleteResnetBuilder])
+    def test_folded_graph_matches(self, builder_class):
+        images = np.random.RandomState(0).rand(2, 32, 32, 3).astype(np.float32)
+        expected, _, folded_weights = _run_reference_net(builder_class, images)
+
+        with tf.Graph().as_default() as graph:
+            builder = builder_class(tf.glorot_uniform_initializer(), fold_batch_norm=True)
+            input_batch = tf.placeholder(tf.float32, shape=[None, 32, 32, 3])
+            output = builder.build_resnet(input_batch, SMALLEST_DEPTHS[builder_class])
+            with tf.Session() as session:
+                session.run(tf.global_variables_initializer())
+                builder.load_folded_weights(session, folded_weights)
+                folded = session.run(output, {input_batch: images})
+
+            assert not [operation for operation in graph.get_operations() if "Batch" in operation.name]
+
+        np.testing.assert_allclose(folded, expected, rtol=1e-3, atol=1e-3)
+
+    @pytest.mark.parametrize("builder_class", [ReducedResnetBuilder, CompleteResnetBuilder])
+    def test_channels_first_graph_matches(self, builder_class):
+        images = np.random.RandomState(0).rand(2, 32, 32, 3).astype(np.float32)
+        expected, weights, _ = _run_reference_net(builder_class, images)
+
+        with tf.Graph().as_default():
+            builder = builder_class(tf.glorot_uniform_initializer(), data_format="channels_first")
+            input_batch = tf.placeholder(tf.float32, shape=[None, 32, 32, 3])
+            output = builder.build_resnet(input_batch, SMALLEST_DEPTHS[builder_class])
+            with tf.Session() as session:
+                for variable, value in zip(tf.global_variables(), weights):
+                    variable.load(value, session)
+                try:
+                    channels_first = session.run(output, {input_batch: images})
+                except (tf.errors.InvalidArgumentError, tf.errors.UnimplementedError) as error:
+                    # The CPU kernels of some TF builds only support NHWC
+                    if "NHWC" not in str(error):
+                        raise
+                    pytest.skip("NCHW is not supported on this device: " + str(error).splitlines()[0])
+
+        np.testing.assert_allclose(channels_first, expected, rtol=1e-3, atol=1e-3)
+
+    def test_eval_net_shares_variables_with_training_net(self):
+        images = np.random.RandomState(0).rand(4, 32, 32, 3).astype(np.float32)
+
+        with tf.Graph().as_default():
+            builder = ReducedResnetBuilder(tf.glorot_uniform_initializer())
+            input_batch = tf.placeholder(tf.float32, shape=[None, 32, 32, 3])
+            training_output = builder.build_resnet(input_batch, 20, training=True, scope="Resnet")
+            number_variables = len(tf.global_variables())
+            number_update_ops = len(tf.get_collection(tf.GraphKeys.UPDATE_OPS))
+
+            eval_output = builder.build_resnet(input_batch, 20, training=False, scope="Resnet", reuse=True)
+
+            assert len(tf.global_variables()) == number_variables
+            assert len(tf.get_collection(tf.GraphKeys.UPDATE_OPS)) == number_update_ops > 0
+
+            # The same net can also switch modes with a tensor
+            training = tf.placeholder_with_default(False, shape=[])
+            switch_output = builder.build_resnet(input_batch, 20, training=training, scope="Resnet",
+                                                 reuse=True)
+
+            with tf.Session() as session:
+                session.run(tf.global_variables_initializer())
+                eval_values, switch_eval_values = session.run(
+                    [eval_output, switch_output], {input_batch: images})
+                training_values, switch_training_values = session.run(
+                    [training_output, switch_output], {input_batch: images, training: True})
+
+        np.testing.assert_allclose(switch_eval_values, eval_values, rtol=1e-5, atol=1e-5)
+        np.testing.assert_allclose(switch_training_values, training_values, rtol=1e-5, atol=1e-5)
+        assert not np.allclose(training_values, eval_values)
+
+    def test_eval_net_reuses_variables_without_scope(self):
+        with tf.Graph().as_default():
+            builder = ReducedResnetBuilder(tf.glorot_uniform_initializer())
+            input_batch = tf.placeholder(tf.float32, shape=[None, 32, 32, 3])
+            first_output = builder.build_resnet(input_batch, 20, training=False)
+            first_kernels = [conv.kernel for conv, _ in builder.conv_batch_norm_layers]
+            variable_names = [variable.name for variable in tf.global_variables()]
+
+            reused_output = builder.build_resnet(input_batch, 20, training=False, reuse=True)
+
+            assert [variable.name for variable in tf.global_variables()] == variable_names
+            assert "InitialConvLayer/kernel:0" in variable_names
+            assert [conv.kernel for conv, _ in builder.conv_batch_norm_layers] == first_kernels
+
+            with tf.Session() as session:
+                session.run(tf.global_variables_initializer())
+                first_values, reused_values = session.run(
+                    [first_output, reused_output], {input_batch: np.random.rand(2, 32, 32, 3)})
+
+        np.testing.assert_array_equal(first_values, reused_values)
+
+    def test_mixed_precision_keeps_float32_variables(self):
+        with tf.Graph().as_default() as graph:
+            builder = ReducedResnetBuilder(tf.glorot_uniform_initializer(), mixed_precision=True)
+            input_batch = tf.placeholder(tf.float32, shape=[None, 32, 32, 3])
+            output = builder.build_resnet(input_batch, 20, training=True)
+            gradients = tf.gradients(tf.reduce_sum(output), tf.trainable_variables())
+
+            convolutions = [operation for operation in graph.get_operations()
+                            if operation.type == "Conv2D"]
+
+            with tf.Session() as session:
+                session.run(tf.global_variables_initializer())
+                values = session.run(output, {input_batch: np.random.rand(2, 32, 32, 3)})
+
+        assert output.dtype == tf.float32
+        assert all(variable.dtype.base_dtype == tf.float32 for variable in graph.get_collection("variables"))
+        assert all(operation.outputs[0].dtype == tf.float16 for operation in convolutions)
+        assert all(gradient is not None for gradient in gradients)
+        assert np.all(np.isfinite(values))
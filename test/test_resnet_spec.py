@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+import resnet_spec
+
+
+class TestResnetSpec(object):
+
+    def test_costs_match_standard_resnets(self):
+        stem = {"filters": 64, "kernel_size": 7, "stride": 2, "pool_stride": 2}
+
+        # Standard ImageNet ResNets have 4 times the filters of COMPLETE_RESNET_STAGES
+        resnet_18 = resnet_spec.count_net_costs(
+            stem, resnet_spec.get_net_info(resnet_spec.COMPLETE_RESNET_STAGES, 18, 4.0), 224, 224, 3)
+        resnet_50 = resnet_spec.count_net_costs(
+            stem, resnet_spec.get_net_info(resnet_spec.COMPLETE_RESNET_STAGES, 50, 4.0), 224, 224, 3)
+
+        assert resnet_18[-1]["output_shape"] == (7, 7, 512)
+        assert resnet_50[-1]["output_shape"] == (7, 7, 2048)
+        assert round(sum(stage["flops"] for stage in resnet_18) / 1e9, 1) == 1.8
+        assert round(sum(stage["flops"] for stage in resnet_50) / 1e9, 1) == 4.1
+        assert round(sum(stage["parameters"] for stage in resnet_50) / 1e6, 1) == 23.5
+
+    def test_width_multiplier_and_invalid_depth(self):
+        stages = resnet_spec.get_net_info(resnet_spec.REDUCED_RESNET_STAGES, 20, 0.5)
+
+        assert [stage.filters for stage in stages] == [8, 16, 32]
+        with pytest.raises(Exception):
+            resnet_spec.get_net_info(resnet_spec.REDUCED_RESNET_STAGES, 21)
+
+    def test_fold_batch_norm(self):
+        random_state = np.random.RandomState(0)
+        inputs = random_state.randn(10, 3)
+        # A 1x1 convolution is a matrix product over the channels
+        kernel = random_state.randn(1, 1, 3, 4)
+        bias = random_state.randn(4)
+        gamma, beta, mean = random_state.randn(3, 4)
+        variance = random_state.rand(4)
+
+        folded_kernel, folded_bias = resnet_spec.fold_batch_norm(kernel, bias, gamma, beta, mean, variance)
+
+        expected = (inputs.dot(kernel[0, 0]) + bias - mean) / np.sqrt(variance + 0.001) * gamma + beta
+        np.testing.assert_allclose(inputs.dot(folded_kernel[0, 0]) + folded_bias, expected)
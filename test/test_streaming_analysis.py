@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+import average_precision_analysis as apa
+import streaming_analysis as sa
+
+
+class TestStreamingAnalysis(object):
+
+    def test_streaming_classification(self):
+        analyzer = sa.StreamingClassificationAnalysis(['Person', 'Cat', 'Dog'], number_bins=10)
+
+        analyzer.add_batch(['Person', 'Cat'], [[0.9, 0.05, 0.05], [0.2, 0.7, 0.1]])
+        analyzer.add_batch(np.array([2, 2]), [[0.1, 0.6, 0.3], [0.05, 0.05, 0.9]])
+
+        assert analyzer.samples_seen == 4
+        assert analyzer.confusion_matrix.loc['Dog', 'Cat'] == 1
+        assert analyzer.get_class_recall('Dog') == 0.5
+
+        metrics = analyzer.get_running_metrics()
+        assert metrics["average_precisions"]['Person'] == 1
+        # Scores for Cat: 0.7 (Cat), 0.6 (Dog), 0.05, 0.05 -> precision 1 at recall 1
+        assert metrics["average_precisions"]['Cat'] == 1
+        assert metrics["report"].loc['Dog', 'support'] == 2
+
+    def test_streaming_classification_merge_rejects_different_configurations(self):
+        analyzer = sa.StreamingClassificationAnalysis(['Person', 'Cat'], number_bins=10)
+        analyzer.add_batch(['Person'], [[0.9, 0.1]])
+
+        for other in [sa.StreamingClassificationAnalysis(['Person', 'Cat'], number_bins=20),
+                      sa.StreamingClassificationAnalysis(['Person', 'Dog'], number_bins=10)]:
+            other.add_batch([1], [[0.2, 0.8]])
+            with pytest.raises(Exception, match="different configurations"):
+                analyzer.merge(other)
+
+        # Nothing was added by the failed merges
+        assert analyzer.confusion_counts.sum() == 1 and analyzer.samples_seen == 1
+
+        other = sa.StreamingClassificationAnalysis(['Person', 'Cat'], number_bins=10)
+        other.add_batch(['Cat'], [[0.2, 0.8]])
+        analyzer.merge(other)
+        assert analyzer.confusion_counts.sum() == 2 and analyzer.score_histogram.sum() == 4
+
+    def test_streaming_average_precision_matches_exact(self):
+        random_state = np.random.RandomState(0)
+        exact_analyzer = apa.AveragePrecisionAnalysis(['Person', 'Cat'])
+        streaming_analyzer = sa.StreamingAveragePrecisionAnalysis(['Person', 'Cat'], number_bins=100000)
+
+        for _ in range(10):
+            top_left = random_state.randint(0, 50, size=(5, 2))
+            gt_boxes = np.hstack([top_left, top_left + 20])
+            gt_classes = ['Person', 'Cat', 'Person', 'Cat', 'Person']
+            predicted_boxes = np.vstack([gt_boxes + random_state.randint(-4, 5, size=(5, 4)), gt_boxes[:2] + 15])
+            predicted_classes = gt_classes + ['Person', 'Cat']
+            predicted_scores = random_state.rand(7)
+
+            exact_analyzer.add_record_arrays(gt_boxes, gt_classes, predicted_boxes, predicted_classes, predicted_scores)
+            streaming_analyzer.add_record_arrays(
+                gt_boxes, gt_classes, predicted_boxes, predicted_classes, predicted_scores)
+
+        assert np.allclose(streaming_analyzer.get_average_precisions().values,
+                           exact_analyzer.get_average_precisions().values)
+        assert streaming_analyzer.get_running_metrics()["images_seen"] == 10
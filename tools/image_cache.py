@@ -0,0 +1,196 @@
+import collections
+import hashlib
+import os
+import threading
+import cv2
+import numpy as np
+import tools.image_tools as image_tools
+
+
+class ResizedImageCache:
+
+    # Keeps resized images in memory so images that are used every epoch or evaluation pass are only
+    # read and resized once. Entries are keyed by (path, modification time, height, width,
+    # interpolation), so a modified image is never served from the cache.
+
+    def __init__(self, max_bytes, spill_dir=None, max_spill_bytes=None):
+        """
+        :param
+            max_bytes: maximum number of bytes of pixels kept in memory. The least recently used
+            images are evicted when a new image doesn't fit
+            spill_dir: optional folder where evicted images are written as .npy files. Images found
+            there are memory mapped instead of being read and resized again
+            max_spill_bytes: maximum number of bytes of the files in spill_dir. The least recently
+            used files are removed when a new one doesn't fit. None doesn't limit them
+        """
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self.max_spill_bytes = max_spill_bytes
+        self.current_bytes = 0
+        self.spill_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = collections.OrderedDict()
+        # Spill path to (key, bytes) of the files in spill_dir, from least to most recently used
+        self._spilled = collections.OrderedDict()
+        # Last modification time seen for every image, to remove the copies of modified images
+        self._modification_times = {}
+        self._lock = threading.Lock()
+
+        if spill_dir is not None and not os.path.exists(spill_dir):
+            os.makedirs(spill_dir)
+
+    def get(self, image, height, width, interpolation=cv2.INTER_CUBIC):
+        """
+        Returns the pixels of an image resized to (height x width x 3), reading it only if it isn't
+        cached. The returned array must not be modified, since it is shared with the cache
+
+        :param
+            image: path to an image
+            height: new height for the image
+            width: new width for the image
+            interpolation: cv2 interpolation used to resize the image
+        """
+        modification_time = os.path.getmtime(image)
+        key = (image, modification_time, height, width, interpolation)
+
+        with self._lock:
+            stale_paths = self._remove_stale(image, modification_time)
+            pixels = self._entries.get(key)
+            if pixels is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+        self._remove_files(stale_paths)
+
+        if pixels is not None:
+            return pixels
+
+        spill_path = self._get_spill_path(key)
+        if spill_path is not None and os.path.exists(spill_path):
+            try:
+                pixels = np.load(spill_path, mmap_mode='r')
+            except FileNotFoundError:
+                # Removed by another thread to keep the spilled bytes under the limit
+                pixels = None
+            if pixels is not None:
+                with self._lock:
+                    self.disk_hits += 1
+                    removed_paths = self._track_spill(spill_path, key, pixels.nbytes)
+                self._remove_files(removed_paths)
+                return pixels
+
+        pixels = image_tools.load_resized_image(image, height, width, interpolation)
+
+        with self._lock:
+            self.misses += 1
+            evicted = self._add(key, pixels)
+
+        # Writing to disk is slow, so it is done without holding the lock
+        for evicted_key, evicted_pixels in evicted:
+            self._spill(evicted_key, evicted_pixels)
+
+        return pixels
+
+    def get_stats(self):
+        """
+        :return: Dictionary with the number of hits, disk hits, misses and evictions, the number of
+        images in memory, the bytes they use and the bytes of the spilled images
+        """
+        with self._lock:
+            return {"hits": self.hits, "disk_hits": self.disk_hits, "misses": self.misses,
+                    "evictions": self.evictions, "entries": len(self._entries),
+                    "bytes": self.current_bytes, "spill_bytes": self.spill_bytes}
+
+    def clear(self):
+        """
+        Removes all the images from memory. Spilled images are kept on disk
+        """
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+    def _add(self, key, pixels):
+        # Returns the (key, pixels) that must be spilled to disk. Images bigger than the whole
+        # budget are never kept in memory
+        if pixels.nbytes > self.max_bytes:
+            return [(key, pixels)]
+
+        if key in self._entries:
+            return []
+
+        evicted = []
+        while self.current_bytes + pixels.nbytes > self.max_bytes:
+            evicted_key, evicted_pixels = self._entries.popitem(last=False)
+            self.current_bytes -= evicted_pixels.nbytes
+            self.evictions += 1
+            evicted.append((evicted_key, evicted_pixels))
+
+        self._entries[key] = pixels
+        self.current_bytes += pixels.nbytes
+        return evicted
+
+    def _spill(self, key, pixels):
+        spill_path = self._get_spill_path(key)
+        if spill_path is None or os.path.exists(spill_path):
+            return
+        if self.max_spill_bytes is not None and pixels.nbytes > self.max_spill_bytes:
+            return
+
+        # Written under a temporary name first so readers never see a partial file. The name is
+        # unique per thread, since two threads can spill the same image at the same time
+        temporary_path = "{}.{}.tmp.npy".format(spill_path, threading.get_ident())
+        np.save(temporary_path, pixels)
+        os.replace(temporary_path, spill_path)
+
+        with self._lock:
+            removed_paths = self._track_spill(spill_path, key, pixels.nbytes)
+        self._remove_files(removed_paths)
+
+    def _track_spill(self, spill_path, key, number_bytes):
+        # Marks a spilled file as the most recently used one and returns the paths of the files
+        # that must be removed to keep the spilled bytes under max_spill_bytes
+        if spill_path in self._spilled:
+            self._spilled.move_to_end(spill_path)
+            return []
+
+        self._spilled[spill_path] = (key, number_bytes)
+        self.spill_bytes += number_bytes
+
+        removed_paths = []
+        while self.max_spill_bytes is not None and self.spill_bytes > self.max_spill_bytes:
+            removed_path, (_, removed_bytes) = self._spilled.popitem(last=False)
+            self.spill_bytes -= removed_bytes
+            removed_paths.append(removed_path)
+        return removed_paths
+
+    def _remove_stale(self, image, modification_time):
+        # Forgets the copies of an image with an older modification time and returns the paths of
+        # their spilled files, which must be removed
+        previous_time = self._modification_times.get(image)
+        self._modification_times[image] = modification_time
+        if previous_time is None or previous_time == modification_time:
+            return []
+
+        for key in [key for key in self._entries if key[0] == image and key[1] != modification_time]:
+            self.current_bytes -= self._entries.pop(key).nbytes
+
+        stale_paths = [path for path, (key, _) in self._spilled.items()
+                       if key[0] == image and key[1] != modification_time]
+        for path in stale_paths:
+            self.spill_bytes -= self._spilled.pop(path)[1]
+        return stale_paths
+
+    @staticmethod
+    def _remove_files(paths):
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def _get_spill_path(self, key):
+        if self.spill_dir is None:
+            return None
+        return os.path.join(self.spill_dir, hashlib.sha1(repr(key).encode()).hexdigest() + ".npy")
@@ -1,4 +1,6 @@
+import concurrent.futures
 import cv2
+import numpy as np
 import random
 
 
@@ -26,6 +28,89 @@ def resize_image(image, height, width):
     return cv2.resize(image, dsize=(width, height), interpolation=cv2.INTER_CUBIC)
 
 
+def load_resized_image(image, height, width, interpolation=cv2.INTER_CUBIC):
+    """
+    Reads an image and resizes it to (height x width x 3). Unlike image_to_pixels, it raises an
+    error when the image can't be read instead of returning None
+
+    :param
+        image: path to an image
+        height: new height for the image
+        width: new width for the image
+        interpolation: cv2 interpolation used to resize the image
+    """
+    pixels = cv2.imread(image)
+    if pixels is None:
+        raise IOError("Image {} could not be read".format(image))
+    return cv2.resize(pixels, dsize=(width, height), interpolation=interpolation)
+
+
+def load_resized_images(images, height, width, number_workers=8, use_processes=False,
+                        max_in_flight=None, interpolation=cv2.INTER_CUBIC):
+    """
+    Reads and resizes a list of images in parallel into a single preallocated uint8 array with
+    shape (N x height x width x 3).
+
+    By default images are processed on a thread pool, which uses several cores because cv2
+    releases the GIL while decoding and resizing. With use_processes a process pool is used
+    instead, and each resized image is copied back to the main process.
+
+    :param
+        images: list of paths to images
+        height: new height for the images
+        width: new width for the images
+        number_workers: number of threads or processes
+        use_processes: true to use a process pool instead of a thread pool
+        max_in_flight: maximum number of images being processed at the same time, which bounds the
+        memory used by decoded images that haven't been resized yet. Defaults to 4 per worker
+        interpolation: cv2 interpolation used to resize the images
+    :return:
+        Tuple with the array of images and a list of (index, path, error message) for the images
+        that couldn't be loaded. The pixels of those images are left as zeros
+    """
+    output = np.zeros((len(images), height, width, 3), dtype=np.uint8)
+    errors = []
+    max_in_flight = max_in_flight or 4 * number_workers
+
+    def load_into_output(index):
+        output[index] = load_resized_image(images[index], height, width, interpolation)
+
+    if use_processes:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=number_workers)
+    else:
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=number_workers)
+
+    with executor:
+        in_flight = {}
+        next_index = 0
+
+        while next_index < len(images) or in_flight:
+            # Only submit new images when there is room, so at most max_in_flight are in memory
+            while next_index < len(images) and len(in_flight) < max_in_flight:
+                if use_processes:
+                    future = executor.submit(
+                        load_resized_image, images[next_index], height, width, interpolation)
+                else:
+                    future = executor.submit(load_into_output, next_index)
+                in_flight[future] = next_index
+                next_index += 1
+
+            done, _ = concurrent.futures.wait(
+                in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+
+            for future in done:
+                index = in_flight.pop(future)
+                try:
+                    result = future.result()
+                    if use_processes:
+                        output[index] = result
+                except Exception as error:
+                    errors.append((index, images[index], str(error)))
+
+    errors.sort()
+    return output, errors
+
+
 def show_image_from_pixels(image):
     """
     :param
@@ -0,0 +1,147 @@
+import json
+import logging
+import os
+import numpy as np
+import pandas as pd
+
+
+# Binary cache for CSV input files with format label, feature_1, ..., feature_n. Each CSV file is
+# converted once to two .npy files (features and labels) that can be memory mapped, plus a small
+# JSON file with the size and modification time of the source so the cache is rebuilt when the
+# source changes.
+
+CACHE_VERSION = 1
+
+logger = logging.getLogger(__name__)
+
+
+def get_cache_paths(filename, cache_dir=None):
+    """
+    :param
+        filename: path to the CSV file
+        cache_dir: folder where the cache is stored. Defaults to the folder of the CSV file
+    :return:
+        Tuple with the paths to the features, labels and metadata files of the cache
+    """
+    cache_dir = cache_dir if cache_dir is not None else os.path.dirname(os.path.abspath(filename))
+    prefix = os.path.join(cache_dir, os.path.basename(filename))
+    return prefix + ".features.npy", prefix + ".labels.npy", prefix + ".cache.json"
+
+
+def is_cache_valid(filename, number_features, cache_dir=None):
+    """
+    :param
+        filename: path to the CSV file
+        number_features: Number of features that each record contains
+        cache_dir: folder where the cache is stored. Defaults to the folder of the CSV file
+    :return:
+        True if the cache exists and was built from the current version of the CSV file
+    """
+    features_path, labels_path, metadata_path = get_cache_paths(filename, cache_dir)
+
+    if not all(os.path.exists(path) for path in (features_path, labels_path, metadata_path)):
+        return False
+
+    with open(metadata_path, 'r') as metadata_file:
+        metadata = json.load(metadata_file)
+
+    return metadata == _get_source_metadata(filename, number_features)
+
+
+def has_cache(filename, cache_dir=None):
+    """
+    :param
+        filename: path to the CSV file
+        cache_dir: folder where the cache is stored. Defaults to the folder of the CSV file
+    :return:
+        True if a cache was built for the CSV file, even if it is outdated
+    """
+    return os.path.exists(get_cache_paths(filename, cache_dir)[2])
+
+
+def convert_csv_to_cache(filename, number_features, cache_dir=None, chunk_size=100000):
+    """
+    Parses a CSV file and writes its features and labels to .npy files. The file is parsed in
+    chunks of chunk_size lines written directly into the memory mapped output, so it never needs
+    to fit in memory
+
+    :param
+        filename: path to the CSV file
+        number_features: Number of features that each record contains
+        cache_dir: folder where the cache is stored. Defaults to the folder of the CSV file
+        chunk_size: number of lines parsed at once
+    :return:
+        Tuple with the paths to the features and labels files
+    """
+    features_path, labels_path, metadata_path = get_cache_paths(filename, cache_dir)
+    # The source is described as it was before reading it. If it changes during the conversion, the
+    # cache doesn't match the new version and is built again next time
+    source_metadata = _get_source_metadata(filename, number_features)
+
+    if cache_dir is not None and not os.path.exists(cache_dir):
+        os.makedirs(cache_dir)
+
+    with open(filename, 'rb') as csv_file:
+        number_records = sum(1 for line in csv_file if line.strip())
+
+    features = np.lib.format.open_memmap(
+        features_path, mode='w+', dtype=np.int32, shape=(number_records, number_features))
+    labels = np.lib.format.open_memmap(
+        labels_path, mode='w+', dtype=np.int32, shape=(number_records,))
+
+    start = 0
+    if number_records > 0:
+        # Lines appended after counting the records are ignored, so they always fit in the output
+        for chunk in pd.read_csv(filename, header=None, dtype=np.int32, chunksize=chunk_size,
+                                 nrows=number_records):
+            values = chunk.values
+            features[start:start + values.shape[0]] = values[:, 1:number_features + 1]
+            labels[start:start + values.shape[0]] = values[:, 0]
+            start += values.shape[0]
+
+    features.flush()
+    labels.flush()
+    del features, labels
+
+    # Metadata is written last, so an interrupted conversion never looks like a valid cache
+    with open(metadata_path, 'w') as metadata_file:
+        json.dump(source_metadata, metadata_file)
+
+    return features_path, labels_path
+
+
+def get_or_create_cache(filename, number_features, cache_dir=None):
+    """
+    Returns the cache for a CSV file, converting the file first if there is no valid cache for it
+
+    :param
+        filename: path to the CSV file
+        number_features: Number of features that each record contains
+        cache_dir: folder where the cache is stored. Defaults to the folder of the CSV file
+    :return:
+        Tuple with the paths to the features and labels files
+    """
+    if is_cache_valid(filename, number_features, cache_dir):
+        features_path, labels_path, _ = get_cache_paths(filename, cache_dir)
+        return features_path, labels_path
+
+    logger.info("Building binary cache for %s", filename)
+    return convert_csv_to_cache(filename, number_features, cache_dir)
+
+
+def load_cache(features_path, labels_path, mmap_mode='r'):
+    """
+    :param
+        features_path: path to the features file of the cache
+        labels_path: path to the labels file of the cache
+        mmap_mode: mode used to memory map the files. None loads them in memory
+    :return:
+        Tuple with the features array (records, features) and the labels array (records,)
+    """
+    return np.load(features_path, mmap_mode=mmap_mode), np.load(labels_path, mmap_mode=mmap_mode)
+
+
+def _get_source_metadata(filename, number_features):
+    stat = os.stat(filename)
+    return {"version": CACHE_VERSION, "size": stat.st_size, "mtime": stat.st_mtime,
+            "number_features": number_features}
@@ -1,3 +1,6 @@
+import numpy as np
+
+
 def calculate_iou_two_points(bbox1, bbox2):
     """
     Calculates intersection over union between two bounding boxes
@@ -46,3 +49,100 @@ def calculate_iou_one_point(bbox1, bbox2):
     new_bbox1 = [bbox1[0], bbox1[1], bbox1[0] + bbox1[2] - 1, bbox1[1] + bbox1[3] - 1]
     new_bbox2 = [bbox2[0], bbox2[1], bbox2[0] + bbox2[2] - 1, bbox2[1] + bbox2[3] - 1]
     return calculate_iou_two_points(new_bbox1, new_bbox2)
+
+
+def convert_one_point_to_two_points(bboxes):
+    """
+    Converts an array of bounding boxes from format [x, y, w, h] to format [x1, y1, x2, y2], using the same "+1 pixel"
+    convention as calculate_iou_one_point
+
+    :param bboxes: Array with shape (N, 4) containing bounding boxes with format [x, y, w, h]
+    :return: Array with shape (N, 4) containing bounding boxes with format [x1, y1, x2, y2]
+    """
+    bboxes = np.asarray(bboxes, dtype=np.float64).reshape(-1, 4)
+    converted = bboxes.copy()
+    converted[:, 2] = bboxes[:, 0] + bboxes[:, 2] - 1
+    converted[:, 3] = bboxes[:, 1] + bboxes[:, 3] - 1
+    return converted
+
+
+def calculate_iou_matrix(bboxes1, bboxes2, one_point=False, chunk_size=None, out=None):
+    """
+    Calculates intersection over union between every pair of bounding boxes in two arrays in a single vectorized pass.
+    Element [i, j] of the result is the IoU between bboxes1[i] and bboxes2[j], computed with the same "+1 pixel"
+    convention as calculate_iou_two_points.
+
+    When chunk_size is given, bboxes1 is processed in slices of chunk_size rows, so the intermediate arrays never hold
+    more than chunk_size x M elements. The result still has N x M elements: pass a preallocated (for example memory
+    mapped) array as out, or use iterate_iou_matrix_chunks, when it doesn't fit in memory either.
+
+    :param bboxes1: Array with shape (N, 4) containing bounding boxes
+    :param bboxes2: Array with shape (M, 4) containing bounding boxes
+    :param one_point: true if the format of the boxes is [x, y, w, h], false if format is [x1, y1, x2, y2]
+    :param chunk_size: Maximum number of rows of bboxes1 to process at once. None processes all of them together
+    :param out: Optional array with shape (N, M) where the result is written, instead of allocating a new one
+    :return: Array with shape (N, M) containing the IoU for each pair of boxes
+    """
+    bboxes1, bboxes2 = _get_two_points_bboxes(bboxes1, bboxes2, one_point)
+    shape = (bboxes1.shape[0], bboxes2.shape[0])
+
+    if out is None:
+        out = np.zeros(shape, dtype=np.float64)
+    elif out.shape != shape:
+        raise Exception("Output array for IoU matrix must have shape {}, not {}".format(shape, out.shape))
+
+    for start, iou_chunk in iterate_iou_matrix_chunks(bboxes1, bboxes2, chunk_size=chunk_size):
+        out[start:start + iou_chunk.shape[0]] = iou_chunk
+
+    return out
+
+
+def iterate_iou_matrix_chunks(bboxes1, bboxes2, chunk_size=None, one_point=False):
+    """
+    Same as calculate_iou_matrix, but yields the matrix in blocks of rows instead of building it, so only chunk_size x M
+    elements are in memory at any time
+
+    :param bboxes1: Array with shape (N, 4) containing bounding boxes
+    :param bboxes2: Array with shape (M, 4) containing bounding boxes
+    :param chunk_size: Maximum number of rows of each block. None yields a single block with all of them
+    :param one_point: true if the format of the boxes is [x, y, w, h], false if format is [x1, y1, x2, y2]
+    :return: Generator of (start, block), where block is the array with shape (rows, M) with the IoU of
+    bboxes1[start:start + rows] against every box of bboxes2
+    """
+    if chunk_size is not None and chunk_size <= 0:
+        raise Exception("Chunk size for IoU matrix must be a positive number")
+
+    bboxes1, bboxes2 = _get_two_points_bboxes(bboxes1, bboxes2, one_point)
+
+    if bboxes1.shape[0] == 0 or bboxes2.shape[0] == 0:
+        return
+
+    area_bboxes2 = (bboxes2[:, 2] - bboxes2[:, 0] + 1) * (bboxes2[:, 3] - bboxes2[:, 1] + 1)
+    step = bboxes1.shape[0] if chunk_size is None else chunk_size
+
+    for start in range(0, bboxes1.shape[0], step):
+        yield start, _calculate_iou_matrix_chunk(bboxes1[start:start + step], bboxes2, area_bboxes2)
+
+
+def _get_two_points_bboxes(bboxes1, bboxes2, one_point):
+    if one_point:
+        return convert_one_point_to_two_points(bboxes1), convert_one_point_to_two_points(bboxes2)
+    return np.asarray(bboxes1, dtype=np.float64).reshape(-1, 4), np.asarray(bboxes2, dtype=np.float64).reshape(-1, 4)
+
+
+def _calculate_iou_matrix_chunk(bboxes1, bboxes2, area_bboxes2):
+    # Corners of the intersection boxes, broadcasting (N, 1) against (M,) to get (N, M)
+    intersect_top_left_x = np.maximum(bboxes1[:, 0:1], bboxes2[:, 0])
+    intersect_top_left_y = np.maximum(bboxes1[:, 1:2], bboxes2[:, 1])
+    intersect_bottom_right_x = np.minimum(bboxes1[:, 2:3], bboxes2[:, 2])
+    intersect_bottom_right_y = np.minimum(bboxes1[:, 3:4], bboxes2[:, 3])
+
+    # Same +1 convention as calculate_iou_two_points, so boxes sharing one edge don't count as 0
+    area_intersection = np.maximum(0, intersect_bottom_right_x - intersect_top_left_x + 1) * \
+                        np.maximum(0, intersect_bottom_right_y - intersect_top_left_y + 1)
+
+    area_bboxes1 = (bboxes1[:, 2] - bboxes1[:, 0] + 1) * (bboxes1[:, 3] - bboxes1[:, 1] + 1)
+
+    union_area = area_bboxes1[:, np.newaxis] + area_bboxes2[np.newaxis, :] - area_intersection
+
+    return area_intersection / union_area
@@ -1,7 +1,17 @@
-import csv
+import io
+import json
+import logging
+import queue
+import threading
+import time
 import tools.image_tools as image_tools
 import matplotlib.pyplot as plt
 import numpy as np
+import pandas as pd
+from result_analysis.image_detection_analysis import IOU_OVER_5_AND_SAME_CLASS, match_detections
+
+
+logger = logging.getLogger(__name__)
 
 
 def write_predictions_to_file(output_file, labels, predictions):
@@ -13,11 +23,17 @@ def write_predictions_to_file(output_file, labels, predictions):
         labels: expected labels for the different images
         predictions: predictions generated by the net
         batch_size: number of images/predictions that are being written in this call
+
+    output_file can also be a ResultsSink, which writes them as JSON Lines without reopening the file
     """
     if np.size(predictions, 0) != np.size(labels, 0):
         raise Exception("Exception writing output to file: number of "
                         "labels different from number of predictions")
 
+    if isinstance(output_file, ResultsSink):
+        output_file.write_predictions(labels, predictions)
+        return
+
     with open(output_file, 'a') as output_file:
         for index in range(0, np.size(predictions, 0)):
             output_file.write(str(labels[index]) + ", " + str(predictions[index]) + "\n")
@@ -25,10 +41,16 @@ def write_predictions_to_file(output_file, labels, predictions):
 
 def write_image_detection_predictions_to_file(
         output_file_for_data, output_dir_for_images, image, image_name, gt_boxes, gt_classes,
-        predicted_boxes, predicted_classes):
+        predicted_boxes, predicted_classes, image_writer=None, has_errors=None, predicted_scores=None):
     """
     Writes the predictions for object localization and classification to files.
 
+    output_file_for_data can also be a ResultsSink, which writes the record as JSON Lines without
+    reopening the file.
+
+    When image_writer is provided, the image with the boxes is rendered and written to
+    output_dir_for_images in the background by it instead of in this call.
+
     :param output_file_for_data:
     :param output_dir_for_images:
     :param image:
@@ -37,6 +59,13 @@ def write_image_detection_predictions_to_file(
     :param gt_classes:
     :param predicted_boxes:
     :param predicted_classes:
+    :param image_writer: Optional AsyncImageWriter used to write the image with the boxes
+    :param has_errors: Whether the predictions for the image have errors, used by image_writer to
+    only write images with errors. When it is None and image_writer only writes images with errors,
+    it is calculated by matching the predictions at IoU 0.5: the image has errors unless every
+    prediction matches a different ground truth object of the same class and every ground truth
+    object is matched
+    :param predicted_scores: Optional confidence of each prediction, only written to a ResultsSink
     """
     predicted_objects = [{"bbox": predicted_bbox, "class": predicted_class}
                          for predicted_bbox, predicted_class in
@@ -48,12 +77,142 @@ def write_image_detection_predictions_to_file(
     result = {"image_name": image_name, "gt_objects": gt_objects, "predicted_object": predicted_objects}
 
     # Writing all ground truth and predicted data to file so it can be analyzed further
-    with open(output_file_for_data, 'a') as output_file:
-        output_file.write(str(result) + "\n")
+    if isinstance(output_file_for_data, ResultsSink):
+        output_file_for_data.write_image_detection(
+            image_name, gt_boxes, gt_classes, predicted_boxes, predicted_classes, predicted_scores)
+    else:
+        with open(output_file_for_data, 'a') as output_file:
+            output_file.write(str(result) + "\n")
 
     # Generating images with ground truth and predicted boxes
-    image_tools.generate_image_with_bboxes(
-        image, image_name, predicted_objects, gt_objects, output_dir_for_images, roi_format=False)
+    if image_writer is not None:
+        if has_errors is None and image_writer.only_errors:
+            metrics, gt_matched = match_detections(gt_boxes, gt_classes, predicted_boxes, predicted_classes)
+            has_errors = not (np.all(metrics == IOU_OVER_5_AND_SAME_CLASS) and np.all(gt_matched))
+        image_writer.submit(image, image_name, predicted_objects, gt_objects, has_errors,
+                            output_folder=output_dir_for_images)
+    else:
+        image_tools.generate_image_with_bboxes(
+            image, image_name, predicted_objects, gt_objects, output_dir_for_images, roi_format=False)
+
+
+class AsyncImageWriter:
+
+    # Renders boxes on images and writes them to disk on background threads, so JPEG encoding and
+    # disk writes happen off the evaluation loop. cv2 releases the GIL while drawing and encoding.
+
+    def __init__(self, output_folder, number_threads=2, max_queue_size=64, drop_when_full=False,
+                 every_nth=1, only_errors=False, roi_format=False):
+        """
+        :param
+            output_folder: folder where all the generated images will be written
+            number_threads: number of background threads writing images
+            max_queue_size: maximum number of images waiting to be written
+            drop_when_full: true to drop images when the queue is full, false to block the caller
+            until there is room (back-pressure)
+            every_nth: only write one of every every_nth submitted images
+            only_errors: true to only write images submitted with has_errors true
+            roi_format: true if the format of the boxes is [x, y, w, h],
+                        false if format is [x1, y1, x2, y2]
+        """
+        self.output_folder = output_folder
+        self.drop_when_full = drop_when_full
+        self.every_nth = every_nth
+        self.only_errors = only_errors
+        self.roi_format = roi_format
+        self.submitted = 0
+        self.skipped = 0
+        self.dropped = 0
+        self.failed = []
+        self._queue = queue.Queue(maxsize=max_queue_size)
+        self._threads = [threading.Thread(target=self._write_images, daemon=True)
+                         for _ in range(number_threads)]
+        self._closed = False
+
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, image, image_name, predicted_objects, gt_objects, has_errors=None, output_folder=None):
+        """
+        Queues an image to be written with its boxes. The image is copied, so the caller can reuse it
+
+        :param
+            image: pixels representing the image (BGR).
+            image_name: name that it will give to output image it generates
+            predicted_objects: Dictionaries with fields bbox and class
+            gt_objects: Dictionaries with fields bbox and class
+            has_errors: whether the predictions for this image have errors. Images without
+            has_errors true are skipped when only_errors is set
+            output_folder: folder where the image is written. Defaults to the folder of the writer
+        :return:
+            True if the image was queued
+        """
+        if self._closed:
+            raise Exception("Can't submit images to a closed writer")
+
+        self.submitted += 1
+
+        if (self.submitted - 1) % self.every_nth != 0 or (self.only_errors and not has_errors):
+            self.skipped += 1
+            return False
+
+        task = (image.copy(), image_name, predicted_objects, gt_objects,
+                self.output_folder if output_folder is None else output_folder)
+
+        if not self.drop_when_full:
+            self._queue.put(task)
+            return True
+
+        try:
+            self._queue.put_nowait(task)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def flush(self):
+        """
+        Blocks until all the queued images have been written
+        """
+        self._queue.join()
+
+    def close(self):
+        """
+        Writes all the queued images and stops the background threads
+        """
+        if self._closed:
+            return
+
+        self.flush()
+        self._closed = True
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+        if self.failed:
+            logger.warning("%s images could not be written", len(self.failed))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _write_images(self):
+        while True:
+            task = self._queue.get()
+            try:
+                if task is None:
+                    return
+                image, image_name, predicted_objects, gt_objects, output_folder = task
+                image_tools.generate_image_with_bboxes(
+                    image, image_name, predicted_objects, gt_objects, output_folder,
+                    roi_format=self.roi_format)
+            except Exception as error:
+                self.failed.append((task[1], str(error)))
+            finally:
+                self._queue.task_done()
 
 
 def write_error_to_file(output_file, iteration, error):
@@ -65,32 +224,363 @@ def write_error_to_file(output_file, iteration, error):
         iteration: number of the iteration for which the error was calculated
         error: error calculated for the given iteration
     """
+    if isinstance(output_file, ResultsSink):
+        output_file.write_error(iteration, error)
+        return
+
     with open(output_file, 'a') as output_file:
         output_file.write(str(iteration) + "," + str(error) + "\n")
 
 
-def plot_error_from_file(file_with_errors):
+class ResultsSink:
+
+    # Long lived writer for results. The file is opened once and records are buffered in memory and
+    # written when the buffer reaches flush_bytes or flush_seconds have passed since the last write.
+    # Every record is one JSON object per line (JSON Lines), so files can be parsed back quickly.
+
+    def __init__(self, output_file, flush_bytes=1 << 20, flush_seconds=5.0):
+        """
+        :param
+            output_file: file the records will be appended to
+            flush_bytes: number of buffered bytes that triggers a write
+            flush_seconds: maximum number of seconds records stay in the buffer, checked on every
+            write
+        """
+        self.output_file = output_file
+        self.flush_bytes = flush_bytes
+        self.flush_seconds = flush_seconds
+        self._file = open(output_file, 'a')
+        self._buffer = []
+        self._buffered_bytes = 0
+        self._last_flush = time.time()
+
+    def write_record(self, record):
+        """
+        :param
+            record: dictionary to write. NumPy arrays and scalars are converted to lists and numbers
+        """
+        self._write_lines([json.dumps(record, default=_to_json_value)])
+
+    def write_predictions(self, labels, predictions):
+        """
+        Writes one {"label": ..., "prediction": ...} record per sample, serializing all of them in
+        one pass
+
+        :param
+            labels: expected labels for the different images
+            predictions: predictions generated by the net
+        """
+        labels = np.asarray(labels)
+        predictions = np.asarray(predictions)
+
+        if labels.shape[0] != predictions.shape[0]:
+            raise Exception("Exception writing output to file: number of "
+                            "labels different from number of predictions")
+
+        if _is_plain_number_array(labels) and _is_plain_number_array(predictions):
+            # Python ints and finite floats print as valid JSON, which is much faster than encoding
+            self._write_lines(list(map('{"label": %r, "prediction": %r}'.__mod__,
+                                       zip(labels.tolist(), predictions.tolist()))))
+            return
+
+        encode = json.JSONEncoder().encode
+        self._write_lines(['{"label": ' + encode(label) + ', "prediction": ' + encode(prediction) + '}'
+                           for label, prediction in zip(labels.tolist(), predictions.tolist())])
+
+    def write_error(self, iteration, error):
+        """
+        :param
+            iteration: number of the iteration for which the error was calculated
+            error: error calculated for the given iteration
+        """
+        self.write_record({"iteration": iteration, "error": error})
+
+    def write_image_detection(self, image_name, gt_boxes, gt_classes, predicted_boxes,
+                              predicted_classes, predicted_scores=None):
+        """
+        Writes the ground truth and predicted objects of an image as arrays of boxes and classes
+
+        :param
+            image_name: name of the image
+            gt_boxes: ground truth boxes with format [x1, y1, x2, y2]
+            gt_classes: ground truth classes
+            predicted_boxes: predicted boxes with format [x1, y1, x2, y2]
+            predicted_classes: predicted classes
+            predicted_scores: optional confidence of each prediction
+        """
+        record = {"image_name": image_name, "gt_boxes": gt_boxes, "gt_classes": gt_classes,
+                  "predicted_boxes": predicted_boxes, "predicted_classes": predicted_classes}
+        if predicted_scores is not None:
+            record["predicted_scores"] = predicted_scores
+        self.write_record(record)
+
+    def flush(self):
+        """
+        Writes all the buffered records to the file
+        """
+        if self._buffer:
+            self._file.write("".join(self._buffer))
+            self._buffer = []
+            self._buffered_bytes = 0
+        self._file.flush()
+        self._last_flush = time.time()
+
+    def close(self):
+        """
+        Writes all the buffered records and closes the file
+        """
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _write_lines(self, lines):
+        if not lines:
+            return
+
+        chunk = "\n".join(lines) + "\n"
+        self._buffer.append(chunk)
+        self._buffered_bytes += len(chunk)
+
+        if self._buffered_bytes >= self.flush_bytes or time.time() - self._last_flush >= self.flush_seconds:
+            self.flush()
+
+
+def _is_plain_number_array(values):
+    if values.ndim != 1:
+        return False
+    if np.issubdtype(values.dtype, np.integer):
+        return True
+    return np.issubdtype(values.dtype, np.floating) and bool(np.all(np.isfinite(values)))
+
+
+def _to_json_value(value):
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError("Object of type {} is not JSON serializable".format(type(value).__name__))
+
+
+class ErrorFileReader:
+
+    # Reads an error file incrementally. Only the lines appended since the last read are parsed,
+    # in chunks and with the pandas C parser, so a file that is still growing can be tailed
+    # without reading it again from the start. Values are kept in NumPy arrays.
+
+    def __init__(self, file_with_errors, chunk_bytes=16 << 20):
+        """
+        :param
+            file_with_errors: file written by write_error_to_file, either with lines
+            "iteration,error" or with JSON Lines written through a ResultsSink
+            chunk_bytes: number of bytes parsed at once
+        """
+        self.file_with_errors = file_with_errors
+        self.chunk_bytes = chunk_bytes
+        self.offset = 0
+        self._iterations = []
+        self._errors = []
+
+    def read_new(self, final=False):
+        """
+        Parses the complete lines appended since the last call
+        :param
+            final: True if nothing else will be written to the file, so a last line without end of
+            line is also parsed. Otherwise it is left for the next call, since it may be incomplete
+        :return:
+            Tuple with the arrays of new iterations and errors
+        """
+        new_iterations = []
+        new_errors = []
+
+        with open(self.file_with_errors, 'rb') as errors_file:
+            errors_file.seek(self.offset)
+            # Bytes after the last end of line read so far. Lines longer than chunk_bytes are
+            # completed with the next chunks
+            pending = b""
+
+            while True:
+                chunk = errors_file.read(self.chunk_bytes)
+                if not chunk:
+                    break
+
+                data = pending + chunk
+                end = data.rfind(b"\n") + 1
+                pending = data[end:]
+                if end == 0:
+                    continue
+
+                iterations, errors = _parse_error_lines(data[:end])
+                new_iterations.append(iterations)
+                new_errors.append(errors)
+                self.offset += end
+
+            # Unless the file is complete, a line that is still being written is left for the next call
+            if final and pending.strip():
+                iterations, errors = _parse_error_lines(pending)
+                new_iterations.append(iterations)
+                new_errors.append(errors)
+                self.offset += len(pending)
+
+        new_iterations = np.concatenate(new_iterations) if new_iterations else np.zeros(0)
+        new_errors = np.concatenate(new_errors) if new_errors else np.zeros(0)
+        self._iterations.append(new_iterations)
+        self._errors.append(new_errors)
+        return new_iterations, new_errors
+
+    def get_errors(self):
+        """
+        :return:
+            Tuple with the arrays of all the iterations and errors read so far
+        """
+        if len(self._iterations) > 1:
+            self._iterations = [np.concatenate(self._iterations)]
+            self._errors = [np.concatenate(self._errors)]
+        if not self._iterations:
+            return np.zeros(0), np.zeros(0)
+        return self._iterations[0], self._errors[0]
+
+
+def _parse_error_lines(data):
+    if data.lstrip().startswith(b"{"):
+        table = pd.read_json(io.BytesIO(data), lines=True)
+        return table["iteration"].values.astype(np.float64), table["error"].values.astype(np.float64)
+
+    table = pd.read_csv(io.BytesIO(data), header=None, names=["iteration", "error"], dtype=np.float64)
+    return table["iteration"].values, table["error"].values
+
+
+def downsample_error_curve(iterations, errors, number_buckets):
+    """
+    Reduces a curve to at most number_buckets points by splitting it in consecutive buckets with
+    the same number of points and keeping the minimum, maximum and mean error of each one
+
+    :param
+        iterations: array with the iteration of each error
+        errors: array with the errors
+        number_buckets: maximum number of points to keep, usually the width of the plot in pixels
+    :return:
+        Tuple with the arrays of iterations (first iteration of each bucket), minimum, maximum and
+        mean error of each bucket
+    """
+    number_points = errors.shape[0]
+    if number_points <= number_buckets:
+        return iterations, errors, errors, errors
+
+    bucket_starts = (np.arange(number_buckets) * number_points) // number_buckets
+    bucket_sizes = np.diff(np.append(bucket_starts, number_points))
+
+    return (iterations[bucket_starts],
+            np.minimum.reduceat(errors, bucket_starts),
+            np.maximum.reduceat(errors, bucket_starts),
+            np.add.reduceat(errors, bucket_starts) / bucket_sizes)
+
+
+def exponential_moving_average(errors, smoothing):
     """
-    Plots the error for each iteration coming from a file
+    Smooths errors like TensorBoard: average = smoothing * average + (1 - smoothing) * error
+
+    :param
+        errors: array with the errors
+        smoothing: weight of the previous average, between 0 (no smoothing) and 1
+    :return:
+        Array with the smoothed errors
+    """
+    errors = np.asarray(errors, dtype=np.float64)
+    if errors.shape[0] == 0 or smoothing >= 1:
+        return np.full(errors.shape[0], errors[0] if errors.shape[0] > 0 else 0.0)
+
+    # Without adjust pandas uses the same recursion, starting from the first error
+    return pd.Series(errors).ewm(alpha=1 - smoothing, adjust=False).mean().values
+
+
+def summarize_errors(iterations, errors, last_window=100):
+    """
+    :param
+        iterations: array with the iteration of each error
+        errors: array with the errors
+        last_window: number of last errors averaged
+    :return:
+        Dictionary with the number of errors, last iteration and error, minimum error and its
+        iteration, and mean of the last last_window errors
+    """
+    if errors.shape[0] == 0:
+        return {"number_errors": 0}
+
+    best = int(np.argmin(errors))
+    return {"number_errors": int(errors.shape[0]),
+            "last_iteration": float(iterations[-1]), "last_error": float(errors[-1]),
+            "min_iteration": float(iterations[best]), "min_error": float(errors[best]),
+            "mean_last_errors": float(np.mean(errors[-last_window:]))}
+
+
+def summarize_error_file(file_with_errors, last_window=100, error_reader=None, final=True):
+    """
+    Same as summarize_errors, for the errors in a file
+
+    :param
+        file_with_errors: file written by write_error_to_file
+        last_window: number of last errors averaged
+        error_reader: optional ErrorFileReader for the file. Only the lines appended since its last
+        read are parsed
+        final: True if the file is complete, so its last line is read even without end of line.
+        Use False for a file that is still being written
+    :return:
+        Dictionary returned by summarize_errors
+    """
+    error_reader = error_reader or ErrorFileReader(file_with_errors)
+    error_reader.read_new(final)
+    return summarize_errors(*error_reader.get_errors(), last_window=last_window)
+
+
+def plot_error_from_file(file_with_errors, number_buckets=1000, smoothing=None, output_path=None,
+                         error_reader=None, final=True):
+    """
+    Plots the error for each iteration coming from a file. Long curves are reduced to
+    number_buckets points, drawing the min/max envelope of each bucket around its mean
 
     :param
         file_with_errors: file that contains two columns separated by a comma. The first column is
         the iteration number and the second one the error for that iteration
+        number_buckets: maximum number of points drawn, usually the width of the plot in pixels
+        smoothing: optional weight of the exponential moving average drawn over the error
+        output_path: path of the image to save the plot to. If None the plot is shown
+        error_reader: optional ErrorFileReader for the file. Only the lines appended since its last
+        read are parsed, so it can be used to redraw the plot of a file that is still growing
+        final: True if the file is complete, so its last line is drawn even without end of line.
+        Use False when redrawing a file that is still being written
     """
-    x = []
-    y = []
-
-    with open(file_with_errors, 'r') as errors:
-        plots = csv.reader(errors, delimiter=',')
-        for row in plots:
-            x.append(float(row[0]))
-            y.append(float(row[1]))
-
-    plt.plot(x, y)
-    plt.xlabel('Iteration')
-    plt.ylabel('error')
-    plt.title('Error per iteration')
-    plt.legend()
-    plt.show()
+    error_reader = error_reader or ErrorFileReader(file_with_errors)
+    error_reader.read_new(final)
+    x, y = error_reader.get_errors()
+
+    bucket_x, bucket_min, bucket_max, bucket_mean = downsample_error_curve(x, y, number_buckets)
+
+    fig, ax = plt.subplots()
+    if bucket_x.shape[0] < x.shape[0]:
+        ax.fill_between(bucket_x, bucket_min, bucket_max, alpha=0.3, label='min/max')
+    ax.plot(bucket_x, bucket_mean, label='error')
+
+    if smoothing is not None and y.shape[0] > 0:
+        smoothed_x, _, _, smoothed_mean = downsample_error_curve(
+            x, exponential_moving_average(y, smoothing), number_buckets)
+        ax.plot(smoothed_x, smoothed_mean, label='smoothed error')
+
+    ax.set_xlabel('Iteration')
+    ax.set_ylabel('error')
+    ax.set_title('Error per iteration')
+    ax.legend()
+
+    if output_path is not None:
+        fig.savefig(output_path)
+        plt.close(fig)
+    else:
+        plt.show()
 
 # plot_error_from_file("./output/error.txt")
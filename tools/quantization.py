@@ -0,0 +1,195 @@
+import time
+import numpy as np
+
+
+def get_calibration_images(input_reader, number_images):
+    """
+    Reads a sample of images to calibrate the ranges of the activations of a quantized model
+
+    :param
+        input_reader: Any input reader of the project, whose get_sample_batch returns a tuple with
+        a batch of images and a batch of labels
+        number_images: Maximum number of images to read. Less are returned if the reader ends first
+    :return:
+        Array with shape (images, height, width, channels)
+    """
+    end_of_input_errors = _get_end_of_input_errors()
+    batches = []
+    read_images = 0
+
+    while read_images < number_images:
+        try:
+            features, _ = input_reader.get_sample_batch()
+        except end_of_input_errors:
+            break
+        batches.append(np.asarray(features[:number_images - read_images], dtype=np.float32))
+        read_images += len(batches[-1])
+
+    if not batches:
+        raise Exception("The input reader didn't return any image for calibration")
+
+    return np.concatenate(batches)
+
+
+def export_int8_model(session, input_tensor, output_tensor, calibration_images, output_path=None):
+    """
+    Converts a float32 graph to a TensorFlow Lite model with int8 weights and activations. The
+    ranges of the activations are calibrated by running the graph on calibration_images. The input
+    and output of the model are still float32, so it replaces the float32 graph without changes
+
+    :param
+        session: Session with the trained variables of the graph
+        input_tensor: Placeholder for the images, with shape (batch, height, width, channels)
+        output_tensor: Output of the graph
+        calibration_images: Array with shape (images, height, width, channels), for example from
+        get_calibration_images
+        output_path: Optional path where the model is written
+    :return:
+        Bytes of the TensorFlow Lite model
+    """
+    import tensorflow as tf
+
+    def get_representative_images():
+        for image in calibration_images:
+            yield [image[np.newaxis].astype(np.float32)]
+
+    converter = tf.lite.TFLiteConverter.from_session(session, [input_tensor], [output_tensor])
+    # The supported operations aren't restricted to int8 ones, so operations without an int8 kernel
+    # are kept in float32 instead of failing the conversion
+    converter.optimizations = [tf.lite.Optimize.DEFAULT]
+    converter.representative_dataset = tf.lite.RepresentativeDataset(get_representative_images)
+    model_content = converter.convert()
+
+    if output_path is not None:
+        with open(output_path, 'wb') as model_file:
+            model_file.write(model_content)
+
+    return model_content
+
+
+def run_tflite_model(model_content, images):
+    """
+    :param
+        model_content: Bytes of a TensorFlow Lite model, or path to it
+        images: Array with shape (images, height, width, channels)
+    :return:
+        Array with the outputs of the model, one per image
+    """
+    return np.concatenate(list(_iterate_tflite_outputs(_create_interpreter(model_content), images)))
+
+
+def compare_float_and_int8(session, input_tensor, output_tensor, model_content, images, labels=None,
+                           number_runs=3):
+    """
+    Runs the float32 graph and the int8 model on the same images, one image at a time as in a CPU
+    inference server, and compares their outputs and latencies
+
+    :param
+        session: Session with the trained variables of the float32 graph
+        input_tensor: Placeholder for the images of the float32 graph
+        output_tensor: Output of the float32 graph
+        model_content: Bytes of the model returned by export_int8_model, or path to it
+        images: Array with shape (images, height, width, channels)
+        labels: Optional expected class of each image, when the outputs are scores per class
+        number_runs: The latency is the best of this number of runs over all the images
+    :return:
+        Dictionary with the comparison, see get_comparison_report
+    """
+    def run_float(image):
+        return session.run(output_tensor, {input_tensor: image[np.newaxis]})
+
+    interpreter = _create_interpreter(model_content)
+    float_outputs = np.concatenate([run_float(image) for image in images])
+    int8_outputs = np.concatenate(list(_iterate_tflite_outputs(interpreter, images)))
+
+    float_seconds = _get_best_time(lambda: [run_float(image) for image in images], number_runs)
+    int8_seconds = _get_best_time(lambda: list(_iterate_tflite_outputs(interpreter, images)), number_runs)
+
+    report = get_comparison_report(float_outputs, int8_outputs, float_seconds, int8_seconds, labels)
+    report["int8_model_bytes"] = len(_read_model(model_content))
+    return report
+
+
+def get_comparison_report(float_outputs, int8_outputs, float_seconds, int8_seconds, labels=None):
+    """
+    :param
+        float_outputs: Outputs of the float32 graph, one per image
+        int8_outputs: Outputs of the int8 model for the same images
+        float_seconds: Time the float32 graph needed for all the images
+        int8_seconds: Time the int8 model needed for all the images
+        labels: Optional expected class of each image, when the outputs are scores per class
+    :return:
+        Dictionary with the number of images, the milliseconds per image of both models, the
+        speedup of the int8 model and the maximum and mean absolute difference of the outputs. When
+        the outputs are scores per class, also the fraction of images where both models predict the
+        same class and, if there are labels, the accuracy of both models
+    """
+    float_outputs = np.asarray(float_outputs, dtype=np.float64)
+    int8_outputs = np.asarray(int8_outputs, dtype=np.float64)
+    number_images = len(float_outputs)
+    differences = np.abs(float_outputs - int8_outputs)
+
+    report = {"number_images": number_images,
+              "float32_ms_per_image": 1000.0 * float_seconds / number_images,
+              "int8_ms_per_image": 1000.0 * int8_seconds / number_images,
+              "speedup": float_seconds / int8_seconds if int8_seconds > 0 else float("inf"),
+              "max_abs_difference": float(differences.max()),
+              "mean_abs_difference": float(differences.mean())}
+
+    if float_outputs.ndim == 2:
+        float_classes = np.argmax(float_outputs, axis=1)
+        int8_classes = np.argmax(int8_outputs, axis=1)
+        report["top1_agreement"] = float(np.mean(float_classes == int8_classes))
+
+        if labels is not None:
+            labels = np.asarray(labels).reshape(-1)
+            report["float32_accuracy"] = float(np.mean(float_classes == labels))
+            report["int8_accuracy"] = float(np.mean(int8_classes == labels))
+
+    return report
+
+
+def _create_interpreter(model_content):
+    import tensorflow as tf
+
+    interpreter = tf.lite.Interpreter(model_content=_read_model(model_content))
+    interpreter.allocate_tensors()
+    return interpreter
+
+
+def _iterate_tflite_outputs(interpreter, images):
+    input_index = interpreter.get_input_details()[0]["index"]
+    output_index = interpreter.get_output_details()[0]["index"]
+
+    for image in images:
+        interpreter.set_tensor(input_index, image[np.newaxis].astype(np.float32))
+        interpreter.invoke()
+        yield interpreter.get_tensor(output_index).copy()
+
+
+def _read_model(model_content):
+    if isinstance(model_content, str):
+        with open(model_content, 'rb') as model_file:
+            return model_file.read()
+    return model_content
+
+
+def _get_best_time(function, number_runs):
+    # The first call is a warm up, so one time allocations are not measured
+    function()
+    times = []
+    for _ in range(number_runs):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def _get_end_of_input_errors():
+    # NumpyInputReader raises StopIteration at the end of its epochs, and the readers that run a TF
+    # graph raise OutOfRangeError
+    try:
+        import tensorflow as tf
+    except ImportError:
+        return (StopIteration,)
+    return StopIteration, tf.errors.OutOfRangeError